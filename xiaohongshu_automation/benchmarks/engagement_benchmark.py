@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+互动数据写入和统计耗时测试
+在临时目录中为大量笔记写入每天一次的互动快照，统计列式存储的写入、打开、周报统计和累计汇总耗时，
+并与逐行扫描 JSON Lines 日志的做法对比
+
+用法: python benchmarks/engagement_benchmark.py [--notes 20000] [--days 14] [--limit 50]
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+
+sys.path.insert(0, str(SRC))
+
+TEMPLATES = [f"模板{i + 1}" for i in range(12)]
+CONTENT_TYPES = ["工具合集型", "经验分享型", "问题解决型", "对比测评型"]
+
+
+def make_snapshots(notes, day, start, rng):
+    """第 day 天所有笔记的快照（互动数随天数增长）"""
+    import numpy as np
+
+    heat = rng.lognormal(0, 1, notes)
+    likes = (heat * 20 * np.sqrt(day + 1)).astype(int)
+    ts = start + day * 86400
+    return [
+        {
+            "note_id": f"note{i}",
+            "ts": ts,
+            "likes": int(likes[i]),
+            "collects": int(likes[i] * 0.4),
+            "comments": int(likes[i] * 0.05),
+            "shares": int(likes[i] * 0.02),
+            "template": TEMPLATES[i % len(TEMPLATES)],
+            "content_type": CONTENT_TYPES[i % len(CONTENT_TYPES)],
+            "account": f"账号{i % 3 + 1}",
+            "published_at": start
+        }
+        for i in range(notes)
+    ]
+
+
+def scan_jsonl(path, since, until):
+    """对照：逐行读取日志，按模板统计时间范围内的互动增量"""
+    before, latest, templates = {}, {}, {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            item = json.loads(line)
+            if item['ts'] >= until:
+                continue
+            total = item['likes'] + item['collects'] + item['comments'] + item['shares']
+            latest[item['note_id']] = total
+            templates[item['note_id']] = item['template']
+            if item['ts'] < since:
+                before[item['note_id']] = total
+    result = {}
+    for note_id, total in latest.items():
+        result[templates[note_id]] = result.get(templates[note_id], 0) + total - before.get(note_id, 0)
+    return result
+
+
+def timed(func, runs):
+    """运行 runs 次，返回 (最后一次的结果, 耗时中位数毫秒)"""
+    samples = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    """主函数"""
+    import argparse
+    import numpy as np
+    from engagement import EngagementStore
+
+    parser = argparse.ArgumentParser(description='互动数据写入和统计耗时测试')
+    parser.add_argument('--notes', type=int, default=20000, help='笔记数')
+    parser.add_argument('--days', type=int, default=14, help='快照天数（每天每篇一条）')
+    parser.add_argument('--runs', type=int, default=5, help='统计的重复次数')
+    parser.add_argument('--limit', type=float, default=50.0, help='周报统计耗时中位数上限（毫秒）')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="xhs_engagement_"))
+    rng = np.random.default_rng(0)
+    start = (datetime.now() - timedelta(days=args.days)).timestamp()
+    until = datetime.now()
+    since = until - timedelta(days=7)
+
+    print(f"⏱️  互动数据测试（{args.notes} 篇笔记 × {args.days} 天 = {args.notes * args.days} 条快照）\n")
+    try:
+        store = EngagementStore(str(workdir / "engagement"))
+        log_path = workdir / "engagement.jsonl"
+        append_ms = []
+        with open(log_path, 'w', encoding='utf-8') as log:
+            for day in range(args.days):
+                snapshots = make_snapshots(args.notes, day, start, rng)
+                began = time.perf_counter()
+                store.append(snapshots)
+                append_ms.append((time.perf_counter() - began) * 1000)
+                for snapshot in snapshots:
+                    log.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+
+        reopened, open_ms = timed(lambda: EngagementStore(str(workdir / "engagement")), 1)
+        result, rollup_ms = timed(lambda: reopened.rollup(since, until), args.runs)
+        _, summary_ms = timed(lambda: reopened.summary(), args.runs)
+        expected, scan_ms = timed(lambda: scan_jsonl(log_path, since.timestamp(), until.timestamp()), 1)
+
+        print(f"{'写入一天快照':<12} {statistics.median(append_ms):>10.1f}ms")
+        print(f"{'打开存储':<12} {open_ms:>10.1f}ms")
+        print(f"{'周报统计':<12} {rollup_ms:>10.1f}ms")
+        print(f"{'累计汇总':<12} {summary_ms:>10.1f}ms")
+        print(f"{'扫描JSON日志':<12} {scan_ms:>10.1f}ms（对照）")
+
+        failures = []
+        actual = {row['key']: row['engagement'] for row in result['groups']}
+        if actual != expected:
+            failures.append("周报统计结果与逐行扫描不一致")
+        if rollup_ms > args.limit:
+            failures.append(f"周报统计中位数 {rollup_ms:.1f}ms 超过 {args.limit:.1f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
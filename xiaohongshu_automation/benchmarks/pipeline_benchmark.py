@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+端到端流水线性能测试
+不访问网络：注入模拟Claude客户端（可设置延迟、抖动、失败率）和本地模拟 xiaohongshu-mcp 服务，
+按不同批量大小测量 生成 → 保存 → 格式化 → 发布 的吞吐量和 p50/p95/p99 延迟，
+结果保存为JSON（benchmarks/results/），可以和之前的结果对比
+
+用法: python benchmarks/pipeline_benchmark.py [--batch-sizes 1 5 20] [--mode direct|queue]
+                                           [--llm-latency 0.8] [--mcp-latency 0.3] [--compare 上次结果.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(SRC))
+
+STAGES = ("generate", "save", "format", "publish", "log")
+
+
+def prepare_workdir(args, mcp_url):
+    """创建临时工作目录：复制配置并改为使用模拟服务、关闭去重/缓存/预生成，写入占位图片"""
+    import yaml
+
+    workdir = Path(tempfile.mkdtemp(prefix="xhs_pipeline_"))
+    shutil.copytree(ROOT / "config", workdir / "config")
+
+    config_path = workdir / "config" / "config.yaml"
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    config['ai']['stream'] = args.stream
+    config['ai']['rate_limit'].update(
+        requests_per_minute=100000, tokens_per_minute=100000000, backoff_base=0.05, backoff_max=1
+    )
+    # 模拟客户端的正文都一样，去重会把它们当成重复内容
+    config['dedup']['enabled'] = False
+    config['cache']['enabled'] = False
+    config['pipeline']['enabled'] = False
+    config['monitoring']['track_metrics'] = True
+    config['image']['method'] = "render" if args.render else "placeholder"
+    config['image']['encode']['enabled'] = args.render
+    config['publish'].update(backend="mcp", auto_publish=True, rate_limit={})
+    config['mcp'].update(base_url=mcp_url, host_images_dir=None, max_parallel_publishes=args.accounts)
+    config['accounts'] = [{"name": f"bench{i + 1}", "base_url": mcp_url} for i in range(args.accounts)]
+    config['queue']['concurrency'] = {"generate": args.concurrency, "render": args.concurrency,
+                                      "publish": args.accounts}
+
+    with open(config_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+
+    from PIL import Image
+    image_dir = workdir / config['image']['save_path']
+    image_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(config['image']['count']):
+        Image.new("RGB", (64, 64), (255, 255, 255)).save(image_dir / f"placeholder_{i + 1}.png")
+
+    return workdir
+
+
+class StageTimer:
+    """包装发布器的方法，记录每次调用的耗时（毫秒）"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds * 1000)
+
+    def wrap(self, obj, method, stage):
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def reset(self):
+        with self._lock:
+            for samples in self.samples.values():
+                samples.clear()
+
+
+def summarize_latency(values):
+    from metrics import percentile
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99)
+    }
+
+
+def run_direct(generator, publisher, timer, size, concurrency):
+    """批量生成 → 逐篇保存 → 分配到各账号队列格式化并发布，返回每篇的端到端耗时和结果"""
+    start = time.perf_counter()
+    results = generator.generate_batch(size, concurrency=concurrency)
+
+    finished = []
+    lock = threading.Lock()
+    statuses = []
+    futures = []
+    for item in results:
+        if item['status'] != 'success':
+            statuses.append("generate_failed")
+            continue
+        save_start = time.perf_counter()
+        generator.save_content(item['content'], status="queued")
+        timer.add("save", time.perf_counter() - save_start)
+
+        _, future = publisher.enqueue(item['content'])
+
+        def done(future):
+            with lock:
+                finished.append((time.perf_counter() - start) * 1000)
+
+        future.add_done_callback(done)
+        futures.append(future)
+
+    for future in futures:
+        statuses.append(future.result()['status'])
+    return time.perf_counter() - start, finished, statuses
+
+
+def run_queue(generator, publisher, timer, size, concurrency):
+    """通过持久化任务队列执行同样的流程（包含入队、租约和阶段衔接的开销）"""
+    import uuid
+    from job_queue import JobQueue, QueueWorker
+    from pipeline_stages import PipelineStages
+
+    config = generator.config
+    queue = JobQueue(config['queue']['db_path'])
+    stages = PipelineStages(generator, publisher)
+
+    # 保存耗时：包装生成阶段中的 save_content
+    timer.wrap(generator, "save_content", "save")
+    worker = QueueWorker(queue, stages.handlers(), concurrency=config['queue']['concurrency'],
+                         lease_seconds=60, poll_seconds=0.05)
+
+    start = time.perf_counter()
+    names = publisher.accounts.names
+    job_ids = [
+        queue.enqueue("generate", {"account": names[i % len(names)], "publish": True},
+                      f"generate:bench:{uuid.uuid4().hex}")
+        for i in range(size)
+    ]
+
+    worker.start()
+    finished = {}
+    try:
+        while len(finished) < len(job_ids):
+            for job_id in job_ids:
+                if job_id not in finished and queue.descendants_done(job_id):
+                    finished[job_id] = (time.perf_counter() - start) * 1000
+            time.sleep(0.02)
+    finally:
+        worker.stop()
+        del generator.save_content  # 去掉包装，恢复类上的方法
+
+    statuses = []
+    for job_id in job_ids:
+        job = queue.get(job_id)
+        if job['status'] != "done":
+            statuses.append("generate_failed")
+            continue
+        publish = queue.list(stage="publish", limit=len(job_ids) * 2)
+        match = [item for item in publish if item['parent_id'] == job_id]
+        statuses.append(match[0]['result']['status'] if match and match[0]['result'] else "publish_failed")
+    return time.perf_counter() - start, list(finished.values()), statuses
+
+
+def run_benchmark(args, workdir):
+    from stub_client import StubAnthropic
+    from content_generator import ContentGenerator
+    from xhs_publisher import XiaohongshuPublisher
+
+    client = StubAnthropic(str(workdir / "logs" / "stub_batches"), latency=args.llm_latency,
+                           jitter=args.jitter, error_rate=args.llm_error_rate)
+    generator = ContentGenerator("config/config.yaml", client=client)
+    publisher = XiaohongshuPublisher("config/config.yaml")
+
+    timer = StageTimer()
+    timer.wrap(publisher, "format_content_for_publish", "format")
+    timer.wrap(publisher, "publish_to_xiaohongshu", "publish")
+    timer.wrap(publisher, "log_publish", "log")
+
+    runner = run_queue if args.mode == "queue" else run_direct
+    runs = []
+    try:
+        for size in args.batch_sizes:
+            for repeat in range(args.repeat):
+                timer.reset()
+                since = datetime.now()
+                output = io.StringIO()
+                with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+                    wall, latencies, statuses = runner(generator, publisher, timer, size, args.concurrency)
+
+                calls = generator.store.list_calls(since=since)
+                timer.samples['generate'] = [
+                    call['latency_ms'] for call in calls if call.get('latency_ms') is not None
+                ]
+                succeeded = sum(1 for status in statuses if status == "success")
+                run = {
+                    "batch_size": size,
+                    "repeat": repeat,
+                    "succeeded": succeeded,
+                    "failed": len(statuses) - succeeded,
+                    "api_calls": len(calls),
+                    "api_errors": sum(1 for call in calls if call.get('status') != "ok"),
+                    "wall_seconds": wall,
+                    "throughput_per_minute": succeeded / wall * 60 if wall else None,
+                    "latency_ms": summarize_latency(latencies),
+                    "stages_ms": {stage: summarize_latency(values) for stage, values in timer.samples.items()}
+                }
+                runs.append(run)
+                print_run(run)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            publisher.close()
+    return runs
+
+
+def _fmt(value):
+    return f"{value:8.0f}" if value is not None else f"{'-':>8}"
+
+
+def print_run(run):
+    latency = run['latency_ms']
+    print(f"{run['batch_size']:>6} {run['repeat']:>4} {run['succeeded']:>4}/{run['succeeded'] + run['failed']:<4}"
+          f" {run['wall_seconds']:>7.2f}s {run['throughput_per_minute']:>8.1f}"
+          f" {_fmt(latency['p50'])} {_fmt(latency['p95'])} {_fmt(latency['p99'])}"
+          + "  " + " ".join(f"{stage} {_fmt(run['stages_ms'][stage]['p50']).strip()}" for stage in STAGES))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_by_size(runs):
+    """每个批量大小取吞吐量最高的一次"""
+    best = {}
+    for run in runs:
+        current = best.get(run['batch_size'])
+        if current is None or (run['throughput_per_minute'] or 0) > (current['throughput_per_minute'] or 0):
+            best[run['batch_size']] = run
+    return best
+
+
+def compare(previous_path, runs):
+    """与之前保存的结果对比吞吐量和p95延迟"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+
+    print(f"\n📊 对比 {previous_path}（{previous.get('timestamp')}，提交 {previous.get('git_commit') or '-'}）")
+    old = best_by_size(previous['runs'])
+    for size, run in sorted(best_by_size(runs).items()):
+        if size not in old:
+            continue
+        before, after = old[size], run
+
+        def change(a, b):
+            return f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "-"
+
+        print(f"   批量 {size:>4}: 吞吐量 {before['throughput_per_minute']:.1f} → {after['throughput_per_minute']:.1f}/分钟"
+              f"（{change(before['throughput_per_minute'], after['throughput_per_minute'])}），"
+              f"p95 {before['latency_ms']['p95'] or 0:.0f} → {after['latency_ms']['p95'] or 0:.0f}ms"
+              f"（{change(before['latency_ms']['p95'], after['latency_ms']['p95'])}）")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='端到端流水线性能测试')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 5, 20], help='批量大小')
+    parser.add_argument('--repeat', type=int, default=1, help='每个批量大小的重复次数')
+    parser.add_argument('--mode', choices=['direct', 'queue'], default='direct',
+                        help='direct：批量生成后直接发布；queue：通过持久化任务队列执行')
+    parser.add_argument('--concurrency', type=int, default=4, help='生成的并发请求数')
+    parser.add_argument('--accounts', type=int, default=2, help='发布账号数（都指向模拟服务）')
+    parser.add_argument('--llm-latency', type=float, default=0.8, help='模拟Claude平均响应时间（秒）')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='模拟Claude失败概率（529，会重试）')
+    parser.add_argument('--mcp-latency', type=float, default=0.3, help='模拟发布接口平均响应时间（秒）')
+    parser.add_argument('--mcp-error-rate', type=float, default=0.0, help='模拟发布失败概率（失败时保存草稿）')
+    parser.add_argument('--jitter', type=float, default=0.2, help='响应时间的相对标准差')
+    parser.add_argument('--stream', action='store_true', help='使用流式生成')
+    parser.add_argument('--render', action='store_true', help='渲染并压缩真实图片（默认使用占位图片）')
+    parser.add_argument('--verbose', action='store_true', help='显示生成和发布过程的输出')
+    parser.add_argument('--output', type=str, help='结果文件路径（默认 benchmarks/results/pipeline_时间.json）')
+    parser.add_argument('--compare', type=str, help='与之前的结果文件对比')
+    args = parser.parse_args()
+
+    from mcp_stub_server import StubMcpServer
+
+    server = StubMcpServer(latency=args.mcp_latency, jitter=args.jitter, error_rate=args.mcp_error_rate)
+    mcp_url = server.start_background()
+    workdir = prepare_workdir(args, mcp_url)
+    cwd = os.getcwd()
+
+    print(f"⏱️  流水线性能测试（{args.mode}，Claude {args.llm_latency}s / 发布 {args.mcp_latency}s，"
+          f"并发 {args.concurrency}，账号 {args.accounts}）\n")
+    print(f"{'批量':>6} {'次':>4} {'成功':>9} {'耗时':>8} {'篇/分钟':>8} {'p50':>8} {'p95':>8} {'p99':>8}  各阶段p50(ms)")
+
+    try:
+        os.chdir(workdir)
+        runs = run_benchmark(args, workdir)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'verbose')}
+    result = {
+        "benchmark": "pipeline",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "runs": runs
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 结果已保存: {output}")
+
+    if args.compare:
+        compare(args.compare, runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+提示词构建耗时测试
+对同一份内容计划，比较旧版 build_prompt（每次拼接f-string、逐个变量 str.replace）
+和预编译模板引擎（每份配置编译一次，只填充槽位）的耗时，并核对两者输出一致
+
+用法: python benchmarks/prompt_benchmark.py [--count 1000] [--repeat 5]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from config_loader import get_service
+from planner import ContentPlanner
+from prompt_templates import PromptEngine
+
+
+def legacy_system_prompt(product):
+    """旧版 build_system_prompt：每次请求重新拼接"""
+    return f"""你是一个专业的小红书营销文案专家，擅长创作高互动量的内容。
+
+【产品信息】
+名称：{product['name']}
+网址：{product['url']}
+简介：{product['description']}
+功能：{', '.join(product['features'])}
+目标用户：{', '.join(product['target_users'])}
+核心痛点：{', '.join(product['pain_points'])}
+
+【要求】
+1. 标题：12-20字，吸引眼球，可以使用数字或疑问句
+2. 正文：200-350字，分段清晰，多用emoji（根据密度要求）
+3. 风格：口语化、接地气、有共鸣感、真诚
+4. 避免：绝对化用语（最好、第一）、夸大宣传、虚假承诺
+5. 重点：突出产品价值，解决用户痛点，提供实用信息
+
+【参考优秀案例风格】
+"做了半年Temu，终于找到宝藏工具了！🎉
+
+之前每天光是上架产品就要花3个小时😭
+- 手动复制粘贴商品信息
+- 一个个核对价格
+- 库存变动要手动更新
+
+直到我发现了这个神器！⚡️
+
+现在效率提升10倍，每天多出2小时去优化策略💪"
+
+每次请根据用户给出的内容类型和模板信息，生成一篇完整的小红书笔记内容，包括：
+1. 标题（不要加"标题："前缀）
+2. 正文内容
+3. 不需要包含话题标签（我会单独添加）
+
+注意：
+- 不要使用markdown格式
+- 直接输出纯文本
+- 标题和正文之间用空行分隔
+- 保持真实感，像真人在分享经验
+"""
+
+
+def legacy_build_prompt(templates, template, content_type, variables):
+    """旧版 build_prompt：遍历全部变量逐个 str.replace（取值改为按计划，便于核对输出）"""
+    title_pattern = template['title_pattern']
+    for var_name, var_values in templates['variables'].items():
+        placeholder = f"{{{var_name}}}"
+        if placeholder in title_pattern:
+            title_pattern = title_pattern.replace(placeholder, variables[var_name])
+
+    prompt = f"""【内容类型】{content_type['name']}
+
+【模板信息】
+标题参考：{title_pattern}
+内容结构：{', '.join(template['content_structure'])}
+写作风格：{template['style']}
+表情符号密度：{template['emoji_density']}
+
+请按以上要求生成这篇笔记。
+"""
+    return prompt
+
+
+def run_legacy(config, templates, plan):
+    return [
+        (legacy_system_prompt(config['product']),
+         legacy_build_prompt(templates, item['template'], item['content_type'], item['variables']))
+        for item in plan
+    ]
+
+
+def run_compiled(config, templates, plan):
+    # 编译计入耗时（实际运行中每份配置只编译一次）
+    engine = PromptEngine(config, templates)
+    return [
+        (engine.system_prompt, engine.render(item['template'], item['content_type'], item['variables']))
+        for item in plan
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='提示词构建耗时测试')
+    parser.add_argument('--count', type=int, default=1000, help='内容计划篇数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    service = get_service(ROOT / "config" / "config.yaml")
+    config, templates = service.config, service.templates
+    plan = ContentPlanner(config, templates, seed=0).plan(args.count)
+
+    legacy_time, legacy = best_of(lambda: run_legacy(config, templates, plan), args.repeat)
+    compiled_time, compiled = best_of(lambda: run_compiled(config, templates, plan), args.repeat)
+
+    if legacy != compiled:
+        print("❌ 两种方式生成的提示词不一致")
+        sys.exit(1)
+
+    print(f"⏱️  提示词构建（{args.count} 篇，{args.repeat} 次取最快）\n")
+    print(f"   旧版 build_prompt: {legacy_time * 1000:8.2f} ms（每篇 {legacy_time / args.count * 1e6:6.2f} µs）")
+    print(f"   预编译模板:        {compiled_time * 1000:8.2f} ms（每篇 {compiled_time / args.count * 1e6:6.2f} µs）")
+    print(f"   加速: {legacy_time / compiled_time:.1f}x")
+    print("\n✅ 输出一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+命令行启动耗时测试
+在临时目录中（复制 config/，写入一篇示例内容）多次运行各个命令，统计耗时，
+并检查只查看/发布的命令没有导入 anthropic、numpy 等重型依赖
+
+用法: python benchmarks/startup_benchmark.py [--runs 5] [--limit 1.0]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+
+# (名称, 参数, 不应导入的模块)
+COMMANDS = [
+    ("导入全部模块", ["-c", "import content_generator, xhs_publisher, scheduler"], ["anthropic", "numpy", "PIL", "httpx"]),
+    ("查看响应缓存", [str(SRC / "content_generator.py"), "--cache-stats"], ["anthropic", "numpy"]),
+    ("发布最新内容", [str(SRC / "xhs_publisher.py"), "--manual"], ["anthropic", "numpy", "httpx"]),
+    ("调度器帮助", [str(SRC / "scheduler.py")], ["anthropic", "numpy", "PIL", "httpx"]),
+]
+
+# 命令结束时打印已导入的重型模块
+PROBE = (
+    "import atexit, sys\n"
+    "atexit.register(lambda: print('__MODULES__', ' '.join(sorted("
+    "m for m in ('anthropic', 'numpy', 'PIL', 'httpx', 'yaml') if m in sys.modules))))\n"
+)
+
+
+def prepare_workdir():
+    """创建临时工作目录：复制配置，写入一篇示例内容"""
+    workdir = Path(tempfile.mkdtemp(prefix="xhs_startup_"))
+    shutil.copytree(ROOT / "config", workdir / "config")
+
+    sys.path.insert(0, str(SRC))
+    from config_loader import load_config
+    from content_store import ContentStore
+
+    config = load_config(workdir / "config" / "config.yaml")
+    store = ContentStore(str(workdir / config['storage']['content_db']))
+    store.add({
+        "title": "Temu卖家必备！这5个功能让效率飙升",
+        "content": "之前每天上架要花3个小时😭\n- 自动同步库存\n- 智能核价\n\n现在每天多出2小时做选品💪",
+        "tags": ["#跨境电商运营", "#temu选品"],
+        "content_type": "工具合集型",
+        "template": "工具合集-效率提升",
+        "generated_at": "2025-01-01T09:00:00"
+    })
+    return workdir
+
+
+def run_command(args, workdir):
+    """运行一次命令，返回 (耗时秒数, 已导入的重型模块)"""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    # 证明这些命令不需要 API Key
+    env.pop("ANTHROPIC_API_KEY", None)
+
+    if args[0] == "-c":
+        code = PROBE + args[1]
+    else:
+        code = PROBE + f"import runpy, sys\nsys.argv = {args!r}\nrunpy.run_path({args[0]!r}, run_name='__main__')"
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"命令失败: {' '.join(args)}\n{result.stderr}")
+
+    modules = []
+    for line in result.stdout.splitlines():
+        if line.startswith("__MODULES__"):
+            modules = line.split()[1:]
+    return elapsed, modules
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='命令行启动耗时测试')
+    parser.add_argument('--runs', type=int, default=5, help='每个命令运行次数（另有1次预热）')
+    parser.add_argument('--limit', type=float, default=1.0, help='中位数耗时上限（秒）')
+    args = parser.parse_args()
+
+    workdir = prepare_workdir()
+    failures = []
+
+    print(f"⏱️  启动耗时测试（每个命令 {args.runs} 次，上限 {args.limit:.2f}s）\n")
+    print(f"{'命令':<12} {'首次':>8} {'中位数':>8} {'最快':>8}  已导入")
+
+    try:
+        for name, command, forbidden in COMMANDS:
+            # 首次运行包含图片渲染等一次性开销，单独列出
+            first, modules = run_command(command, workdir)
+            timings = [run_command(command, workdir)[0] for _ in range(args.runs)]
+            median = statistics.median(timings)
+
+            print(f"{name:<12} {first:>7.3f}s {median:>7.3f}s {min(timings):>7.3f}s  {' '.join(modules) or '-'}")
+
+            if median > args.limit:
+                failures.append(f"{name}: 中位数 {median:.3f}s 超过 {args.limit:.2f}s")
+            leaked = sorted(set(modules) & set(forbidden))
+            if leaked:
+                failures.append(f"{name}: 导入了 {', '.join(leaked)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("\n❌ 未通过:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+
+    print("\n✅ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
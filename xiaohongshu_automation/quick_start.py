@@ -6,8 +6,11 @@
 
 import os
 import sys
+import threading
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
 
 def check_environment():
     """检查环境配置"""
@@ -49,7 +52,6 @@ def check_dependencies():
     required_packages = [
         ('anthropic', 'anthropic'),
         ('yaml', 'pyyaml'),
-        ('schedule', 'schedule'),
         ('PIL', 'pillow')
     ]
 
@@ -71,7 +73,7 @@ def check_dependencies():
     return True
 
 
-def show_menu():
+def show_menu(session):
     """显示菜单"""
     print("\n" + "="*60)
     print("  巨爆铺 - 小红书自动化营销系统")
@@ -82,40 +84,96 @@ def show_menu():
     print("  3. 查看最新生成的内容")
     print("  4. 发布最新内容（保存为草稿）")
     print("  5. 测试定时任务")
-    print("  6. 启动定时调度器")
+    if session.scheduler_running:
+        print("  6. 停止定时调度器（后台运行中）")
+    else:
+        print("  6. 启动定时调度器（后台运行）")
     print("  7. 查看配置信息")
     print("  0. 退出")
     print("\n" + "="*60)
 
 
-def generate_content(count=1):
+class Session:
+    """
+    交互菜单共用的实例
+
+    生成器、发布器和调度器在第一次使用时创建，之后各个菜单操作复用同一份配置、
+    Claude客户端和MCP连接池；调度器在本进程的后台线程中运行
+    """
+
+    def __init__(self, config_path="config/config.yaml"):
+        self.config_path = config_path
+        self._scheduler = None
+
+    @property
+    def scheduler(self):
+        if self._scheduler is None:
+            from scheduler import ContentScheduler
+            self._scheduler = ContentScheduler(self.config_path)
+        return self._scheduler
+
+    @property
+    def generator(self):
+        return self.scheduler.generator
+
+    @property
+    def publisher(self):
+        return self.scheduler.publisher
+
+    @property
+    def scheduler_running(self):
+        return self._scheduler is not None and self._scheduler.is_running
+
+    def warm_up(self):
+        """使用MCP发布时提前建立连接，第一次发布不需要等待握手"""
+        if self.publisher.config['publish'].get('backend') != 'mcp':
+            return
+
+        mcp = self.publisher.mcp
+
+        def ping():
+            try:
+                mcp.health()
+            except Exception as e:
+                print(f"\n⚠️  MCP服务暂不可用: {str(e)}")
+
+        threading.Thread(target=ping, name="mcp-warm-up", daemon=True).start()
+
+    def close(self):
+        """停止后台调度器并释放连接"""
+        if self._scheduler is not None:
+            self._scheduler.close()
+
+
+def generate_content(session, count=1):
     """生成内容"""
-    os.chdir("src")
-    os.system(f"python content_generator.py --test --count {count}")
-    os.chdir("..")
+    from content_generator import print_preview
 
+    generator = session.generator
+    if count > 1:
+        results = generator.generate_batch(count, test_mode=True)
+        contents = [r['content'] for r in results if r['status'] == 'success']
+    else:
+        content = generator.generate_content(test_mode=True)
+        contents = [content] if content else []
+
+    for content in contents:
+        generator.save_content(content)
+        print_preview(content)
 
-def view_latest_content():
-    """查看最新内容"""
-    import json
-    from datetime import datetime
 
-    logs_dir = Path("logs")
-    content_files = sorted(logs_dir.glob("content_*.json"), reverse=True)
+def view_latest_content(session):
+    """查看最新内容"""
+    content = session.generator.store.latest()
 
-    if not content_files:
+    if not content:
         print("\n❌ 没有找到生成的内容")
         return
 
-    latest_file = content_files[0]
-
-    with open(latest_file, 'r', encoding='utf-8') as f:
-        content = json.load(f)
-
     print("\n" + "="*60)
     print("📄 最新生成的内容")
     print("="*60)
-    print(f"\n文件: {latest_file.name}")
+    print(f"\n编号: #{content['id']}（状态: {content['status']}）")
     print(f"生成时间: {content.get('generated_at', 'unknown')}")
     print(f"内容类型: {content.get('content_type', 'unknown')}")
     print(f"\n标题: {content['title']}\n")
@@ -125,37 +183,42 @@ def view_latest_content():
     print("\n" + "="*60)
 
 
-def publish_latest():
+def publish_latest(session):
     """发布最新内容"""
-    os.chdir("src")
-    os.system("python xhs_publisher.py --manual")
-    os.chdir("..")
+    publisher = session.publisher
+    latest = publisher.store.latest()
 
+    if latest:
+        print(f"📄 使用最新内容: #{latest['id']} {latest['title']}")
+        publisher.publish(latest)
+    else:
+        print("❌ 未找到生成的内容，请先生成内容")
 
-def test_scheduler():
+
+def test_scheduler(session):
     """测试定时任务"""
-    os.chdir("src")
-    os.system("python scheduler.py --test")
-    os.chdir("..")
+    print("🧪 测试模式: 立即执行一次任务\n")
+    session.scheduler.run_once()
+
 
+def toggle_scheduler(session):
+    """在后台启动或停止定时调度器"""
+    if session.scheduler_running:
+        session.scheduler.stop()
+        return
 
-def start_scheduler():
-    """启动定时调度器"""
-    print("\n⚠️  即将启动定时调度器")
-    print("按 Ctrl+C 可以随时停止\n")
+    print("\n⚠️  即将在后台启动定时调度器")
+    print("调度器运行期间可以继续使用菜单，任务输出会穿插显示\n")
     input("按 Enter 继续...")
 
-    os.chdir("src")
-    os.system("python scheduler.py --start")
-    os.chdir("..")
+    session.scheduler.start()
+    print("🎯 调度器已在后台运行")
+    session.scheduler.show_status()
 
 
-def show_config():
+def show_config(session):
     """显示配置信息"""
-    import yaml
-
-    with open("config/config.yaml", 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    config = session.scheduler.config
 
     print("\n" + "="*60)
     print("⚙️  当前配置")
@@ -164,6 +227,8 @@ def show_config():
     print(f"产品网址: {config['product']['url']}")
     print(f"\n发布频率: 每天 {config['content_strategy']['post_frequency']} 次")
     print(f"发布时间: {', '.join(config['content_strategy']['post_times'])}")
+    for account, post_times in session.scheduler.account_post_times.items():
+        print(f"账号 {account}: {', '.join(post_times)}")
     print(f"\nAI模型: {config['ai']['model']}")
     print(f"自动发布: {'开启' if config['publish']['auto_publish'] else '关闭'}")
     print(f"保存草稿: {'开启' if config['publish']['save_draft'] else '关闭'}")
@@ -182,32 +247,41 @@ def main():
     print("✅ 环境检查通过！\n")
     input("按 Enter 继续...")
 
-    while True:
-        show_menu()
-
-        choice = input("\n请输入选项 (0-7): ").strip()
-
-        if choice == "1":
-            generate_content(1)
-        elif choice == "2":
-            generate_content(5)
-        elif choice == "3":
-            view_latest_content()
-        elif choice == "4":
-            publish_latest()
-        elif choice == "5":
-            test_scheduler()
-        elif choice == "6":
-            start_scheduler()
-        elif choice == "7":
-            show_config()
-        elif choice == "0":
-            print("\n👋 再见！")
-            break
-        else:
-            print("\n❌ 无效选项，请重新选择")
-
-        input("\n按 Enter 继续...")
+    session = Session()
+    session.warm_up()
+    actions = {
+        "1": lambda: generate_content(session, 1),
+        "2": lambda: generate_content(session, 5),
+        "3": lambda: view_latest_content(session),
+        "4": lambda: publish_latest(session),
+        "5": lambda: test_scheduler(session),
+        "6": lambda: toggle_scheduler(session),
+        "7": lambda: show_config(session)
+    }
+
+    try:
+        while True:
+            show_menu(session)
+
+            choice = input("\n请输入选项 (0-7): ").strip()
+
+            if choice == "0":
+                print("\n👋 再见！")
+                break
+
+            action = actions.get(choice)
+            if action is None:
+                print("\n❌ 无效选项，请重新选择")
+            else:
+                try:
+                    action()
+                except Exception as e:
+                    # 单个操作失败不退出菜单，已创建的实例继续复用
+                    print(f"\n❌ 操作失败: {str(e)}")
+
+            input("\n按 Enter 继续...")
+    finally:
+        session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+多账号发布队列
+每个账号对应一个 xiaohongshu-mcp 服务实例（各自使用独立的 cookies 文件），拥有独立的发布队列、
+频率限制和发布线程，不同账号的发布同时进行；未指定账号的内容分配给排队最少的账号
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from api_client import TokenBucket
+
+
+# 未配置 accounts 时使用 mcp.base_url 的唯一账号
+DEFAULT_ACCOUNT = "default"
+
+
+def account_configs(config):
+    """配置中的账号列表；未配置 accounts 时返回使用 mcp.base_url 的默认账号"""
+    accounts = config.get('accounts') or []
+    if accounts:
+        return accounts
+    return [{"name": DEFAULT_ACCOUNT, "base_url": config.get('mcp', {}).get('base_url')}]
+
+
+def post_times_for(config, account):
+    """账号的发布时间：账号未单独设置时使用 content_strategy.post_times"""
+    return account.get('post_times') or config['content_strategy']['post_times']
+
+
+class Account:
+    def __init__(self, name):
+        self.name = name
+        self.base_url = None
+        self.rate_limit = None
+        self.bucket = None
+        self.min_interval = 0
+        self.queue = deque()
+        self.in_flight = 0
+        self.published = 0  # 已处理的内容数（含保存为草稿的）
+        self.errors = 0
+        self.last_publish = None
+        self.active = True
+        self.thread = None
+
+    def configure(self, options, defaults):
+        """按账号配置（未设置的频率限制项使用 publish.rate_limit）更新地址和频率限制"""
+        rate_limit = dict(defaults or {})
+        rate_limit.update(options.get('rate_limit') or {})
+
+        self.base_url = options.get('base_url')
+        if rate_limit == self.rate_limit:
+            # 频率限制未变时保留令牌桶中的余量
+            return
+        self.rate_limit = rate_limit
+
+        per_hour = rate_limit.get('posts_per_hour')
+        if per_hour:
+            # 令牌桶最多积攒 burst 次，之后按每小时 posts_per_hour 次补充
+            self.bucket = TokenBucket(per_hour / 60.0, capacity=rate_limit.get('burst', 1))
+        else:
+            self.bucket = None
+        self.min_interval = rate_limit.get('min_interval_minutes', 0) * 60
+
+    @property
+    def load(self):
+        """排队和发布中的内容数"""
+        return len(self.queue) + self.in_flight
+
+    def wait_time(self):
+        """距离允许下一次发布还需等待的秒数（为0时已取出一个令牌）"""
+        if self.last_publish is not None and self.min_interval:
+            remaining = self.last_publish + self.min_interval - time.monotonic()
+            if remaining > 0:
+                return remaining
+        return self.bucket.try_acquire() if self.bucket else 0
+
+
+class AccountPool:
+    def __init__(self, publish, config=None):
+        """
+        初始化账号池
+
+        publish(content, account, force) 执行实际发布（account 为 Account），在该账号的发布线程中调用
+        """
+        self._publish = publish
+        self._accounts = {}
+        self._cond = threading.Condition()
+        self._stopped = True
+        if config is not None:
+            self.update(config)
+
+    def update(self, config):
+        """按配置增删账号、更新地址和频率限制（已删除账号排队中的内容转给其余账号）"""
+        defaults = config['publish'].get('rate_limit')
+        with self._cond:
+            names = []
+            for options in account_configs(config):
+                name = options['name']
+                names.append(name)
+                account = self._accounts.get(name)
+                if account is None:
+                    account = self._accounts[name] = Account(name)
+                    if not self._stopped:
+                        self._start_worker(account)
+                account.configure(options, defaults)
+
+            orphaned = []
+            for name in [name for name in self._accounts if name not in names]:
+                account = self._accounts.pop(name)
+                account.active = False
+                orphaned.extend(account.queue)
+                account.queue.clear()
+            for item in orphaned:
+                self._least_loaded().queue.append(item)
+            self._cond.notify_all()
+
+    @property
+    def names(self):
+        with self._cond:
+            return list(self._accounts)
+
+    def get(self, name):
+        with self._cond:
+            return self._accounts.get(name)
+
+    def _least_loaded(self):
+        # 排队最少的账号优先，其次是累计发布最少的，保证各账号轮流分到内容
+        return min(self._accounts.values(), key=lambda account: (account.load, account.published))
+
+    def submit(self, content, account=None, force=False):
+        """
+        把一篇内容加入账号的发布队列，返回 (账号名, Future)
+
+        account 为空时分配给排队最少的账号；force 原样传给 publish；Future 的结果为发布结果
+        """
+        future = Future()
+        with self._cond:
+            if account is None:
+                target = self._least_loaded()
+            else:
+                target = self._accounts.get(account)
+                if target is None:
+                    raise ValueError(f"账号不存在: {account}")
+            target.queue.append((content, future, force))
+            self._cond.notify_all()
+        return target.name, future
+
+    # ------------------------------------------------------------------
+    # 运行
+    # ------------------------------------------------------------------
+
+    @property
+    def is_running(self):
+        return not self._stopped
+
+    def start(self):
+        """为每个账号启动一个发布线程"""
+        with self._cond:
+            if not self._stopped:
+                return
+            self._stopped = False
+            for account in self._accounts.values():
+                self._start_worker(account)
+
+    def _start_worker(self, account):
+        account.thread = threading.Thread(target=self._worker, args=(account,),
+                                          name=f"publish-{account.name}", daemon=True)
+        account.thread.start()
+
+    def stop(self, wait=True):
+        """停止发布线程（正在发布的内容会完成，排队中的内容保留在队列中）"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            threads = [account.thread for account in self._accounts.values() if account.thread]
+            self._cond.notify_all()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def join(self, timeout=None):
+        """等待所有账号的队列清空，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while any(account.load for account in self._accounts.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_item(self, account):
+        """等待队列中有内容且频率限制允许，停止或账号被删除时返回None"""
+        with self._cond:
+            while not self._stopped and account.active:
+                if not account.queue:
+                    self._cond.wait()
+                    continue
+                wait = account.wait_time()
+                if wait <= 0:
+                    account.in_flight += 1
+                    return account.queue.popleft()
+                self._cond.wait(wait)
+            return None
+
+    def _worker(self, account):
+        while True:
+            item = self._next_item(account)
+            if item is None:
+                return
+            content, future, force = item
+            failed = True
+            try:
+                result = self._publish(content, account, force)
+                failed = result.get('status') == 'error'
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._cond:
+                    account.in_flight -= 1
+                    account.last_publish = time.monotonic()
+                    account.published += 1
+                    account.errors += failed
+                    self._cond.notify_all()
+
+    def status(self):
+        """每个账号的排队数、发布中数量、累计处理数和失败数"""
+        with self._cond:
+            return [
+                {
+                    "name": account.name,
+                    "base_url": account.base_url,
+                    "queued": len(account.queue),
+                    "in_flight": account.in_flight,
+                    "published": account.published,
+                    "errors": account.errors
+                }
+                for account in self._accounts.values()
+            ]
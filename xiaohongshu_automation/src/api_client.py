@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Claude请求调度层
+在客户端前加上令牌桶限流、指数退避重试和熔断，批量生成时保持在可持续的最大吞吐
+"""
+
+import time
+import random
+import threading
+
+
+# 可以重试的HTTP状态码（429限流、529过载、5xx服务端错误、408/409超时冲突）
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# 可以重试的连接类异常（按类名判断，无需导入anthropic）
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError"}
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开，暂停请求"""
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        """令牌桶：每分钟补充 per_minute 个令牌，最多积攒 capacity 个"""
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """取出 amount 个令牌，不足时阻塞等待"""
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        amount = min(amount, self.capacity)
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, amount=1):
+        """不阻塞地取出令牌：成功返回0，不足时返回还需等待的秒数"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            return (amount - self.tokens) / self.rate
+
+    def adjust(self, delta):
+        """按实际用量修正（delta>0 补扣，delta<0 退还）"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_seconds=60):
+        """连续失败 failure_threshold 次后打开，reset_seconds 秒后放行一次试探请求"""
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def check(self):
+        """
+        请求前检查，熔断打开时抛出 CircuitOpenError
+
+        半开状态只放行一个试探请求，试探结束（record_success / record_failure / release）前其余请求同样被拒绝
+        """
+        with self._lock:
+            state = self.state
+            if state == "open":
+                remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(f"熔断中：连续失败 {self.failures} 次，{remaining:.0f} 秒后重试")
+            if state == "half_open":
+                if self._probing:
+                    raise CircuitOpenError(f"熔断中：连续失败 {self.failures} 次，正在等待试探请求的结果")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                # 半开状态下试探失败也重新计时
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """请求因与服务状态无关的原因结束（参数错误、调用方中断等）：结束试探，不改变熔断状态"""
+        with self._lock:
+            self._probing = False
+
+
+def is_retryable(error):
+    """判断异常是否为可重试的临时错误"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after_seconds(error):
+    """读取响应头中的 retry-after（秒），没有时返回None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(params):
+    """粗略估算一次请求的token数（中文约每字1个token，偏保守）"""
+    chars = 0
+    for block in params.get('system', []):
+        chars += len(block.get('text', ''))
+    for message in params.get('messages', []):
+        content = message.get('content', '')
+        chars += len(content) if isinstance(content, str) else 0
+    return chars + params.get('max_tokens', 0)
+
+
+class _TrackedStream:
+    """
+    包装流式响应
+
+    建立连接时与普通请求一样熔断检查、限流并对临时错误退避重试；结束时把成败记入熔断器并按实际用量修正token桶。
+    已经开始接收文本后连接中断不会自动重试（由调用方处理已收到的部分）
+    """
+
+    def __init__(self, owner, params):
+        self._owner = owner
+        self._params = params
+        self._manager = None
+        self._stream = None
+        self._estimated = 0
+
+    def __enter__(self):
+        def open_stream():
+            manager = self._owner.client.messages.stream(**self._params)
+            return manager, manager.__enter__()
+
+        (self._manager, self._stream), self._estimated = self._owner.attempt(open_stream, self._params)
+        return self._stream
+
+    def __exit__(self, exc_type, exc, tb):
+        owner = self._owner
+        if exc_type is None:
+            owner.breaker.record_success()
+            get_final_message = getattr(self._stream, 'get_final_message', None)
+            if get_final_message is not None:
+                owner.settle(getattr(get_final_message(), 'usage', None), self._estimated)
+        elif is_retryable(exc):
+            owner.breaker.record_failure()
+        else:
+            owner.breaker.release()
+        return self._manager.__exit__(exc_type, exc, tb)
+
+
+class _ResilientMessages:
+    def __init__(self, owner):
+        self._owner = owner
+
+    @property
+    def batches(self):
+        # 批任务接口本身是异步的，直接透传
+        return self._owner.client.messages.batches
+
+    def create(self, **params):
+        return self._owner.call(lambda: self._owner.client.messages.create(**params), params)
+
+    def stream(self, **params):
+        return _TrackedStream(self._owner, params)
+
+
+class ResilientClient:
+    def __init__(self, client, config=None):
+        """
+        包装Claude客户端
+
+        config 对应 config.yaml 中的 ai.rate_limit
+        """
+        config = config or {}
+        self.client = client
+
+        self.request_bucket = TokenBucket(config.get('requests_per_minute', 50))
+        self.token_bucket = TokenBucket(config.get('tokens_per_minute', 40000))
+        self.breaker = CircuitBreaker(
+            config.get('circuit_failure_threshold', 5),
+            config.get('circuit_reset_seconds', 60)
+        )
+
+        self.max_retries = config.get('max_retries', 5)
+        self.backoff_base = config.get('backoff_base', 1.0)
+        self.backoff_max = config.get('backoff_max', 60.0)
+
+        self.messages = _ResilientMessages(self)
+
+    def throttle(self, params):
+        """按请求数和token数限流，返回预扣的token数"""
+        estimated = estimate_tokens(params)
+        self.request_bucket.acquire(1)
+        self.token_bucket.acquire(estimated)
+        return estimated
+
+    def backoff(self, attempt, error):
+        """计算第 attempt 次重试前的等待时间（优先使用 retry-after）"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # 指数退避 + 全抖动
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def attempt(self, request, params):
+        """
+        熔断检查 → 限流 → 执行请求，临时错误退避后重试，返回 (结果, 预扣的token数)
+
+        成功时不记入熔断器（由调用方在请求真正结束后记录）；失败的请求没有消耗token，预扣的部分退还
+        """
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check()
+            estimated = self.throttle(params)
+
+            try:
+                return request(), estimated
+            except Exception as e:
+                self.token_bucket.adjust(-estimated)
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                wait = self.backoff(attempt, e)
+                print(f"⏳ 请求失败（{type(e).__name__}），{wait:.1f} 秒后重试 ({attempt+1}/{self.max_retries})")
+                time.sleep(wait)
+
+    def settle(self, usage, estimated):
+        """按实际用量修正token桶"""
+        if usage is not None:
+            actual = (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+            self.token_bucket.adjust(actual - estimated)
+
+    def call(self, request, params):
+        """执行请求：熔断检查 → 限流 → 失败时退避重试"""
+        response, estimated = self.attempt(request, params)
+        self.breaker.record_success()
+        self.settle(getattr(response, 'usage', None), estimated)
+        return response
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+配置服务
+config.yaml 和 templates.json 在进程内只解析一次并校验，生成器、发布器、调度器共用同一份快照；
+文件修改后（mtime/大小变化）重新解析，校验通过才整体替换快照，并通知订阅者，运行中的任务不需要重启
+"""
+
+import os
+import re
+import json
+import threading
+from collections import namedtuple
+
+
+# 一份完整的配置：config.yaml、templates.json 和版本号（每次成功重新加载后加1）
+ConfigSnapshot = namedtuple("ConfigSnapshot", ["config", "templates", "version"])
+
+
+class ConfigError(ValueError):
+    """配置文件无法解析或未通过校验"""
+
+
+# config.yaml 的必填项及类型（嵌套字典表示子项）
+CONFIG_SCHEMA = {
+    "product": {
+        "name": str,
+        "url": str,
+        "description": str,
+        "features": list,
+        "target_users": list,
+        "pain_points": list
+    },
+    "content_strategy": {
+        "post_times": list,
+        "content_types": list
+    },
+    "hashtags": {
+        "primary": list,
+        "secondary": list,
+        "optional": list
+    },
+    "ai": {
+        "model": str,
+        "temperature": (int, float),
+        "max_tokens": int
+    },
+    "image": {
+        "count": int,
+        "save_path": str
+    },
+    "publish": {
+        "auto_publish": bool,
+        "log_path": str
+    },
+    "storage": {
+        "content_db": str
+    }
+}
+
+# 每个模板的必填项
+TEMPLATE_SCHEMA = {
+    "name": str,
+    "title_pattern": str,
+    "content_structure": list,
+    "style": str,
+    "emoji_density": str
+}
+
+TIME_PATTERN = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+MISFIRE_POLICIES = ("skip", "run_once", "all")
+
+
+def _check_schema(data, schema, prefix, problems):
+    if not isinstance(data, dict):
+        problems.append(f"{prefix or '根节点'} 应为字典")
+        return
+    for key, expected in schema.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if key not in data:
+            problems.append(f"缺少 {path}")
+        elif isinstance(expected, dict):
+            _check_schema(data[key], expected, path, problems)
+        elif not isinstance(data[key], expected) or (expected is int and isinstance(data[key], bool)):
+            problems.append(f"{path} 类型错误")
+
+
+def validate(config, templates):
+    """校验配置和模板，返回问题列表（为空表示通过）"""
+    problems = []
+    _check_schema(config, CONFIG_SCHEMA, "", problems)
+    _check_schema(templates, {"templates": dict, "variables": dict}, "templates.json", problems)
+    if problems:
+        # 结构不完整时不再做下面的细项检查
+        return problems
+
+    template_defs = templates['templates']
+    variables = templates['variables']
+
+    for template_id, template in template_defs.items():
+        _check_schema(template, TEMPLATE_SCHEMA, f"templates.{template_id}", problems)
+        if isinstance(template, dict) and isinstance(template.get('title_pattern'), str):
+            for name in PLACEHOLDER_PATTERN.findall(template['title_pattern']):
+                if name not in variables:
+                    problems.append(f"templates.{template_id} 的标题变量 {{{name}}} 未在 variables 中定义")
+
+    for name, values in variables.items():
+        if not isinstance(values, list) or not values:
+            problems.append(f"variables.{name} 应为非空列表")
+
+    for post_time in config['content_strategy']['post_times']:
+        if not isinstance(post_time, str) or not TIME_PATTERN.match(post_time):
+            problems.append(f"content_strategy.post_times 中的 {post_time!r} 不是 HH:MM 格式")
+
+    content_types = config['content_strategy']['content_types']
+    if not content_types:
+        problems.append("content_strategy.content_types 不能为空")
+    for i, content_type in enumerate(content_types):
+        prefix = f"content_strategy.content_types[{i}]"
+        if not isinstance(content_type, dict):
+            problems.append(f"{prefix} 应为字典")
+            continue
+        if not isinstance(content_type.get('name'), str):
+            problems.append(f"{prefix}.name 缺失或类型错误")
+        weight = content_type.get('weight')
+        if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight <= 0:
+            problems.append(f"{prefix}.weight 应为正数")
+        ids = content_type.get('templates')
+        if not isinstance(ids, list) or not ids:
+            problems.append(f"{prefix}.templates 应为非空列表")
+            continue
+        for template_id in ids:
+            if template_id not in template_defs:
+                problems.append(f"{prefix} 引用了不存在的模板 {template_id}")
+
+    for pool in ("primary", "secondary", "optional"):
+        tags = config['hashtags'][pool]
+        if not tags or not all(isinstance(tag, str) for tag in tags):
+            problems.append(f"hashtags.{pool} 应为非空的字符串列表")
+
+    temperature = config['ai']['temperature']
+    if not 0 <= temperature <= 1:
+        problems.append("ai.temperature 应在 0-1 之间")
+
+    accounts = config.get('accounts') or []
+    if not isinstance(accounts, list):
+        problems.append("accounts 应为列表")
+        accounts = []
+    names = set()
+    for i, account in enumerate(accounts):
+        prefix = f"accounts[{i}]"
+        if not isinstance(account, dict):
+            problems.append(f"{prefix} 应为字典")
+            continue
+        name = account.get('name')
+        if not isinstance(name, str) or not name:
+            problems.append(f"{prefix}.name 缺失或类型错误")
+        elif name in names:
+            problems.append(f"{prefix}.name 重复: {name}")
+        names.add(name)
+        if not isinstance(account.get('base_url'), str):
+            problems.append(f"{prefix}.base_url 缺失或类型错误")
+        for post_time in account.get('post_times') or []:
+            if not isinstance(post_time, str) or not TIME_PATTERN.match(post_time):
+                problems.append(f"{prefix}.post_times 中的 {post_time!r} 不是 HH:MM 格式")
+
+    misfire = config.get('scheduler', {}).get('misfire', 'run_once')
+    if misfire not in MISFIRE_POLICIES:
+        problems.append(f"scheduler.misfire 应为 {' / '.join(MISFIRE_POLICIES)}")
+
+    report_time = config.get('monitoring', {}).get('report_time', '09:00')
+    if not isinstance(report_time, str) or not TIME_PATTERN.match(report_time):
+        problems.append(f"monitoring.report_time {report_time!r} 不是 HH:MM 格式")
+    report_interval = config.get('monitoring', {}).get('report_interval', 7)
+    if not isinstance(report_interval, int) or report_interval < 1:
+        problems.append("monitoring.report_interval 应为不小于1的整数")
+
+    for collect_time in config.get('engagement', {}).get('collect_times') or []:
+        if not isinstance(collect_time, str) or not TIME_PATTERN.match(collect_time):
+            problems.append(f"engagement.collect_times 中的 {collect_time!r} 不是 HH:MM 格式")
+
+    return problems
+
+
+def _parse_yaml(f):
+    # yaml 只在第一次解析配置时导入
+    import yaml
+    return yaml.safe_load(f)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ConfigService:
+    def __init__(self, config_path="config/config.yaml", templates_path="config/templates.json"):
+        """
+        初始化配置服务
+
+        首次加载失败（文件缺失、格式错误、未通过校验）时抛出 ConfigError
+        """
+        self.config_path = os.path.abspath(config_path)
+        self.templates_path = os.path.abspath(templates_path)
+
+        self._snapshot = None
+        self._loaded = None   # 当前快照对应的文件签名
+        self._failed = None   # 最近一次加载失败的文件签名，文件未再变化时不重复报错
+        self._lock = threading.Lock()
+        self._listeners = []
+
+        self._watcher = None
+        self._stop = threading.Event()
+
+        self.reload(strict=True)
+
+    @property
+    def snapshot(self):
+        """当前快照（config 和 templates 一起读取，保证是同一版本）"""
+        return self._snapshot
+
+    @property
+    def config(self):
+        return self._snapshot.config
+
+    @property
+    def templates(self):
+        return self._snapshot.templates
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def subscribe(self, callback):
+        """订阅配置变化，重新加载成功后调用 callback(旧快照, 新快照)"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅（对象关闭后不再收到配置变化）"""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _load(self):
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                config = _parse_yaml(f)
+            with open(self.templates_path, 'r', encoding='utf-8') as f:
+                templates = json.load(f)
+        except Exception as e:
+            raise ConfigError(f"配置文件解析失败: {str(e)}") from e
+
+        problems = validate(config, templates)
+        if problems:
+            raise ConfigError("配置校验失败:\n   " + "\n   ".join(problems))
+        return config, templates
+
+    def reload(self, strict=False):
+        """
+        文件有变化时重新加载，返回是否替换了快照
+
+        新配置未通过校验时保留旧快照继续运行（strict 为True时抛出 ConfigError）
+        """
+        with self._lock:
+            signature = (_signature(self.config_path), _signature(self.templates_path))
+            if signature == self._loaded or (signature == self._failed and not strict):
+                return False
+
+            try:
+                config, templates = self._load()
+            except ConfigError as e:
+                self._failed = signature
+                if strict:
+                    raise
+                print(f"⚠️  {str(e)}\n   继续使用上一版配置")
+                return False
+
+            old = self._snapshot
+            # 整体替换引用，读取方要么拿到旧快照，要么拿到新快照
+            self._snapshot = ConfigSnapshot(config, templates, old.version + 1 if old else 1)
+            self._loaded = signature
+            self._failed = None
+            new = self._snapshot
+            listeners = list(self._listeners)
+
+        if old is not None:
+            print(f"🔄 配置已重新加载（版本 {new.version}）")
+            for callback in listeners:
+                try:
+                    callback(old, new)
+                except Exception as e:
+                    print(f"⚠️  应用新配置失败: {str(e)}")
+        return True
+
+    def watch(self, interval=5):
+        """在后台线程每 interval 秒检查一次文件变化（重复调用不会启动多个线程）"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=loop, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(config_path="config/config.yaml", templates_path=None):
+    """
+    获取共享的配置服务（同一对文件在进程内只有一个实例）
+
+    templates_path 为空时使用 config.yaml 同目录下的 templates.json
+    """
+    if templates_path is None:
+        templates_path = os.path.join(os.path.dirname(os.path.abspath(config_path)), "templates.json")
+    key = (os.path.abspath(config_path), os.path.abspath(templates_path))
+
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = ConfigService(*key)
+            _services[key] = service
+    return service
+
+
+def load_config(path="config/config.yaml"):
+    """加载 config.yaml（返回共享的当前快照，调用方不要修改）"""
+    service = get_service(path)
+    service.reload()
+    return service.config
+
+
+def clear_cache():
+    """丢弃所有配置服务（已启动的监视线程会停止）"""
+    with _services_lock:
+        for service in _services.values():
+            service.stop_watching()
+        _services.clear()
@@ -5,32 +5,125 @@
 """
 
 import os
-import json
+import time
 import random
-import yaml
-from anthropic import Anthropic
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from content_store import ContentStore
+from response_cache import ResponseCache
+from api_client import ResilientClient, estimate_tokens, is_retryable
+from dedup import SimHashIndex, simhash
+from publish_log import PublishLog
+from config_loader import get_service
+from prompt_templates import PromptEngine
 
 
-class ContentGenerator:
-    def __init__(self, config_path="config/config.yaml", templates_path="config/templates.json"):
-        """初始化内容生成器"""
-        # 加载配置
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+# 记录的token用量字段（包括提示词缓存的写入/命中数）
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+class TitleTooLongError(ValueError):
+    """流式生成时标题超过长度限制"""
 
-        # 加载模板
-        with open(templates_path, 'r', encoding='utf-8') as f:
-            self.templates = json.load(f)
 
-        # 初始化Claude客户端
-        api_key = os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("请设置环境变量 ANTHROPIC_API_KEY")
-        self.client = Anthropic(api_key=api_key)
+class DuplicateContentError(ValueError):
+    """生成的内容与已有内容近似重复"""
 
-        # 产品信息
-        self.product = self.config['product']
+
+class ContentGenerator:
+    def __init__(self, config_path="config/config.yaml", templates_path=None, client=None):
+        """
+        初始化内容生成器
+
+        templates_path 为空时使用 config.yaml 同目录下的 templates.json，client 可传入模拟客户端用于测试
+        """
+        # 共享的配置服务（配置文件修改后自动使用新配置）
+        self.settings = get_service(config_path, templates_path)
+        self.settings.subscribe(self._on_config_change)
+
+        # Claude客户端在第一次调用API时创建
+        self._raw_client = client
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        # 内容存储
+        self.store = ContentStore(self.config['storage']['content_db'])
+
+        # 近似重复检测
+        self._dedup_index = None
+        self._dedup_lock = threading.Lock()
+
+        # 响应缓存
+        cache_config = self.config.get('cache', {})
+        self.use_cache = cache_config.get('enabled', False)
+        self.cache = ResponseCache(
+            cache_config.get('db_path', 'logs/response_cache.db'),
+            ttl_seconds=cache_config.get('ttl_hours', 168) * 3600,
+            max_entries=cache_config.get('max_entries', 1000),
+            max_bytes=cache_config.get('max_size_mb', 50) * 1024 * 1024
+        )
+
+        # 批量内容计划（首次使用时创建）
+        self._planner = None
+
+        # 编译好的提示词模板（首次使用时编译）
+        self._prompts = None
+
+    @property
+    def config(self):
+        return self.settings.config
+
+    @property
+    def templates(self):
+        return self.settings.templates
+
+    @property
+    def product(self):
+        """产品信息"""
+        return self.config['product']
+
+    def _on_config_change(self, old, new):
+        """配置重新加载后，让内容计划使用新的权重、模板和标签"""
+        if self._planner is not None:
+            self._planner.update(new.config, new.templates)
+
+    def close(self):
+        """取消订阅配置变化（共享的配置服务不再持有本对象）"""
+        self.settings.unsubscribe(self._on_config_change)
+
+    @property
+    def client(self):
+        """
+        带限流、退避重试和熔断的Claude客户端（首次使用时创建）
+
+        anthropic SDK 在这里才导入，只查看或导入内容的命令不需要 API Key
+        """
+        with self._client_lock:
+            if self._client is None:
+                client = self._raw_client
+                if client is None:
+                    api_key = os.environ.get("ANTHROPIC_API_KEY")
+                    if not api_key:
+                        raise ValueError("请设置环境变量 ANTHROPIC_API_KEY")
+                    from anthropic import Anthropic
+                    # 重试由 ResilientClient 统一处理，关闭SDK自带的重试
+                    client = Anthropic(api_key=api_key, max_retries=0)
+                self._client = ResilientClient(client, self.config['ai'].get('rate_limit', {}))
+        return self._client
+
+    @property
+    def planner(self):
+        """内容计划器（首次使用时创建，numpy 在这里才导入）"""
+        if self._planner is None:
+            from planner import ContentPlanner
+            seed = self.config.get('planner', {}).get('seed')
+            self._planner = ContentPlanner(self.config, self.templates, seed=seed)
+        return self._planner
+
+    @planner.setter
+    def planner(self, planner):
+        self._planner = planner
 
     def select_content_type(self):
         """根据权重随机选择内容类型"""
@@ -60,148 +153,594 @@ class ContentGenerator:
         # 1-2个可选标签
         selected.extend(random.sample(optional, min(2, len(optional))))
 
-        # 去重并限制数量
-        selected = list(set(selected))[:count]
+        # 去重（保持选择顺序）并限制数量
+        selected = list(dict.fromkeys(selected))[:count]
 
         # 格式化
         return [f"#{tag}" for tag in selected]
 
-    def build_prompt(self, template, content_type):
-        """构建AI提示词"""
-        # 替换模板变量
-        title_pattern = template['title_pattern']
-        for var_name, var_values in self.templates['variables'].items():
-            placeholder = f"{{{var_name}}}"
-            if placeholder in title_pattern:
-                title_pattern = title_pattern.replace(placeholder, random.choice(var_values))
-
-        prompt = f"""你是一个专业的小红书营销文案专家，擅长创作高互动量的内容。
-
-【产品信息】
-名称：{self.product['name']}
-网址：{self.product['url']}
-简介：{self.product['description']}
-功能：{', '.join(self.product['features'])}
-目标用户：{', '.join(self.product['target_users'])}
-核心痛点：{', '.join(self.product['pain_points'])}
-
-【内容类型】{content_type['name']}
-
-【模板信息】
-标题参考：{title_pattern}
-内容结构：{', '.join(template['content_structure'])}
-写作风格：{template['style']}
-表情符号密度：{template['emoji_density']}
-
-【要求】
-1. 标题：12-20字，吸引眼球，可以使用数字或疑问句
-2. 正文：200-350字，分段清晰，多用emoji（根据密度要求）
-3. 风格：口语化、接地气、有共鸣感、真诚
-4. 避免：绝对化用语（最好、第一）、夸大宣传、虚假承诺
-5. 重点：突出产品价值，解决用户痛点，提供实用信息
-
-【参考优秀案例风格】
-"做了半年Temu，终于找到宝藏工具了！🎉
-
-之前每天光是上架产品就要花3个小时😭
-- 手动复制粘贴商品信息
-- 一个个核对价格
-- 库存变动要手动更新
-
-直到我发现了这个神器！⚡️
-
-现在效率提升10倍，每天多出2小时去优化策略💪"
-
-请生成一篇完整的小红书笔记内容，包括：
-1. 标题（不要加"标题："前缀）
-2. 正文内容
-3. 不需要包含话题标签（我会单独添加）
-
-注意：
-- 不要使用markdown格式
-- 直接输出纯文本
-- 标题和正文之间用空行分隔
-- 保持真实感，像真人在分享经验
-"""
-        return prompt
+    @property
+    def prompts(self):
+        """当前配置快照编译好的提示词模板（配置重新加载后重新编译）"""
+        snapshot = self.settings.snapshot
+        engine = self._prompts
+        if engine is None or engine.version != snapshot.version:
+            engine = PromptEngine(snapshot.config, snapshot.templates, snapshot.version)
+            self._prompts = engine
+        return engine
+
+    def build_system_prompt(self):
+        """
+        构建系统提示词（产品信息 + 写作要求 + 参考案例）
+
+        这部分每次请求都相同，作为可缓存的前缀发送；每份配置只渲染一次
+        """
+        return self.prompts.system_prompt
+
+    def build_prompt(self, template, content_type, variables=None):
+        """构建每次请求变化的提示词（内容类型 + 模板信息，variables 为计划好的标题变量取值）"""
+        return self.prompts.render(template, content_type, variables)
+
+    def build_request(self, prompt):
+        """
+        构建 messages.create 的请求参数
+
+        系统提示词带 cache_control 标记，重复生成时命中服务端的提示词缓存
+        """
+        ai_config = self.config['ai']
+
+        system = {"type": "text", "text": self.build_system_prompt()}
+        if ai_config.get('prompt_cache', True):
+            system["cache_control"] = {"type": "ephemeral"}
+
+        return {
+            "model": ai_config['model'],
+            "max_tokens": ai_config['max_tokens'],
+            "temperature": ai_config['temperature'],
+            "system": [system],
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+
+    @staticmethod
+    def extract_usage(message):
+        """从响应中提取token用量（包括提示词缓存的写入/命中数）"""
+        usage = getattr(message, 'usage', None)
+        return {field: getattr(usage, field, 0) or 0 for field in USAGE_FIELDS}
+
+    def _attempt_usage(self, stream, request, text):
+        """
+        中途结束（连接断开、标题超长）的流式请求已消耗的token
+
+        优先读取已收到的消息快照（输入token在开始时就已返回），没有时按字数估算；输出至少按已收到的字数计
+        """
+        try:
+            snapshot = getattr(stream, 'current_message_snapshot', None)
+        except Exception:
+            snapshot = None
+        usage = self.extract_usage(snapshot)
+        if not usage['input_tokens']:
+            usage['input_tokens'] = estimate_tokens(dict(request, max_tokens=0))
+        usage['output_tokens'] = max(usage['output_tokens'], len(text))
+        return usage
+
+    def _stream_message(self, params, verbose=True, timing=None, usage=None):
+        """
+        流式调用Claude API，返回 (最终消息, 完整回复文本)（收到第一段文本的时间写入 timing['first_token']）
+
+        第一行（标题）一到达就检查长度，超长时立即中断并抛出 TitleTooLongError；
+        收到的文本实时追加到 logs/partial/ 下的文件。连接中途断开时把已收到的文本作为助手回复的开头重新请求，
+        模型从断开处继续生成（最多 ai.stream_resumes 次），已收到的部分不用重新生成；仍然失败时保留该文件。
+        每次请求（包括中途断开的）的token用量累加到 usage 中，失败时也已累加
+        """
+        max_title_length = self.config['publish'].get('title_max_length', 20)
+        resumes = self.config['ai'].get('stream_resumes', 2)
+        partial_dir = self.config['storage'].get('partial_dir', 'logs/partial')
+        os.makedirs(partial_dir, exist_ok=True)
+        if usage is None:
+            usage = dict.fromkeys(USAGE_FIELDS, 0)
+
+        def add_usage(part):
+            for field in USAGE_FIELDS:
+                usage[field] += part[field]
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        partial_path = os.path.join(partial_dir, f"partial_{timestamp}.txt")
+
+        received = []
+        title_checked = False
+
+        with open(partial_path, 'w', encoding='utf-8') as partial:
+            for attempt in range(resumes + 1):
+                request = params
+                # 助手回复的开头不能以空白结尾
+                prefix = ''.join(received).rstrip()
+                if prefix:
+                    request = dict(params, messages=params['messages'] + [{"role": "assistant", "content": prefix}])
+                    received = [prefix]
+                    # 文件内容与作为回复开头发送的文本保持一致
+                    partial.seek(0)
+                    partial.truncate()
+                    partial.write(prefix)
+                    partial.flush()
+
+                stream = None
+                try:
+                    with self.client.messages.stream(**request) as stream:
+                        for text in stream.text_stream:
+                            if not received and timing is not None:
+                                timing['first_token'] = time.perf_counter()
+                            received.append(text)
+                            partial.write(text)
+                            partial.flush()
+
+                            if not title_checked:
+                                head = ''.join(received).lstrip()
+                                if '\n' in head:
+                                    title = head.split('\n', 1)[0].strip()
+                                    title_checked = True
+                                    if verbose:
+                                        print(f"📌 标题已生成: {title}")
+                                    if len(title) > max_title_length:
+                                        raise TitleTooLongError(
+                                            f"标题过长 ({len(title)}字)，限制为{max_title_length}字"
+                                        )
+
+                        message = stream.get_final_message()
+                    add_usage(self.extract_usage(message))
+                    break
+
+                except TitleTooLongError:
+                    add_usage(self._attempt_usage(stream, request, ''.join(received)[len(prefix):]))
+                    partial.close()
+                    os.remove(partial_path)
+                    raise
+
+                except Exception as e:
+                    if stream is not None:
+                        # 连接建立后才断开，已生成的部分同样计费
+                        add_usage(self._attempt_usage(stream, request, ''.join(received)[len(prefix):]))
+                    # 服务端明确拒绝的请求（参数错误等）继续生成也不会成功
+                    if attempt == resumes or (getattr(e, 'status_code', None) is not None and not is_retryable(e)):
+                        if received:
+                            print(f"⚠️  连接中断，已收到的 {len(''.join(received))} 字保存在: {partial_path}")
+                        raise
+                    print(f"⚠️  连接中断（{type(e).__name__}），从已收到的 {len(''.join(received))} 字继续生成"
+                          f" ({attempt+1}/{resumes})")
+
+        os.remove(partial_path)
+        return message, ''.join(received)
+
+    def _pick_variant(self):
+        """
+        选择缓存变体编号
+
+        temperature>0 时同一提示词可缓存 cache.variants 个不同版本，每次随机取其中一个
+        """
+        variants = self.config.get('cache', {}).get('variants', 1)
+        if self.config['ai']['temperature'] > 0 and variants > 1:
+            return random.randrange(variants)
+        return None
+
+    def record_call(self, record, message=None, status="ok", started=None, first_token=None, error=None,
+                    usage=None):
+        """
+        记录一次API调用的token用量、停止原因和耗时，返回记录ID
+
+        usage 不为None时代替 message 中的用量（流式生成中途断开后继续时为各次请求的合计）
+
+        monitoring.track_metrics 关闭时不记录；记录失败不影响生成
+        """
+        if not self.config.get('monitoring', {}).get('track_metrics', False):
+            return None
+
+        now = time.perf_counter()
+        record = dict(record, status=status, error=error)
+        if usage is not None:
+            record.update(usage)
+        if message is not None:
+            if usage is None:
+                record.update(self.extract_usage(message))
+            record['stop_reason'] = getattr(message, 'stop_reason', None)
+            record['model'] = getattr(message, 'model', None) or record.get('model')
+        if started is not None:
+            record['latency_ms'] = (now - started) * 1000
+        if first_token is not None:
+            record['ttft_ms'] = (first_token - started) * 1000
 
-    def generate_content(self, test_mode=False):
-        """生成内容"""
         try:
-            # 选择内容类型和模板
+            return self.store.add_call(record)
+        except Exception as e:
+            print(f"⚠️  调用记录保存失败: {str(e)}")
+            return None
+
+    def _complete(self, prompt, content_type, template, verbose=True, stream=False, use_cache=True):
+        """调用模型（优先读取响应缓存），返回 (回复文本, token用量, 调用记录ID)"""
+        params = self.build_request(prompt)
+        record = {
+            "model": params['model'],
+            "mode": "stream" if stream else "create",
+            "content_type": content_type['name'],
+            "template": template['name']
+        }
+
+        key = None
+        if self.use_cache and use_cache:
+            key = self.cache.make_key(params, self._pick_variant())
+            cached = self.cache.get(key)
+            if cached is not None:
+                if verbose:
+                    print("♻️  命中响应缓存")
+                # 命中缓存没有实际消耗token
+                call_id = self.record_call(dict(record, mode="cache"))
+                return cached['text'], cached['usage'], call_id
+
+        timing = {}
+        # 流式生成时为各次请求（含中途断开的）的用量合计
+        usage = dict.fromkeys(USAGE_FIELDS, 0) if stream else None
+        started = time.perf_counter()
+        try:
+            if stream:
+                message, text = self._stream_message(params, verbose, timing, usage)
+            else:
+                message = self.client.messages.create(**params)
+                text = message.content[0].text
+        except TitleTooLongError as e:
+            self.record_call(record, status="title_too_long", started=started,
+                             first_token=timing.get('first_token'), error=str(e), usage=usage)
+            raise
+        except Exception as e:
+            self.record_call(record, status="error", started=started,
+                             first_token=timing.get('first_token'), error=str(e)[:500], usage=usage)
+            raise
+
+        call_id = self.record_call(record, message, started=started, first_token=timing.get('first_token'),
+                                   usage=usage)
+
+        if usage is None:
+            usage = self.extract_usage(message)
+
+        if key is not None:
+            self.cache.put(key, {"text": text, "usage": usage})
+
+        return text, usage, call_id
+
+    @property
+    def dedup_index(self):
+        """近似重复索引（首次使用时从内容存储加载全部指纹）"""
+        with self._dedup_lock:
+            if self._dedup_index is None:
+                index = SimHashIndex(self.config.get('dedup', {}).get('max_distance', 6))
+                for content_id, fingerprint in self.store.iter_simhashes():
+                    index.add(content_id, fingerprint)
+                self._dedup_index = index
+        return self._dedup_index
+
+    def fingerprint(self, content):
+        """内容指纹（标题 + 正文）"""
+        ngram = self.config.get('dedup', {}).get('ngram', 3)
+        return simhash(f"{content['title']}\n{content['content']}", ngram)
+
+    def check_duplicate(self, content, pending=None):
+        """
+        检查内容是否与已保存的内容近似重复，重复时返回 (已有内容ID, 海明距离)
+
+        内容在 save_content 中才以内容ID加入索引；pending 为同一批生成中已通过检查的内容
+        （尚未保存的临时索引），不重复时加入 pending，同一批并发生成的内容之间也会互相查重
+        """
+        if not self.config.get('dedup', {}).get('enabled', False):
+            return None
+        fingerprint = self.fingerprint(content)
+        match = self.dedup_index.find(fingerprint)
+        if match is None and pending is not None:
+            key = f"本批第{len(pending) + 1}篇"
+            match = pending.check_and_add(key, fingerprint)
+        return match
+
+    def _generate_one(self, test_mode=False, verbose=True, stream=None, item=None, pending=None):
+        """
+        生成单篇内容（失败时抛出异常，由调用方决定如何处理；item 为内容计划中的一项）
+
+        近似重复时跳过响应缓存并重新抽取一项内容计划，避免再次得到同一个回复
+        """
+        retries = self.config.get('dedup', {}).get('max_retries', 2)
+
+        use_cache = True
+        for attempt in range(retries + 1):
+            result = self._generate_once(test_mode, verbose, stream, item, use_cache)
+
+            match = self.check_duplicate(result, pending)
+            if match is None:
+                break
+
+            message = f"与已有内容 #{match[0]} 近似重复（距离 {match[1]}）"
+            if attempt == retries:
+                raise DuplicateContentError(message)
+            if verbose:
+                print(f"♻️  {message}，重新生成 ({attempt+1}/{retries})")
+            use_cache = False
+            if item is not None:
+                item = self.plan(1)[0]
+
+        if verbose:
+            print(f"\n✅ 内容生成成功！\n")
+            print(f"标题: {result['title']}")
+            print(f"\n正文预览:\n{result['content'][:100]}...\n")
+            print(f"话题标签: {' '.join(result['tags'])}")
+            usage = result['usage']
+            print(f"Token用量: 输入 {usage['input_tokens']} / 输出 {usage['output_tokens']} / "
+                  f"缓存命中 {usage['cache_read_input_tokens']} / 缓存写入 {usage['cache_creation_input_tokens']}")
+
+        return result
+
+    def _generate_once(self, test_mode=False, verbose=True, stream=None, item=None, use_cache=True):
+        """调用一次模型生成内容（use_cache 为 False 时不读取响应缓存）"""
+        if stream is None:
+            stream = self.config['ai'].get('stream', False)
+
+        # 选择内容类型和模板（有内容计划时按计划）
+        if item is not None:
+            content_type = item['content_type']
+            template = item['template']
+            variables = item['variables']
+            tags = item['tags']
+        else:
             content_type = self.select_content_type()
             template = self.select_template(content_type)
+            variables = None
+            tags = None
 
+        if verbose:
             print(f"📝 正在生成内容...")
             print(f"内容类型: {content_type['name']}")
             print(f"模板: {template['name']}")
 
+        if stream:
+            # 流式生成：标题超长时提前中断并重新生成
+            retries = self.config['ai'].get('title_retries', 2)
+            for attempt in range(retries + 1):
+                prompt = self.build_prompt(template, content_type, variables)
+                try:
+                    text, usage, call_id = self._complete(prompt, content_type, template, verbose,
+                                                          stream=True, use_cache=use_cache)
+                    break
+                except TitleTooLongError as e:
+                    if attempt == retries:
+                        raise
+                    if verbose:
+                        print(f"⚠️  {str(e)}，提前中断并重新生成 ({attempt+1}/{retries})")
+        else:
             # 构建提示词
-            prompt = self.build_prompt(template, content_type)
+            prompt = self.build_prompt(template, content_type, variables)
 
             # 调用Claude API
-            ai_config = self.config['ai']
-            message = self.client.messages.create(
-                model=ai_config['model'],
-                max_tokens=ai_config['max_tokens'],
-                temperature=ai_config['temperature'],
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            # 解析响应
-            content = message.content[0].text.strip()
-
-            # 分离标题和正文
-            lines = content.split('\n', 1)
-            if len(lines) == 2:
-                title = lines[0].strip()
-                body = lines[1].strip()
-            else:
-                # 如果没有正确分离，尝试其他方式
-                paragraphs = content.split('\n\n')
-                title = paragraphs[0].strip()
-                body = '\n\n'.join(paragraphs[1:]).strip()
-
-            # 生成话题标签
-            hashtags = self.generate_hashtags()
-
-            # 组装完整内容
-            result = {
-                "title": title,
-                "content": body,
-                "tags": hashtags,
-                "content_type": content_type['name'],
-                "template": template['name'],
-                "generated_at": datetime.now().isoformat(),
-                "test_mode": test_mode
-            }
-
-            print(f"\n✅ 内容生成成功！\n")
-            print(f"标题: {title}")
-            print(f"\n正文预览:\n{body[:100]}...\n")
-            print(f"话题标签: {' '.join(hashtags)}")
-
-            return result
+            text, usage, call_id = self._complete(prompt, content_type, template, verbose,
+                                                  stream=False, use_cache=use_cache)
+
+        # 解析响应
+        title, body = self.parse_response(text)
+
+        # 组装完整内容
+        result = self.build_result(title, body, content_type['name'], template['name'], usage, test_mode, tags)
+        result['call_id'] = call_id
+        return result
+
+    @staticmethod
+    def parse_response(text):
+        """分离标题和正文"""
+        content = text.strip()
+
+        lines = content.split('\n', 1)
+        if len(lines) == 2:
+            title = lines[0].strip()
+            body = lines[1].strip()
+        else:
+            # 如果没有正确分离，尝试其他方式
+            paragraphs = content.split('\n\n')
+            title = paragraphs[0].strip()
+            body = '\n\n'.join(paragraphs[1:]).strip()
+
+        return title, body
+
+    def build_result(self, title, body, content_type_name, template_name, usage, test_mode=False, tags=None):
+        """组装完整内容（附加话题标签和token用量，tags 为空时随机生成）"""
+        return {
+            "title": title,
+            "content": body,
+            "tags": tags or self.generate_hashtags(),
+            "content_type": content_type_name,
+            "template": template_name,
+            "generated_at": datetime.now().isoformat(),
+            "test_mode": test_mode,
+            "usage": usage
+        }
+
+    def generate_content(self, test_mode=False, stream=None):
+        """生成内容（stream 为 None 时读取 ai.stream 配置）"""
+        try:
+            return self._generate_one(test_mode=test_mode, stream=stream)
 
         except Exception as e:
             print(f"❌ 生成失败: {str(e)}")
             return None
 
-    def save_content(self, content, filename=None):
-        """保存生成的内容"""
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"content_{timestamp}.json"
-
-        filepath = os.path.join("logs", filename)
+    def plan(self, count):
+        """
+        生成 count 篇内容的计划（内容类型、模板、标题变量、话题标签）
+
+        按 weight 目标均衡覆盖，并参考发布日志中近 planner.lookback_days 天的使用情况
+        """
+        lookback_days = self.config.get('planner', {}).get('lookback_days', 14)
+        publish_log = PublishLog(self.config['publish'].get('log_path', 'logs/publish_log.jsonl'))
+        recent = self.planner.recent_usage(publish_log.iter_entries(), days=lookback_days)
+        return self.planner.plan(count, recent)
+
+    def generate_batch(self, count, concurrency=None, test_mode=False, stream=None, plan=None):
+        """
+        并发批量生成内容
+
+        按内容计划生成（plan 为空时自动生成计划），
+        同时在途的API请求数不超过 concurrency，单篇失败不影响其他篇。
+        返回列表与提交顺序一致，每项为：
+        {"index": 序号, "status": "success"/"error", "content": 内容或None, "error": 错误信息或None}
+        """
+        if concurrency is None:
+            concurrency = self.config['ai'].get('concurrency', 1)
+        concurrency = max(1, min(concurrency, count))
+
+        print(f"🚀 批量生成 {count} 篇内容（并发数: {concurrency}）")
+
+        if plan is None:
+            plan = self.plan(count)
+
+        results = [None] * count
+        # 本批已通过查重、尚未保存的内容
+        pending = SimHashIndex(self.config.get('dedup', {}).get('max_distance', 6))
+        # 单线程时保留逐篇的详细输出，多线程时输出会交错，只打印汇总
+        verbose = concurrency == 1
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(self._generate_one, test_mode, verbose, stream, plan[i], pending): i
+                for i in range(count)
+            }
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(content, f, ensure_ascii=False, indent=2)
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    content = future.result()
+                    results[i] = {"index": i, "status": "success", "content": content, "error": None}
+                    print(f"   ✓ [{i+1}/{count}] {content['title']}")
+                except Exception as e:
+                    results[i] = {"index": i, "status": "error", "content": None, "error": str(e)}
+                    print(f"   ✗ [{i+1}/{count}] 生成失败: {str(e)}")
+
+        succeeded = sum(1 for r in results if r['status'] == 'success')
+        print(f"\n📊 批量生成完成: 成功 {succeeded} 篇，失败 {count - succeeded} 篇")
+        if self.use_cache:
+            print(f"   响应缓存: 命中 {self.cache.session_hits} 次，未命中 {self.cache.session_misses} 次")
+
+        return results
+
+    def submit_batch(self, count, test_mode=False):
+        """
+        通过 Message Batches API 一次提交 count 个生成请求
+
+        批任务ID和每个请求的元信息保存在内容存储中，稍后用 collect_batches 收取
+        """
+        requests = []
+        meta = {}
+
+        for i, item in enumerate(self.plan(count)):
+            content_type = item['content_type']
+            template = item['template']
+            prompt = self.build_prompt(template, content_type, item['variables'])
+
+            custom_id = f"note-{i+1:04d}"
+            requests.append({"custom_id": custom_id, "params": self.build_request(prompt)})
+            meta[custom_id] = {
+                "content_type": content_type['name'],
+                "template": template['name'],
+                "tags": item['tags'],
+                "test_mode": test_mode
+            }
 
-        print(f"💾 内容已保存到: {filepath}")
-        return filepath
+        batch = self.client.messages.batches.create(requests=requests)
+        self.store.add_batch(batch.id, meta)
+
+        print(f"📦 已提交批任务: {batch.id}（{count} 篇）")
+        print("   稍后运行 --batch-collect 收取结果")
+        return batch.id
+
+    def collect_batches(self):
+        """
+        收取所有已完成的批任务，解析结果并保存到内容存储
+
+        返回本次保存的内容ID列表，未完成的批任务留待下次收取
+        """
+        saved = []
+
+        for batch in self.store.list_batches(status="submitted"):
+            batch_id = batch['batch_id']
+            status = self.client.messages.batches.retrieve(batch_id)
+
+            if status.processing_status != "ended":
+                print(f"⏳ 批任务 {batch_id} 仍在处理中（{status.processing_status}）")
+                continue
+
+            succeeded = 0
+            failed = 0
+            for entry in self.client.messages.batches.results(batch_id):
+                meta = batch['requests'].get(entry.custom_id)
+                if meta is None or entry.result.type != "succeeded":
+                    failed += 1
+                    if meta is not None:
+                        self.record_call(
+                            {"model": self.config['ai']['model'], "mode": "batch",
+                             "content_type": meta['content_type'], "template": meta['template']},
+                            status=entry.result.type
+                        )
+                    print(f"   ✗ {entry.custom_id}: {entry.result.type}")
+                    continue
+
+                message = entry.result.message
+                call_id = self.record_call(
+                    {"model": self.config['ai']['model'], "mode": "batch",
+                     "content_type": meta['content_type'], "template": meta['template']},
+                    message
+                )
+                title, body = self.parse_response(message.content[0].text)
+                content = self.build_result(
+                    title, body, meta['content_type'], meta['template'],
+                    self.extract_usage(message), meta['test_mode'], meta.get('tags')
+                )
+                content['batch_id'] = batch_id
+                content['custom_id'] = entry.custom_id
+                content['call_id'] = call_id
+
+                match = self.check_duplicate(content)
+                if match is not None:
+                    failed += 1
+                    print(f"   ✗ {entry.custom_id}: 与已有内容 #{match[0]} 近似重复（距离 {match[1]}）")
+                    continue
+
+                saved.append(self.save_content(content))
+                succeeded += 1
+
+            self.store.mark_batch_collected(batch_id, succeeded, failed)
+            print(f"✅ 批任务 {batch_id} 已收取: 成功 {succeeded} 篇，失败 {failed} 篇")
+
+        return saved
+
+    def save_content(self, content, status="generated", job_key=None):
+        """保存生成的内容到内容存储，返回内容ID（job_key 为生成这篇内容的队列任务）"""
+        fingerprint = self.fingerprint(content)
+        content_id = self.store.add(content, status=status, simhash=fingerprint, job_key=job_key)
+        content['id'] = content_id
+
+        # 以内容ID加入查重索引（索引尚未加载时，加载时会从内容存储读到）
+        with self._dedup_lock:
+            if self._dedup_index is not None:
+                self._dedup_index.add(content_id, fingerprint)
+        content['status'] = status
+
+        if content.get('call_id') is not None:
+            self.store.link_call(content['call_id'], content_id)
+
+        print(f"💾 内容已保存: #{content_id} ({self.store.db_path})")
+        return content_id
+
+
+def print_preview(content):
+    """打印完整内容预览"""
+    print("\n" + "="*50)
+    print("完整内容预览:")
+    print("="*50)
+    print(f"\n标题: {content['title']}\n")
+    print(content['content'])
+    print(f"\n{' '.join(content['tags'])}")
+    print("\n" + "="*50)
 
 
 def main():
@@ -211,29 +750,89 @@ def main():
     parser = argparse.ArgumentParser(description='小红书内容生成器')
     parser.add_argument('--test', action='store_true', help='测试模式')
     parser.add_argument('--count', type=int, default=1, help='生成数量')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='并发请求数（默认读取 ai.concurrency）')
+    parser.add_argument('--import-legacy', action='store_true',
+                        help='导入 logs/ 下旧版 content_*.json 文件到内容存储')
+    parser.add_argument('--batch-submit', action='store_true',
+                        help='通过 Message Batches API 提交 --count 篇的批任务')
+    parser.add_argument('--batch-collect', action='store_true',
+                        help='收取已完成的批任务结果')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式生成（标题超长时提前中断重试）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用响应缓存，强制调用API')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='查看响应缓存统计')
+    parser.add_argument('--plan', action='store_true',
+                        help='只打印 --count 篇的内容计划，不调用API')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='内容计划的随机种子（相同种子得到相同计划）')
+    parser.add_argument('--stub', action='store_true',
+                        help='使用本地模拟客户端（不调用API）')
     args = parser.parse_args()
-
-    generator = ContentGenerator()
-
-    for i in range(args.count):
-        if args.count > 1:
-            print(f"\n{'='*50}")
-            print(f"生成第 {i+1}/{args.count} 篇")
-            print(f"{'='*50}\n")
-
-        content = generator.generate_content(test_mode=args.test)
-
-        if content:
-            generator.save_content(content)
-
-            if args.test:
-                print("\n" + "="*50)
-                print("完整内容预览:")
-                print("="*50)
-                print(f"\n标题: {content['title']}\n")
-                print(content['content'])
-                print(f"\n{' '.join(content['tags'])}")
-                print("\n" + "="*50)
+    if args.count < 1:
+        parser.error("--count 应不小于1")
+
+    client = None
+    if args.stub:
+        from stub_client import StubAnthropic
+        client = StubAnthropic()
+
+    generator = ContentGenerator(client=client)
+
+    if args.seed is not None:
+        from planner import ContentPlanner
+        generator.planner = ContentPlanner(generator.config, generator.templates, seed=args.seed)
+
+    if args.no_cache:
+        generator.use_cache = False
+
+    if args.cache_stats:
+        stats = generator.cache.stats()
+        print("📊 响应缓存统计")
+        print(f"   命中: {stats['hits']} 次 / 未命中: {stats['misses']} 次（命中率 {stats['hit_rate']:.1%}）")
+        print(f"   条目: {stats['entries']} 条，占用 {stats['size_bytes'] / 1024:.1f} KB")
+        return
+
+    if args.plan:
+        print(f"🗓️  内容计划（{args.count} 篇）")
+        for i, item in enumerate(generator.plan(args.count)):
+            title = item['template']['title_pattern'].format_map(item['variables'])
+            print(f"   {i+1:>3}. [{item['content_type']['name']}] {item['template']['name']} | {title}")
+            print(f"        {' '.join(item['tags'])}")
+        return
+
+    if args.import_legacy:
+        count = generator.store.import_json_files("logs", fingerprint=generator.fingerprint)
+        print(f"✅ 已导入 {count} 篇旧版内容")
+        return
+
+    if args.batch_submit:
+        generator.submit_batch(args.count, test_mode=args.test)
+        return
+
+    if args.batch_collect:
+        generator.collect_batches()
+        return
+
+    if args.count > 1:
+        results = generator.generate_batch(
+            args.count,
+            concurrency=args.concurrency,
+            test_mode=args.test,
+            stream=args.stream or None
+        )
+        contents = [r['content'] for r in results if r['status'] == 'success']
+    else:
+        content = generator.generate_content(test_mode=args.test, stream=args.stream or None)
+        contents = [content] if content else []
+
+    for content in contents:
+        generator.save_content(content)
+
+        if args.test:
+            print_preview(content)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+内容存储
+使用SQLite保存生成的内容，按生成时间、状态、内容类型、模板建立索引；
+同时记录每次API调用的token用量和耗时，供成本报告使用；
+按内容哈希记录发布状态，同一篇内容不会重复发布
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    generated_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    content_type TEXT,
+    template TEXT,
+    title TEXT,
+    simhash TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contents_generated_at ON contents(generated_at);
+CREATE INDEX IF NOT EXISTS idx_contents_status ON contents(status, generated_at);
+CREATE INDEX IF NOT EXISTS idx_contents_content_type ON contents(content_type, generated_at);
+CREATE INDEX IF NOT EXISTS idx_contents_template ON contents(template, generated_at);
+
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    submitted_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    requests TEXT NOT NULL,
+    collected_at TEXT,
+    succeeded INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_batches_status ON batches(status);
+
+CREATE TABLE IF NOT EXISTS api_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    called_at TEXT NOT NULL,
+    model TEXT,
+    mode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    content_type TEXT,
+    template TEXT,
+    stop_reason TEXT,
+    input_tokens INTEGER DEFAULT 0,
+    output_tokens INTEGER DEFAULT 0,
+    cache_creation_input_tokens INTEGER DEFAULT 0,
+    cache_read_input_tokens INTEGER DEFAULT 0,
+    ttft_ms REAL,
+    latency_ms REAL,
+    content_id INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_api_calls_called_at ON api_calls(called_at);
+CREATE INDEX IF NOT EXISTS idx_api_calls_template ON api_calls(template, called_at);
+
+CREATE TABLE IF NOT EXISTS publishes (
+    content_hash TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    account TEXT,
+    content_id INTEGER,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    response TEXT
+);
+"""
+
+# api_calls 表中可写入的字段
+CALL_FIELDS = (
+    "called_at", "model", "mode", "status", "content_type", "template", "stop_reason",
+    "input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens",
+    "ttft_ms", "latency_ms", "content_id", "error"
+)
+
+
+def content_hash(content):
+    """内容哈希（标题、正文、标签），作为发布的幂等键"""
+    payload = "\x1f".join([content['title'], content['content'], *content.get('tags', [])])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ContentStore:
+    def __init__(self, db_path="logs/content.db"):
+        """初始化内容存储"""
+        self.db_path = db_path
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn):
+        """为旧版数据库补充新增的列"""
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(contents)")}
+        if 'simhash' not in columns:
+            conn.execute("ALTER TABLE contents ADD COLUMN simhash TEXT")
+        if 'job_key' not in columns:
+            conn.execute("ALTER TABLE contents ADD COLUMN job_key TEXT")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_contents_job_key ON contents(job_key)")
+
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接，可在多线程中安全调用"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_content(row):
+        """将数据库行还原为内容字典"""
+        if row is None:
+            return None
+        content = json.loads(row['data'])
+        content['id'] = row['id']
+        content['status'] = row['status']
+        return content
+
+    def add(self, content, status="generated", simhash=None, job_key=None):
+        """
+        保存一篇内容，返回内容ID
+
+        simhash 为近似重复检测用的指纹；job_key 为生成这篇内容的任务的幂等键（每个任务最多一篇）
+        """
+        now = datetime.now().isoformat()
+        data = {k: v for k, v in content.items() if k not in ('id', 'status')}
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO contents (generated_at, updated_at, status, content_type, template, title, simhash, "
+                "job_key, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    content.get('generated_at', now),
+                    now,
+                    status,
+                    content.get('content_type'),
+                    content.get('template'),
+                    content.get('title'),
+                    format(simhash, '016x') if simhash is not None else None,
+                    job_key,
+                    json.dumps(data, ensure_ascii=False)
+                )
+            )
+            return cursor.lastrowid
+
+    def get(self, content_id):
+        """按ID获取内容，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM contents WHERE id = ?", (content_id,)).fetchone()
+        return self._row_to_content(row)
+
+    def find_by_job_key(self, job_key):
+        """查找任务已生成（或已取用）的内容，没有时返回None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM contents WHERE job_key = ?", (job_key,)).fetchone()
+        return self._row_to_content(row)
+
+    def latest(self, status=None):
+        """获取最新生成的一篇内容"""
+        items = self.list(status=status, limit=1)
+        return items[0] if items else None
+
+    def list(self, status=None, since=None, until=None, content_type=None, template=None, limit=None):
+        """
+        按条件查询内容，按生成时间倒序返回
+
+        since / until 为ISO格式时间字符串（或datetime）
+        """
+        conditions = []
+        params = []
+
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if since is not None:
+            conditions.append("generated_at >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until is not None:
+            conditions.append("generated_at < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        if content_type is not None:
+            conditions.append("content_type = ?")
+            params.append(content_type)
+        if template is not None:
+            conditions.append("template = ?")
+            params.append(template)
+
+        sql = "SELECT * FROM contents"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY generated_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [self._row_to_content(row) for row in rows]
+
+    def count(self, status=None):
+        """统计内容数量"""
+        sql = "SELECT COUNT(*) FROM contents"
+        params = []
+        if status is not None:
+            sql += " WHERE status = ?"
+            params.append(status)
+
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+
+    def claim_oldest(self, status, new_status, job_key=None):
+        """
+        取出最早生成的一篇指定状态的内容，并原子地改为 new_status
+
+        多个线程/进程同时取用时不会取到同一篇，没有可用内容时返回None；
+        job_key 不为空时同时记录取用这篇内容的任务
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM contents WHERE status = ? ORDER BY generated_at, id LIMIT 1",
+                (status,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE contents SET status = ?, updated_at = ?, job_key = COALESCE(?, job_key) WHERE id = ?",
+                (new_status, datetime.now().isoformat(), job_key, row['id'])
+            )
+
+        content = self._row_to_content(row)
+        content['status'] = new_status
+        return content
+
+    def iter_simhashes(self):
+        """逐行返回 (内容ID, 指纹)，用于重建近似重复索引"""
+        with self._connect() as conn:
+            for row in conn.execute("SELECT id, simhash FROM contents WHERE simhash IS NOT NULL"):
+                yield row['id'], int(row['simhash'], 16)
+
+    def update_status(self, content_id, status):
+        """更新内容状态（generated / draft / published 等）"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE contents SET status = ?, updated_at = ? WHERE id = ?",
+                (status, datetime.now().isoformat(), content_id)
+            )
+
+    def import_json_files(self, directory="logs", pattern="content_*.json", fingerprint=None):
+        """
+        导入旧版逐篇保存的 content_*.json 文件，返回导入数量
+
+        fingerprint 为计算内容指纹的函数，导入的内容同样参与近似重复检测；
+        导入后文件重命名为 *.imported，重复执行不会重复导入
+        """
+        count = 0
+        for path in sorted(Path(directory).glob(pattern)):
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            self.add(content, simhash=fingerprint(content) if fingerprint else None)
+            os.replace(path, str(path) + ".imported")
+            count += 1
+        return count
+
+    def add_batch(self, batch_id, requests):
+        """
+        记录已提交的批任务
+
+        requests 为 {custom_id: 该请求的内容类型、模板等元信息}
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO batches (batch_id, submitted_at, status, requests) VALUES (?, ?, ?, ?)",
+                (batch_id, datetime.now().isoformat(), "submitted", json.dumps(requests, ensure_ascii=False))
+            )
+
+    def list_batches(self, status="submitted"):
+        """查询批任务，status 为 None 时返回全部"""
+        sql = "SELECT * FROM batches"
+        params = []
+        if status is not None:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY submitted_at"
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                "batch_id": row['batch_id'],
+                "submitted_at": row['submitted_at'],
+                "status": row['status'],
+                "requests": json.loads(row['requests']),
+                "collected_at": row['collected_at'],
+                "succeeded": row['succeeded'],
+                "failed": row['failed']
+            }
+            for row in rows
+        ]
+
+    def mark_batch_collected(self, batch_id, succeeded, failed):
+        """标记批任务结果已收取"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE batches SET status = ?, collected_at = ?, succeeded = ?, failed = ? WHERE batch_id = ?",
+                ("collected", datetime.now().isoformat(), succeeded, failed, batch_id)
+            )
+
+    def add_call(self, record):
+        """
+        记录一次API调用，返回记录ID
+
+        record 包含 model、mode（create/stream/batch/cache）、status、内容类型、模板、
+        token用量、ttft_ms（首个token耗时）和 latency_ms（总耗时）等字段
+        """
+        record = {field: record[field] for field in CALL_FIELDS if field in record}
+        record.setdefault('called_at', datetime.now().isoformat())
+        columns = ", ".join(record)
+        placeholders = ", ".join("?" for _ in record)
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO api_calls ({columns}) VALUES ({placeholders})",
+                list(record.values())
+            )
+            return cursor.lastrowid
+
+    def link_call(self, call_id, content_id):
+        """把API调用记录关联到保存后的内容"""
+        with self._connect() as conn:
+            conn.execute("UPDATE api_calls SET content_id = ? WHERE id = ?", (content_id, call_id))
+
+    def list_calls(self, since=None, until=None, template=None):
+        """按时间范围查询API调用记录，按调用时间正序返回"""
+        conditions = []
+        params = []
+
+        if since is not None:
+            conditions.append("called_at >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until is not None:
+            conditions.append("called_at < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        if template is not None:
+            conditions.append("template = ?")
+            params.append(template)
+
+        sql = "SELECT * FROM api_calls"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY called_at, id"
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def begin_publish(self, content_hash, account=None, content_id=None, force=False):
+        """
+        开始发布前登记，返回None表示可以发布
+
+        同一内容已发布成功、正在发布（包括进程在发布中途退出）或上次发布结果未知（请求超时等）时
+        返回已有记录；上次明确失败或只保存了草稿时允许重新发布；force 为 True 时忽略已有记录
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM publishes WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is not None and row['status'] in ("publishing", "success", "unknown") and not force:
+                return dict(row)
+            conn.execute(
+                "INSERT OR REPLACE INTO publishes (content_hash, status, account, content_id, started_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, "publishing", account, content_id, now)
+            )
+        return None
+
+    def finish_publish(self, content_hash, status, response=None):
+        """记录发布结果（status 为 success / draft_saved / error / unknown 等）"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE publishes SET status = ?, finished_at = ?, response = ? WHERE content_hash = ?",
+                (status, datetime.now().isoformat(),
+                 json.dumps(response, ensure_ascii=False) if response is not None else None, content_hash)
+            )
+
+    def update_publish_response(self, content_hash, response):
+        """更新发布结果中的数据（如发布后补查到的笔记ID），不改变状态和完成时间"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE publishes SET response = ? WHERE content_hash = ?",
+                (json.dumps(response, ensure_ascii=False), content_hash)
+            )
+
+    def list_publishes(self, status="success", since=None):
+        """
+        查询发布记录（附带内容的类型和模板），按完成时间正序返回
+
+        since 为完成时间下限；response 已解析为字典
+        """
+        query = (
+            "SELECT p.*, c.content_type, c.template, c.title FROM publishes p "
+            "LEFT JOIN contents c ON c.id = p.content_id WHERE p.status = ?"
+        )
+        params = [status]
+        if since is not None:
+            query += " AND p.finished_at >= ?"
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        query += " ORDER BY p.finished_at"
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['response'] = json.loads(record['response']) if record['response'] else None
+            records.append(record)
+        return records
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+近似重复检测
+基于字符n-gram的64位SimHash（适合中文，无需分词），分段索引使查询只比较少量候选
+"""
+
+import re
+import hashlib
+import threading
+from collections import Counter, defaultdict
+
+
+HASH_BITS = 64
+
+# 计算指纹前去掉空白和常见标点，只保留正文字符
+NOISE_PATTERN = re.compile(r'[\s　-〿＀-／：-＠!-/:-@\[-`{-~]+')
+
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text, ngram=3):
+    """计算文本的64位SimHash指纹（按n-gram出现次数加权）"""
+    text = NOISE_PATTERN.sub('', text.lower())
+    if len(text) < ngram:
+        grams = Counter([text]) if text else Counter()
+    else:
+        grams = Counter(text[i:i + ngram] for i in range(len(text) - ngram + 1))
+
+    weights = [0] * HASH_BITS
+    for gram, count in grams.items():
+        h = _token_hash(gram)
+        for bit in range(HASH_BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    def __init__(self, max_distance=3):
+        """
+        初始化索引
+
+        把64位指纹分成 max_distance+1 段：海明距离不超过 max_distance 的两个指纹
+        至少有一段完全相同（抽屉原理），查询时只需比较同段的候选
+        """
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = HASH_BITS // bands
+        self._bands = [
+            (i * width, HASH_BITS - i * width if i == bands - 1 else width)
+            for i in range(bands)
+        ]
+        self._tables = [defaultdict(list) for _ in self._bands]
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> offset) & ((1 << width) - 1) for offset, width in self._bands]
+
+    def _add(self, key, fingerprint):
+        self._fingerprints[key] = fingerprint
+        for table, band in zip(self._tables, self._keys(fingerprint)):
+            table[band].append(key)
+
+    def _find(self, fingerprint):
+        best = None
+        for table, band in zip(self._tables, self._keys(fingerprint)):
+            for key in table.get(band, ()):
+                distance = hamming(fingerprint, self._fingerprints[key])
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        return best
+
+    def add(self, key, fingerprint):
+        with self._lock:
+            self._add(key, fingerprint)
+
+    def find(self, fingerprint):
+        """查找最相近的已有内容，返回 (key, 距离)，没有近似重复时返回None"""
+        with self._lock:
+            return self._find(fingerprint)
+
+    def check_and_add(self, key, fingerprint):
+        """
+        原子地查重并加入索引
+
+        并发生成时两篇相似内容不会同时通过检查；重复时不加入，返回 (已有key, 距离)
+        """
+        with self._lock:
+            match = self._find(fingerprint)
+            if match is None:
+                self._add(key, fingerprint)
+            return match
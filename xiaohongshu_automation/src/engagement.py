@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+笔记互动数据
+定期通过 xiaohongshu-mcp 的笔记详情接口采集已发布笔记的点赞、收藏、评论、分享数（也可以从本地数据文件导入），
+按列追加保存（每列一个定长二进制文件），并在写入时增量更新按模板、内容类型和账号的累计汇总；
+周报等按时间范围的统计用 NumPy 对整列向量化计算，几万篇笔记也只需几毫秒
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+
+
+METRICS = ("likes", "collects", "comments", "shares")
+METRIC_LABELS = {"likes": "点赞", "collects": "收藏", "comments": "评论", "shares": "分享"}
+GROUP_FIELDS = ("template", "content_type", "account")
+GROUP_LABELS = {"template": "模板", "content_type": "内容类型", "account": "账号"}
+
+# 列文件：快照时间（秒）、笔记编号和各项互动数，每次采集追加到文件末尾
+COLUMNS = {"ts": np.float64, "note": np.int32, **{metric: np.int64 for metric in METRICS}}
+
+# 笔记详情接口 interactInfo 中对应的字段
+INTERACT_FIELDS = {"likes": "likedCount", "collects": "collectedCount",
+                   "comments": "commentCount", "shares": "sharedCount"}
+
+
+def parse_count(value):
+    """解析互动数（接口返回字符串，较大时为“1.2万”这样的格式）"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().rstrip('+')
+    if text.endswith('万'):
+        return int(float(text[:-1]) * 10000)
+    return int(float(text))
+
+
+def parse_interactions(detail):
+    """从笔记详情中找到 interactInfo，返回 {likes, collects, comments, shares}"""
+    pending = [detail]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            if isinstance(item.get('interactInfo'), dict):
+                info = item['interactInfo']
+                return {metric: parse_count(info.get(field)) for metric, field in INTERACT_FIELDS.items()}
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    raise ValueError("笔记详情中没有互动数据（interactInfo）")
+
+
+def find_feed(result, title):
+    """在搜索结果中找到标题与 title 一致的笔记，返回 (笔记ID, xsec_token)，没有时返回None"""
+    pending = [result]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            card = item.get('noteCard')
+            if isinstance(card, dict) and item.get('id') and (card.get('displayTitle') or card.get('title')) == title:
+                return item['id'], item.get('xsecToken')
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return None
+
+
+def _timestamp(value):
+    """ISO时间或秒数转换为秒数，None 返回None"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+class EngagementStore:
+    """
+    列式存储的互动快照
+
+    notes.jsonl 为笔记信息（行号即笔记编号），每列一个 .bin 文件；state.json 记录已提交的行数和
+    累计汇总，写入顺序为 笔记信息 → 列文件 → state.json，打开时截掉未提交的尾部，中途退出不会留下半条记录。
+    同一目录同时只应有一个进程写入
+    """
+
+    def __init__(self, directory="logs/engagement"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+        self._notes = self._load_notes()
+        self._index = {note['note_id']: code for code, note in enumerate(self._notes)}
+        self._labels = {}   # 笔记的分组编号等，登记新笔记后重新计算
+        self._sorted = None
+        self._truncate_columns()
+        self._latest = self._compute_latest()
+
+    # ------------------------------------------------------------------
+    # 文件
+    # ------------------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_state(self):
+        try:
+            with open(self._path("state.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, "notes_bytes": 0, "aggregates": {field: {} for field in GROUP_FIELDS}}
+
+    def _save_state(self):
+        path = self._path("state.json")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _load_notes(self):
+        path = self._path("notes.jsonl")
+        if not os.path.exists(path):
+            return []
+        committed = self._state['notes_bytes']
+        if os.path.getsize(path) > committed:
+            os.truncate(path, committed)
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _truncate_columns(self):
+        for name, dtype in COLUMNS.items():
+            path = self._path(f"{name}.bin")
+            size = self._state['rows'] * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def columns(self):
+        """读取全部已提交的列，返回 {列名: ndarray}"""
+        rows = self._state['rows']
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            path = self._path(f"{name}.bin")
+            columns[name] = np.fromfile(path, dtype=dtype, count=rows) if rows else np.empty(0, dtype=dtype)
+        return columns
+
+    def _compute_latest(self):
+        """每篇笔记最后一次快照的互动数"""
+        latest = np.zeros((len(self._notes), len(METRICS)), dtype=np.int64)
+        columns = self.columns()
+        if len(columns['note']):
+            notes, last = self._last_rows(columns['note'])
+            latest[notes] = self._values(columns)[last]
+        return latest
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _last_rows(notes):
+        """每篇笔记最后出现的行号，返回 (笔记编号, 行号)"""
+        reversed_notes = notes[::-1]
+        codes, first = np.unique(reversed_notes, return_index=True)
+        return codes, len(notes) - 1 - first
+
+    @staticmethod
+    def _values(columns):
+        return np.stack([columns[metric] for metric in METRICS], axis=1)
+
+    def _register(self, snapshot):
+        code = len(self._notes)
+        note = {
+            "note_id": snapshot['note_id'],
+            "content_id": snapshot.get('content_id'),
+            "account": snapshot.get('account') or "unknown",
+            "template": snapshot.get('template') or "unknown",
+            "content_type": snapshot.get('content_type') or "unknown",
+            "title": snapshot.get('title'),
+            "published_at": _timestamp(snapshot.get('published_at'))
+        }
+        self._notes.append(note)
+        self._index[note['note_id']] = code
+        for field in GROUP_FIELDS:
+            group = self._state['aggregates'][field].setdefault(note[field], dict.fromkeys(("notes",) + METRICS, 0))
+            group['notes'] += 1
+        return note
+
+    def append(self, snapshots):
+        """
+        追加一批互动快照，返回追加的行数
+
+        每项为 {"note_id", "likes", "collects", "comments", "shares", "ts"}，ts 默认为当前时间；
+        首次出现的笔记同时登记项中的 content_id / account / template / content_type / title / published_at。
+        快照应按时间顺序写入，累计汇总以每篇笔记最后写入的快照为准
+        """
+        if not snapshots:
+            return 0
+
+        with self._lock:
+            now = time.time()
+            new_notes = []
+            codes = np.empty(len(snapshots), dtype=np.int32)
+            for i, snapshot in enumerate(snapshots):
+                code = self._index.get(snapshot['note_id'])
+                if code is None:
+                    new_notes.append(self._register(snapshot))
+                    code = len(self._notes) - 1
+                codes[i] = code
+
+            columns = {
+                "ts": np.array([_timestamp(snapshot.get('ts')) or now for snapshot in snapshots], dtype=np.float64),
+                "note": codes,
+                **{metric: np.array([snapshot.get(metric) or 0 for snapshot in snapshots], dtype=np.int64)
+                   for metric in METRICS}
+            }
+
+            if new_notes:
+                with open(self._path("notes.jsonl"), 'a', encoding='utf-8') as f:
+                    for note in new_notes:
+                        f.write(json.dumps(note, ensure_ascii=False) + "\n")
+                self._state['notes_bytes'] = os.path.getsize(self._path("notes.jsonl"))
+                self._labels.clear()
+
+            for name, dtype in COLUMNS.items():
+                with open(self._path(f"{name}.bin"), 'ab') as f:
+                    columns[name].astype(dtype, copy=False).tofile(f)
+
+            self._apply(columns)
+            self._sorted = None
+            self._state['rows'] += len(snapshots)
+            self._state['updated_at'] = datetime.now().isoformat()
+            self._save_state()
+        return len(snapshots)
+
+    def _apply(self, columns):
+        """按本批每篇笔记最后一次快照与之前的差值增量更新累计汇总"""
+        missing = len(self._notes) - len(self._latest)
+        if missing > 0:
+            self._latest = np.vstack([self._latest, np.zeros((missing, len(METRICS)), dtype=np.int64)])
+
+        notes, last = self._last_rows(columns['note'])
+        values = self._values(columns)[last]
+        delta = values - self._latest[notes]
+        self._latest[notes] = values
+
+        for field in GROUP_FIELDS:
+            names, inverse = np.unique([self._notes[code][field] for code in notes], return_inverse=True)
+            sums = np.zeros((len(names), len(METRICS)), dtype=np.int64)
+            np.add.at(sums, inverse, delta)
+            aggregates = self._state['aggregates'][field]
+            for name, row in zip(names.tolist(), sums.tolist()):
+                group = aggregates[name]
+                for metric, value in zip(METRICS, row):
+                    group[metric] += value
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    @property
+    def rows(self):
+        return self._state['rows']
+
+    @property
+    def note_count(self):
+        return len(self._notes)
+
+    def note(self, code):
+        return self._notes[code]
+
+    def summary(self, by="template"):
+        """累计汇总（每篇笔记最新的互动数之和，写入时已增量更新，不读取列文件），按互动总数降序"""
+        if by not in GROUP_FIELDS:
+            raise ValueError(f"by 应为 {' / '.join(GROUP_FIELDS)}")
+        with self._lock:
+            groups = json.loads(json.dumps(self._state['aggregates'][by]))
+        rows = []
+        for name, group in groups.items():
+            total = sum(group[metric] for metric in METRICS)
+            rows.append({"key": name, **group, "engagement": total,
+                         "per_note": total / group['notes'] if group['notes'] else 0})
+        rows.sort(key=lambda row: row['engagement'], reverse=True)
+        return rows
+
+    def _published_at(self):
+        if "published_at" not in self._labels:
+            self._labels["published_at"] = np.array(
+                [note['published_at'] or np.nan for note in self._notes], dtype=np.float64
+            )
+        return self._labels["published_at"]
+
+    def _group_codes(self, by):
+        """每篇笔记所属分组的编号，返回 (分组名数组, 编号数组)"""
+        if by not in self._labels:
+            names, codes = np.unique([note[by] for note in self._notes] or [""], return_inverse=True)
+            self._labels[by] = (names, codes[:len(self._notes)])
+        return self._labels[by]
+
+    def _index_by_note(self):
+        """
+        按笔记、时间排序后的列和每篇笔记的起始位置（缓存到下次写入）
+
+        排序后同一笔记的快照连续且按时间递增，某一时刻之前的最近快照就是该笔记的第 n 行，
+        n 为该笔记在这一时刻之前的快照数，统计时只需计数，不再排序
+        """
+        if self._sorted is None:
+            columns = self.columns()
+            count = len(self._notes)
+            order = np.lexsort((columns['ts'], columns['note']))
+            notes = columns['note'][order]
+            starts = np.zeros(count, dtype=np.int64)
+            starts[1:] = np.cumsum(np.bincount(notes, minlength=count))[:-1]
+            self._sorted = {
+                "ts": columns['ts'][order],
+                "notes": notes,
+                "values": self._values(columns)[order],
+                "starts": starts,
+                "count": count
+            }
+        return self._sorted
+
+    @staticmethod
+    def _values_at(index, moment):
+        """每篇笔记在 moment 之前最后一次快照的互动数，返回 (互动数, 是否有快照)"""
+        before = np.bincount(index['notes'][index['ts'] < moment], minlength=index['count'])
+        seen = before > 0
+        result = np.zeros((index['count'], len(METRICS)), dtype=np.int64)
+        result[seen] = index['values'][index['starts'][seen] + before[seen] - 1]
+        return result, seen
+
+    def rollup(self, since, until, by="template", top=5):
+        """
+        统计 [since, until) 内的互动增量
+
+        增量 = 每篇笔记在 until 前最后一次快照 - since 前最后一次快照；返回
+        {"groups": 按互动增量降序的分组统计, "top": 增量最多的笔记, "totals": 合计, "notes": 有数据的笔记数}
+        """
+        if by not in GROUP_FIELDS:
+            raise ValueError(f"by 应为 {' / '.join(GROUP_FIELDS)}")
+        since, until = _timestamp(since), _timestamp(until)
+
+        with self._lock:
+            index = self._index_by_note()
+            names, codes = self._group_codes(by)
+            published_at = self._published_at()
+
+        at_until, seen = self._values_at(index, until)
+        at_since, _ = self._values_at(index, since)
+        gained = at_until - at_since
+        engagement = gained.sum(axis=1)
+
+        codes = codes[seen]
+        tracked = np.bincount(codes, minlength=len(names))
+        published = np.bincount(
+            codes, weights=((published_at[seen] >= since) & (published_at[seen] < until)), minlength=len(names)
+        )
+        sums = np.stack([np.bincount(codes, weights=gained[seen][:, i], minlength=len(names))
+                         for i in range(len(METRICS))], axis=1)
+
+        groups = []
+        for i in np.flatnonzero(tracked):
+            total = int(sums[i].sum())
+            groups.append({
+                "key": str(names[i]),
+                "notes": int(tracked[i]),
+                "published": int(published[i]),
+                **{metric: int(value) for metric, value in zip(METRICS, sums[i])},
+                "engagement": total,
+                "per_note": total / int(tracked[i])
+            })
+        groups.sort(key=lambda row: row['engagement'], reverse=True)
+
+        top_notes = []
+        if top:
+            candidates = np.flatnonzero(seen)
+            best = candidates[np.argsort(-engagement[candidates], kind="stable")[:top]]
+            for code in best:
+                note = self._notes[code]
+                top_notes.append({**note, **{metric: int(value) for metric, value in zip(METRICS, gained[code])},
+                                  "engagement": int(engagement[code])})
+
+        totals = {metric: int(value) for metric, value in zip(METRICS, gained[seen].sum(axis=0))}
+        return {"groups": groups, "top": top_notes, "totals": totals, "notes": int(seen.sum())}
+
+
+class EngagementCollector:
+    def __init__(self, config_path="config/config.yaml"):
+        from config_loader import get_service
+        from content_store import ContentStore
+
+        self.settings = get_service(config_path)
+        self.store = ContentStore(self.config['storage']['content_db'])
+        self.engagement = EngagementStore(self.engagement_config.get('data_dir', 'logs/engagement'))
+        self._mcp = None
+
+    @property
+    def config(self):
+        return self.settings.config
+
+    @property
+    def engagement_config(self):
+        return self.config.get('engagement', {})
+
+    @property
+    def mcp(self):
+        """xiaohongshu-mcp 服务（首次使用时创建）"""
+        if self._mcp is None:
+            from mcp_client import McpService
+            self._mcp = McpService(self.config.get('mcp', {}))
+        return self._mcp
+
+    def close(self):
+        if self._mcp is not None:
+            self._mcp.close()
+            self._mcp = None
+
+    def tracked_notes(self, lookup=False):
+        """
+        最近 engagement.track_days 天内发布成功、有笔记ID的内容
+
+        笔记ID取自发布结果（publishes.response）中的 note_id / feed_id。真实的 xiaohongshu-mcp 发布接口
+        只返回标题、图片数和状态，lookup 为 True 时对没有ID的记录调用 lookup_note_ids 按标题搜索补全
+        """
+        from account_pool import account_configs
+
+        since = datetime.now() - timedelta(days=self.engagement_config.get('track_days', 30))
+        base_urls = {account['name']: account.get('base_url') for account in account_configs(self.config)}
+
+        records = self.store.list_publishes("success", since=since)
+        if lookup:
+            self.lookup_note_ids(records, base_urls)
+
+        notes = []
+        for record in records:
+            response = record['response'] if isinstance(record['response'], dict) else {}
+            note_id = response.get('note_id') or response.get('feed_id')
+            if not note_id:
+                continue
+            notes.append({
+                "note_id": note_id,
+                "xsec_token": response.get('xsec_token'),
+                "base_url": base_urls.get(record['account']),
+                "content_id": record['content_id'],
+                "account": record['account'],
+                "template": record['template'],
+                "content_type": record['content_type'],
+                "title": record['title'],
+                "published_at": record['finished_at']
+            })
+        return notes
+
+    def lookup_note_ids(self, records, base_urls):
+        """
+        发布结果中没有笔记ID的记录，在对应账号的服务上按标题搜索，取标题完全一致的笔记
+
+        查到的ID和 xsec_token 写回发布记录（之后不再重复搜索），返回查到的篇数
+        """
+        def has_id(record):
+            response = record['response'] if isinstance(record['response'], dict) else {}
+            return response.get('note_id') or response.get('feed_id')
+
+        missing = [record for record in records if record['title'] and not has_id(record)]
+        if not missing:
+            return 0
+
+        results = self.mcp.search_many(
+            [{"keyword": record['title'], "base_url": base_urls.get(record['account'])} for record in missing],
+            self.engagement_config.get('max_parallel', 5)
+        )
+
+        found = 0
+        for record, result in zip(missing, results):
+            match = None if isinstance(result, Exception) else find_feed(result, record['title'])
+            if match is None:
+                continue
+            response = record['response'] if isinstance(record['response'], dict) else {}
+            record['response'] = {**response, "note_id": match[0], "xsec_token": match[1]}
+            self.store.update_publish_response(record['content_hash'], record['response'])
+            found += 1
+
+        print(f"🔎 按标题搜索笔记ID: 找到 {found}/{len(missing)} 篇")
+        return found
+
+    def collect(self):
+        """查询跟踪中的笔记的互动数并追加一次快照，返回 {"notes", "collected", "errors"}"""
+        notes = self.tracked_notes(lookup=True)
+        if not notes:
+            print("ℹ️  没有需要采集的笔记（发布记录中没有笔记ID，或已超过跟踪天数）")
+            return {"notes": 0, "collected": 0, "errors": 0}
+
+        print(f"📥 采集 {len(notes)} 篇笔记的互动数据...")
+        details = self.mcp.feed_details(notes, self.engagement_config.get('max_parallel', 5))
+
+        now = time.time()
+        snapshots = []
+        errors = 0
+        for note, detail in zip(notes, details):
+            try:
+                if isinstance(detail, Exception):
+                    raise detail
+                snapshots.append({**note, **parse_interactions(detail), "ts": now})
+            except Exception as e:
+                errors += 1
+                print(f"⚠️  笔记 {note['note_id']} 采集失败: {e}")
+
+        self.engagement.append(snapshots)
+        print(f"✅ 已采集 {len(snapshots)} 篇" + (f"，失败 {errors} 篇" if errors else ""))
+        return {"notes": len(notes), "collected": len(snapshots), "errors": errors}
+
+    def import_file(self, path):
+        """
+        从本地数据文件导入快照（JSON Lines 或 JSON 数组）
+
+        每项包含 note_id、ts 和 likes/collects/comments/shares（或笔记详情中的 interactInfo）；
+        未写明模板、内容类型的笔记按发布记录补全
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        stripped = text.lstrip()
+        if stripped.startswith('['):
+            entries = json.loads(stripped)
+        else:
+            entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        known = {note['note_id']: note for note in self.tracked_notes()}
+        snapshots = []
+        for entry in entries:
+            snapshot = {key: value for key, value in entry.items() if key not in METRICS}
+            snapshot = {**known.get(entry['note_id'], {}), **snapshot}
+            if 'interactInfo' in entry:
+                snapshot.update(parse_interactions(entry))
+            else:
+                snapshot.update({metric: parse_count(entry.get(metric)) for metric in METRICS})
+            snapshots.append(snapshot)
+
+        snapshots.sort(key=lambda snapshot: _timestamp(snapshot.get('ts')) or 0)
+        count = self.engagement.append(snapshots)
+        print(f"✅ 已导入 {count} 条快照（共 {self.engagement.note_count} 篇笔记）")
+        return count
+
+
+def build_report(engagement, since, until, by="template", top=5):
+    """生成互动报告文本"""
+    started = time.perf_counter()
+    result = engagement.rollup(since, until, by=by, top=top)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    lines = [
+        f"💬 互动报告（{since:%Y-%m-%d} ~ {until - timedelta(seconds=1):%Y-%m-%d}，按{GROUP_LABELS[by]}）",
+        ""
+    ]
+    if not result['groups']:
+        lines.append("   该时间范围内没有互动数据")
+        return "\n".join(lines)
+
+    for row in result['groups']:
+        lines.append(f"• {row['key']}")
+        lines.append(
+            f"   笔记 {row['notes']} 篇（本期发布 {row['published']}）  互动 {row['engagement']}"
+            f"（每篇 {row['per_note']:.1f}）"
+        )
+        lines.append("   " + " / ".join(f"{METRIC_LABELS[metric]} {row[metric]}" for metric in METRICS))
+
+    if result['top']:
+        lines.append("")
+        lines.append("🔥 互动最多的笔记:")
+        for note in result['top']:
+            lines.append(f"   {note['engagement']:>6}  {note['title'] or note['note_id']}"
+                         f"（{note['template']} / {note['content_type']}）")
+
+    totals = result['totals']
+    lines.append("")
+    lines.append(f"合计: 笔记 {result['notes']} 篇，" + "，".join(
+        f"{METRIC_LABELS[metric]} {totals[metric]}" for metric in METRICS
+    ) + f"（{engagement.rows} 条快照，统计耗时 {elapsed:.1f}ms）")
+    return "\n".join(lines)
+
+
+def main():
+    """主函数"""
+    import argparse
+    from report import report_range, save_report
+
+    parser = argparse.ArgumentParser(description='笔记互动数据')
+    parser.add_argument('--collect', action='store_true', help='从 xiaohongshu-mcp 采集一次互动数据')
+    parser.add_argument('--import', dest='import_file', type=str, help='从本地数据文件导入快照（JSON Lines）')
+    parser.add_argument('--summary', action='store_true', help='显示累计汇总（每篇笔记最新的互动数）')
+    parser.add_argument('--since', type=str, help='开始日期（YYYY-MM-DD，默认为 monitoring.report_interval 天前）')
+    parser.add_argument('--until', type=str, help='结束日期（YYYY-MM-DD，包含当天，默认为今天）')
+    parser.add_argument('--by', choices=list(GROUP_FIELDS), default='template', help='分组方式')
+    parser.add_argument('--top', type=int, default=5, help='列出互动最多的笔记数')
+    parser.add_argument('--save', action='store_true', help='同时保存到 logs/reports/')
+    args = parser.parse_args()
+
+    collector = EngagementCollector()
+    try:
+        if args.collect:
+            collector.collect()
+        if args.import_file:
+            collector.import_file(args.import_file)
+
+        if args.summary:
+            print(f"📊 累计互动（按{GROUP_LABELS[args.by]}，共 {collector.engagement.note_count} 篇笔记）\n")
+            for row in collector.engagement.summary(args.by):
+                print(f"• {row['key']}: 笔记 {row['notes']} 篇，互动 {row['engagement']}（每篇 {row['per_note']:.1f}），"
+                      + " / ".join(f"{METRIC_LABELS[metric]} {row[metric]}" for metric in METRICS))
+        elif not (args.collect or args.import_file) or args.since or args.until:
+            since, until = report_range(collector.config, args.since, args.until)
+            text = build_report(collector.engagement, since, until, args.by, args.top)
+            print(text)
+            if args.save:
+                print(f"\n💾 报告已保存: {save_report(text, prefix='engagement')}")
+    finally:
+        collector.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+图片编码压缩
+上传前为每张图片选择格式和质量：纯色卡片用调色板PNG，照片类用渐进式JPEG/WebP，
+去掉元数据，并控制在每张图片的字节预算以内
+"""
+
+import io
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+# 缩略图颜色数不超过该值时视为纯色卡片，使用调色板PNG
+FLAT_MAX_COLORS = 1024
+
+# 超出预算且质量已降到最低时，每次缩小的比例
+DOWNSCALE_STEP = 0.9
+
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+def _is_flat(image):
+    """判断是否为颜色很少的纯色卡片（在缩略图上统计颜色数）"""
+    thumb = image.convert("RGB")
+    thumb.thumbnail((256, 256))
+    return thumb.getcolors(maxcolors=FLAT_MAX_COLORS) is not None
+
+
+def _save(image, fmt, quality):
+    """编码到内存，返回字节"""
+    buffer = io.BytesIO()
+    if fmt == "PNG":
+        image.save(buffer, format="PNG", optimize=True)
+    elif fmt == "JPEG":
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format="WEBP", quality=quality, method=6)
+    return buffer.getvalue()
+
+
+def _encode_lossy(image, fmt, quality, min_quality, max_bytes):
+    """逐步降低质量（必要时缩小尺寸）直到满足字节预算"""
+    image = image.convert("RGB")
+    while True:
+        for q in range(quality, min_quality - 1, -5):
+            data = _save(image, fmt, q)
+            if len(data) <= max_bytes:
+                return data, q
+        if min(image.size) < 200:
+            # 已经很小了，不再继续缩小
+            return data, min_quality
+        image = image.resize(
+            (int(image.width * DOWNSCALE_STEP), int(image.height * DOWNSCALE_STEP)),
+            Image.LANCZOS
+        )
+
+
+def encode_image(source, output_dir, settings):
+    """
+    编码一张图片，返回编码结果
+
+    输出文件名由源文件内容和编码参数决定，相同输入不会重复编码
+    """
+    with open(source, 'rb') as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw + repr(sorted(settings.items())).encode('utf-8')).hexdigest()[:32]
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    for ext in EXTENSIONS.values():
+        cached = os.path.join(output_dir, f"{stem}_{digest}.{ext}")
+        if os.path.exists(cached):
+            return {
+                "source": source,
+                "path": cached,
+                "format": ext,
+                "quality": None,
+                "original_bytes": len(raw),
+                "encoded_bytes": os.path.getsize(cached)
+            }
+
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    # 复制像素并丢弃 EXIF/文本块等元数据
+    image = image.copy()
+    image.info = {}
+
+    fmt = settings['format'].upper()
+    if fmt == "JPG":
+        fmt = "JPEG"
+    photo_format = settings['photo_format'].upper().replace("JPG", "JPEG")
+    max_bytes = settings['max_bytes']
+    quality = None
+
+    data = None
+    if fmt in ("AUTO", "PNG") and (fmt == "PNG" or _is_flat(image)):
+        data = _save(image.convert("RGB").quantize(colors=256), "PNG", None)
+        fmt = "PNG"
+        if len(data) > max_bytes:
+            # 调色板PNG仍超出预算，改用有损格式
+            data = None
+            fmt = photo_format
+
+    if data is None:
+        if fmt == "AUTO":
+            fmt = photo_format
+        data, quality = _encode_lossy(image, fmt, settings['quality'], settings['min_quality'], max_bytes)
+
+    path = os.path.join(output_dir, f"{stem}_{digest}.{EXTENSIONS[fmt]}")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    return {
+        "source": source,
+        "path": path,
+        "format": EXTENSIONS[fmt],
+        "quality": quality,
+        "original_bytes": len(raw),
+        "encoded_bytes": len(data)
+    }
+
+
+class ImageEncoder:
+    def __init__(self, config):
+        """初始化编码器（config 为 config.yaml 中的 image 配置）"""
+        encode_config = config.get('encode', {})
+        self.settings = {
+            "format": encode_config.get('format', 'auto'),
+            "photo_format": encode_config.get('photo_format', 'jpeg'),
+            "quality": encode_config.get('quality', 85),
+            "min_quality": encode_config.get('min_quality', 60),
+            "max_bytes": encode_config.get('max_kb', 500) * 1024
+        }
+        self.workers = encode_config.get('workers', 3)
+        self.output_dir = os.path.join(config.get('save_path', 'assets/images'), "encoded")
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def encode_all(self, paths):
+        """并行编码一篇笔记的所有图片，返回与输入顺序一致的编码结果"""
+        # 编码主要在Pillow的C代码中执行，线程即可并行
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(paths)))) as executor:
+            return list(executor.map(lambda path: encode_image(path, self.output_dir, self.settings), paths))
+
+    @staticmethod
+    def summarize(results):
+        """汇总节省的字节数"""
+        original = sum(r['original_bytes'] for r in results)
+        encoded = sum(r['encoded_bytes'] for r in results)
+        return {
+            "original_bytes": original,
+            "encoded_bytes": encoded,
+            "saved_bytes": original - encoded,
+            "saved_ratio": (original - encoded) / original if original else 0.0
+        }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+笔记图片渲染
+使用Pillow把标题和要点绘制成封面图和卡片图，按内容寻址缓存，相同内容不会重复渲染
+"""
+
+import os
+import re
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+
+
+# 配色方案（背景色、强调色、文字色），按模板名称固定选择
+THEMES = [
+    {"background": "#FFF4E6", "accent": "#FF6B35", "text": "#2D2D2D"},
+    {"background": "#EAF4FF", "accent": "#2F80ED", "text": "#1F2A44"},
+    {"background": "#FDEFF4", "accent": "#E4405F", "text": "#3A2A30"},
+    {"background": "#EEF8F0", "accent": "#27AE60", "text": "#1E3324"},
+    {"background": "#F3EEFF", "accent": "#7B61FF", "text": "#2B2540"},
+    {"background": "#FFFBE6", "accent": "#F2A900", "text": "#3A3220"},
+]
+
+# 常见系统中文字体，未配置 image.font_path 时依次尝试
+FONT_CANDIDATES = [
+    "/System/Library/Fonts/PingFang.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+]
+
+# 要点行：以列表符号、序号或emoji开头
+BULLET_PATTERN = re.compile(r'^\s*(?:[-•·✅✔⚡💡👉📌🔥]|\d+[.、)）])')
+
+# 渲染器版本，修改绘制逻辑后递增，使旧缓存失效
+RENDER_VERSION = 1
+
+
+class FontNotFoundError(FileNotFoundError):
+    """找不到可以显示中文的字体"""
+
+
+def find_font(font_path=None):
+    """
+    返回渲染用的中文字体路径：配置了 image.font_path 时使用该字体，否则依次查找常见系统中文字体
+
+    找不到时抛出 FontNotFoundError（Pillow 自带的默认字体没有中文字形，渲染出来全是方框）
+    """
+    if font_path:
+        if os.path.exists(font_path):
+            return font_path
+        raise FontNotFoundError(f"image.font_path 指定的字体不存在: {font_path}")
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    raise FontNotFoundError(
+        "未找到中文字体，请安装中文字体（如 fonts-noto-cjk）或在 image.font_path 中指定字体文件"
+    )
+
+
+def _load_font(font_path, size):
+    return ImageFont.truetype(font_path, size)
+
+
+def _wrap(draw, text, font, max_width):
+    """按像素宽度逐字换行（中文没有空格分词）"""
+    lines = []
+    current = ""
+    for char in text:
+        if draw.textlength(current + char, font=font) <= max_width:
+            current += char
+        else:
+            lines.append(current)
+            current = char
+    if current:
+        lines.append(current)
+    return lines
+
+
+def render_image(spec):
+    """
+    按 spec 渲染一张图片并保存，返回文件路径
+
+    作为模块级函数，可以在进程池中执行
+    """
+    width, height = spec['size']
+    theme = spec['theme']
+    margin = width // 12
+    max_width = width - margin * 2
+
+    image = Image.new("RGB", (width, height), theme['background'])
+    draw = ImageDraw.Draw(image)
+
+    # 顶部强调色条
+    draw.rectangle([0, 0, width, height // 40], fill=theme['accent'])
+
+    if spec['kind'] == "cover":
+        title_font = _load_font(spec.get('font_path'), width // 12)
+        lines = _wrap(draw, spec['title'], title_font, max_width)
+        line_height = int(title_font.size * 1.4)
+        y = (height - line_height * len(lines)) // 2
+        for line in lines:
+            draw.text((margin, y), line, font=title_font, fill=theme['text'])
+            y += line_height
+        # 标题下方的强调线
+        draw.rectangle([margin, y + line_height // 3, margin + width // 5, y + line_height // 3 + 12],
+                       fill=theme['accent'])
+    else:
+        heading_font = _load_font(spec.get('font_path'), width // 18)
+        body_font = _load_font(spec.get('font_path'), width // 24)
+        y = height // 12
+        for line in _wrap(draw, spec['title'], heading_font, max_width):
+            draw.text((margin, y), line, font=heading_font, fill=theme['accent'])
+            y += int(heading_font.size * 1.4)
+        y += body_font.size
+
+        for bullet in spec['lines']:
+            for line in _wrap(draw, bullet, body_font, max_width):
+                if y > height - margin:
+                    break
+                draw.text((margin, y), line, font=body_font, fill=theme['text'])
+                y += int(body_font.size * 1.6)
+            y += body_font.size // 2
+
+    # 先写临时文件再替换，并发渲染同一张图时不会读到半个文件
+    tmp_path = f"{spec['path']}.{os.getpid()}.tmp"
+    image.save(tmp_path, format="PNG")
+    os.replace(tmp_path, spec['path'])
+    return spec['path']
+
+
+class ImageRenderer:
+    def __init__(self, config):
+        """初始化渲染器（config 为 config.yaml 中的 image 配置）"""
+        self.size = tuple(config.get('size', [1242, 1656]))
+        self.count = config.get('count', 3)
+        # 实际使用的字体路径（自动查找到的字体也计入缓存键，安装字体后会重新渲染）
+        self.font_path = find_font(config.get('font_path'))
+        self.workers = config.get('render_workers', os.cpu_count() or 2)
+        self.cache_dir = os.path.join(config.get('save_path', 'assets/images'), "rendered")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def extract_points(body, limit=12):
+        """从正文中提取要点：优先列表行，不足时取前几段"""
+        lines = [line.strip() for line in body.splitlines() if line.strip()]
+        bullets = [line for line in lines if BULLET_PATTERN.match(line)]
+        return (bullets or lines)[:limit]
+
+    def theme_for(self, template):
+        digest = hashlib.md5((template or "").encode('utf-8')).digest()
+        return THEMES[digest[0] % len(THEMES)]
+
+    def cache_key(self, kind, title, template, lines=()):
+        """内容寻址：相同的标题、模板、尺寸和要点得到相同的文件名"""
+        payload = "\x1f".join([
+            str(RENDER_VERSION), kind, title, template or "",
+            f"{self.size[0]}x{self.size[1]}", self.font_path, *lines
+        ])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def build_specs(self, content):
+        """一篇笔记的渲染任务：1张封面 + (count-1) 张要点卡片"""
+        title = content['title']
+        template = content.get('template')
+        theme = self.theme_for(template)
+
+        specs = [{"kind": "cover", "title": title, "lines": []}]
+
+        cards = max(0, self.count - 1)
+        points = self.extract_points(content.get('content', ''))
+        per_card = max(1, -(-len(points) // cards)) if cards else 0
+        for i in range(cards):
+            chunk = points[i * per_card:(i + 1) * per_card]
+            specs.append({"kind": "card", "title": title, "lines": chunk})
+
+        for spec in specs:
+            key = self.cache_key(spec['kind'], title, template, spec['lines'])
+            spec.update({
+                "size": self.size,
+                "theme": theme,
+                "font_path": self.font_path,
+                "path": os.path.join(self.cache_dir, f"{key}.png")
+            })
+        return specs
+
+    def render_note(self, content):
+        """渲染一篇笔记的全部图片（已缓存的直接复用），返回图片路径"""
+        paths = []
+        for spec in self.build_specs(content):
+            if not os.path.exists(spec['path']):
+                render_image(spec)
+            paths.append(spec['path'])
+        return paths
+
+    def render_batch(self, contents):
+        """
+        用进程池批量渲染多篇笔记，返回与输入顺序一致的图片路径列表
+
+        调度器在任务线程中调用（其他线程可能正持有锁），子进程用 spawn 方式启动而不是 fork，
+        不会继承到被其他线程锁住的锁
+        """
+        all_specs = [self.build_specs(content) for content in contents]
+
+        # 去重后只渲染未缓存的图片
+        pending = {}
+        for specs in all_specs:
+            for spec in specs:
+                if not os.path.exists(spec['path']):
+                    pending[spec['path']] = spec
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                list(executor.map(render_image, pending.values()))
+
+        return [[spec['path'] for spec in specs] for specs in all_specs]
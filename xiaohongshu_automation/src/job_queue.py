@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+持久化任务队列
+生成、渲染、发布各阶段的任务保存在SQLite中，按幂等键去重；执行者领取任务时获得租约并定期续约，
+进程退出后租约过期的任务由其他执行者（或重启后的进程）重新领取，已完成的阶段不会重复执行。
+多个进程可以共用同一个队列文件，各执行者定期上报心跳，可以查看在线的执行者
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 3,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    parent_id INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(stage, status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires);
+
+CREATE TABLE IF NOT EXISTS workers (
+    owner TEXT PRIMARY KEY,
+    roles TEXT NOT NULL,
+    accounts TEXT,
+    started_at TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    running INTEGER DEFAULT 0,
+    completed INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    status TEXT NOT NULL
+);
+"""
+
+# 任务状态：pending 等待执行；leased 已被领取；done 已完成；failed 不再重试
+STATUSES = ("pending", "leased", "done", "failed")
+
+
+class LeaseLost(RuntimeError):
+    """租约已过期并被其他执行者领取，当前执行结果作废"""
+
+
+class JobFailed(RuntimeError):
+    """不应重试的失败（如内容校验失败、发布结果未知）"""
+
+
+def default_owner():
+    """执行者标识：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    def __init__(self, db_path="logs/queue.db"):
+        """初始化任务队列（多个进程可以同时使用同一个数据库文件）"""
+        self.db_path = db_path
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接，可在多线程、多进程中安全调用"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['key'] = job.pop('idempotency_key')
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    @staticmethod
+    def _insert(conn, stage, payload, key, max_attempts=3, parent_id=None):
+        """插入任务，幂等键已存在时忽略，返回任务ID"""
+        now = datetime.now().isoformat()
+        conn.execute(
+            "INSERT OR IGNORE INTO jobs (stage, idempotency_key, status, payload, max_attempts, available_at, "
+            "parent_id, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?, ?, ?, ?, ?)",
+            (stage, key, json.dumps(payload, ensure_ascii=False), max_attempts, time.time(), parent_id, now, now)
+        )
+        return conn.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()['id']
+
+    # ------------------------------------------------------------------
+    # 添加和查询
+    # ------------------------------------------------------------------
+
+    def enqueue(self, stage, payload, key, max_attempts=3):
+        """
+        添加任务，返回任务ID
+
+        key 为幂等键：同一个键只会有一个任务（重复添加时返回已有任务的ID，不论其状态）
+        """
+        with self._connect() as conn:
+            return self._insert(conn, stage, payload, key, max_attempts)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def get_by_key(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, status=None, stage=None, limit=50):
+        """按条件查询任务，按ID倒序返回"""
+        conditions = []
+        params = []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if stage is not None:
+            conditions.append("stage = ?")
+            params.append(stage)
+
+        sql = "SELECT * FROM jobs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self):
+        """各阶段各状态的任务数：{stage: {status: n}}"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, status, COUNT(*) AS n FROM jobs GROUP BY stage, status").fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['stage'], {})[row['status']] = row['n']
+        return counts
+
+    def descendants_done(self, job_id):
+        """任务及其后续阶段是否全部结束（done 或 failed）"""
+        with self._connect() as conn:
+            pending = [job_id]
+            while pending:
+                current = pending.pop()
+                row = conn.execute("SELECT status FROM jobs WHERE id = ?", (current,)).fetchone()
+                if row is None or row['status'] not in ("done", "failed"):
+                    return False
+                pending.extend(r['id'] for r in conn.execute("SELECT id FROM jobs WHERE parent_id = ?", (current,)))
+        return True
+
+    # ------------------------------------------------------------------
+    # 领取和完成
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _account_filter(accounts):
+        """只保留这些账号的发布任务的查询条件和参数（其他阶段不受限制）"""
+        if not accounts:
+            return "", []
+        return (f" AND (stage != 'publish' OR json_extract(payload, '$.account') IN "
+                f"({', '.join('?' for _ in accounts)}))"), list(accounts)
+
+    def outstanding(self, stages, accounts=None):
+        """指定阶段中等待执行和执行中的任务数（accounts 不为空时发布任务只计这些账号的）"""
+        marks = ", ".join("?" for _ in stages)
+        account_filter, account_params = self._account_filter(accounts)
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE stage IN ({marks}){account_filter} "
+                "AND status IN ('pending', 'leased')",
+                (*stages, *account_params)
+            ).fetchone()[0]
+
+    def claim(self, stages, owner, lease_seconds=60, accounts=None):
+        """
+        领取一个可执行的任务（等待中且已到重试时间，或租约已过期），没有时返回None
+
+        租约过期次数达到 max_attempts 的任务直接标记为失败；accounts 不为空时只领取
+        这些账号的发布任务（其他阶段不受限制）
+        """
+        marks = ", ".join("?" for _ in stages)
+        account_filter, account_params = self._account_filter(accounts)
+        params = [*stages, *account_params]
+
+        while True:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    f"SELECT * FROM jobs WHERE stage IN ({marks}){account_filter} AND ("
+                    "(status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?)"
+                    ") ORDER BY available_at, id LIMIT 1",
+                    (*params, now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                if row['status'] == "leased" and row['attempts'] >= row['max_attempts']:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, lease_owner = NULL, lease_expires = NULL, "
+                        "updated_at = ? WHERE id = ?",
+                        (f"执行者 {row['lease_owner']} 的租约过期 {row['attempts']} 次", datetime.now().isoformat(),
+                         row['id'])
+                    )
+                    continue
+
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    (owner, now + lease_seconds, datetime.now().isoformat(), row['id'])
+                )
+
+            job = self._row_to_job(row)
+            job.update(status="leased", lease_owner=owner, attempts=row['attempts'] + 1)
+            return job
+
+    def heartbeat(self, job_ids, owner, lease_seconds=60):
+        """为仍由 owner 持有的任务续约，返回续约成功的任务ID"""
+        if not job_ids:
+            return set()
+        marks = ", ".join("?" for _ in job_ids)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_expires = ? WHERE id IN ({marks}) AND status = 'leased' AND lease_owner = ?",
+                (time.time() + lease_seconds, *job_ids, owner)
+            )
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({marks}) AND status = 'leased' AND lease_owner = ?",
+                (*job_ids, owner)
+            ).fetchall()
+        return {row['id'] for row in rows}
+
+    def _check_lease(self, conn, job_id, owner):
+        row = conn.execute("SELECT status, lease_owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row['status'] != "leased" or row['lease_owner'] != owner:
+            raise LeaseLost(f"任务 #{job_id} 的租约已失效")
+        return row
+
+    def complete(self, job_id, owner, result=None, follow_ups=()):
+        """
+        标记任务完成，并在同一事务中添加后续阶段的任务
+
+        follow_ups 为 [{"stage", "payload", "key"}]；租约已失效时抛出 LeaseLost
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._check_lease(conn, job_id, owner)
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 datetime.now().isoformat(), job_id)
+            )
+            for follow_up in follow_ups:
+                self._insert(conn, follow_up['stage'], follow_up['payload'], follow_up['key'],
+                             follow_up.get('max_attempts', 3), parent_id=job_id)
+
+    def fail(self, job_id, owner, error, retry=True, retry_delay=30):
+        """
+        记录失败：retry 为 True 且未达到 max_attempts 时延后 retry_delay*次数 秒重试，否则标记为失败
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._check_lease(conn, job_id, owner)
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if retry and row['attempts'] < row['max_attempts']:
+                status, available_at = "pending", time.time() + retry_delay * row['attempts']
+            else:
+                status, available_at = "failed", time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (status, error, available_at, datetime.now().isoformat(), job_id)
+            )
+            return status
+
+    def release(self, job_id, owner):
+        """交还未开始执行的任务（不计入尝试次数）"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (datetime.now().isoformat(), job_id, owner)
+            )
+
+    def requeue_expired(self):
+        """
+        把租约已过期的任务放回队列（执行者退出或失联），返回 (重新排队数, 标记失败数)
+
+        过期次数达到 max_attempts 的任务标记为失败，避免反复导致执行者崩溃的任务无限重试
+        """
+        now = time.time()
+        updated_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = '执行者 ' || lease_owner || ' 的租约过期 ' || attempts || ' 次', "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (updated_at, now)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'pending', available_at = ?, lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE status = 'leased' AND lease_expires < ?",
+                (now, updated_at, now)
+            ).rowcount
+        return requeued, failed
+
+    def retry(self, job_id):
+        """把失败的任务重新放回队列（重置尝试次数），返回是否成功"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, error = NULL, available_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'failed'",
+                (time.time(), datetime.now().isoformat(), job_id)
+            )
+            return cursor.rowcount > 0
+
+    # ------------------------------------------------------------------
+    # 执行者心跳
+    # ------------------------------------------------------------------
+
+    def register_worker(self, owner, roles, accounts=None):
+        """登记执行者（同名执行者重新登记时覆盖）"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (owner, roles, accounts, started_at, last_seen, status) "
+                "VALUES (?, ?, ?, ?, ?, 'running')",
+                (owner, ",".join(roles), ",".join(accounts) if accounts else None,
+                 datetime.now().isoformat(), time.time())
+            )
+
+    def worker_heartbeat(self, owner, running=0, completed=0, failed=0):
+        """上报执行者心跳和累计执行情况"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE workers SET last_seen = ?, running = ?, completed = ?, failed = ? WHERE owner = ?",
+                (time.time(), running, completed, failed, owner)
+            )
+
+    def unregister_worker(self, owner):
+        """执行者正常退出"""
+        with self._connect() as conn:
+            conn.execute("UPDATE workers SET status = 'stopped', running = 0, last_seen = ? WHERE owner = ?",
+                         (time.time(), owner))
+
+    def list_workers(self, stale_seconds=60):
+        """全部执行者；超过 stale_seconds 没有心跳的运行中执行者状态为 lost"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM workers ORDER BY started_at").fetchall()
+        now = time.time()
+        workers = []
+        for row in rows:
+            worker = dict(row)
+            worker['roles'] = worker['roles'].split(",") if worker['roles'] else []
+            worker['accounts'] = worker['accounts'].split(",") if worker['accounts'] else []
+            worker['idle_seconds'] = now - worker['last_seen']
+            if worker['status'] == "running" and worker['idle_seconds'] > stale_seconds:
+                worker['status'] = "lost"
+            workers.append(worker)
+        return workers
+
+
+class QueueWorker:
+    """
+    从任务队列领取并执行任务
+
+    handlers 为 {stage: handler}，handler(job) 返回 (结果, 后续任务列表)；抛出 JobFailed 时不再重试，
+    其他异常按 retry_delay 延后重试。每个阶段按 concurrency 启动若干线程，另有一个线程定期为
+    执行中的任务续约、上报心跳，并把失联执行者的过期任务放回队列；accounts 不为空时只领取这些账号的发布任务
+    """
+
+    def __init__(self, queue, handlers, owner=None, concurrency=None, lease_seconds=60,
+                 poll_seconds=1.0, retry_delay=30, accounts=None):
+        self.queue = queue
+        self.handlers = handlers
+        self.owner = owner or default_owner()
+        self.concurrency = concurrency or {}
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_delay = retry_delay
+        self.accounts = list(accounts) if accounts else None
+        self.completed = 0
+        self.failed = 0
+
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def stages(self):
+        return list(self.handlers)
+
+    @property
+    def is_running(self):
+        return bool(self._threads)
+
+    def run_one(self, stages=None):
+        """领取并执行一个任务，没有可执行的任务时返回None，否则返回任务（含执行后的状态）"""
+        stages = stages or self.stages
+        if not stages:
+            return None
+        job = self.queue.claim(stages, self.owner, self.lease_seconds, self.accounts)
+        if job is None:
+            return None
+
+        with self._lock:
+            self._held.add(job['id'])
+        try:
+            result, follow_ups = self.handlers[job['stage']](job)
+            self.queue.complete(job['id'], self.owner, result, follow_ups)
+            job['status'] = "done"
+            with self._lock:
+                self.completed += 1
+        except LeaseLost as e:
+            print(f"⚠️  {str(e)}，结果已丢弃")
+            job['status'] = "lost"
+        except Exception as e:
+            retry = not isinstance(e, JobFailed)
+            try:
+                job['status'] = self.queue.fail(job['id'], self.owner, str(e), retry, self.retry_delay)
+            except LeaseLost:
+                job['status'] = "lost"
+            with self._lock:
+                self.failed += 1
+            print(f"❌ 任务 #{job['id']}（{job['stage']}）失败: {str(e)}"
+                  + ("，稍后重试" if job['status'] == "pending" else ""))
+        finally:
+            with self._lock:
+                self._held.discard(job['id'])
+        return job
+
+    def drain(self, stages=None):
+        """在当前线程执行任务直到没有可执行的任务，返回执行的任务数"""
+        count = 0
+        with self._heartbeat():
+            while self.run_one(stages) is not None:
+                count += 1
+        return count
+
+    def start(self):
+        """在后台线程中持续执行任务（没有处理任何阶段时不启动）"""
+        if self._threads or not self.stages:
+            return
+        self._stop.clear()
+        self.queue.register_worker(self.owner, self.stages, self.accounts)
+        for stage in self.stages:
+            for i in range(self.concurrency.get(stage, 1)):
+                thread = threading.Thread(target=self._loop, args=([stage],),
+                                          name=f"queue-{stage}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def stop(self, wait=True):
+        """停止执行（执行中的任务会完成）"""
+        if not self._threads:
+            return
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        self.queue.unregister_worker(self.owner)
+
+    def _loop(self, stages):
+        while not self._stop.is_set():
+            try:
+                job = self.run_one(stages)
+            except Exception as e:
+                print(f"❌ 任务队列访问失败: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+
+    def _renew(self):
+        with self._lock:
+            held = list(self._held)
+        if held:
+            self.queue.heartbeat(held, self.owner, self.lease_seconds)
+
+    def _heartbeat_loop(self):
+        # 每 1/3 租约时长续约一次，偶尔一次失败不会导致租约过期
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self._renew()
+                with self._lock:
+                    running, completed, failed = len(self._held), self.completed, self.failed
+                self.queue.worker_heartbeat(self.owner, running, completed, failed)
+                requeued, failed = self.queue.requeue_expired()
+                if requeued or failed:
+                    print(f"⏪ 失联执行者的任务: 重新排队 {requeued} 个，超过尝试次数 {failed} 个")
+            except Exception as e:
+                print(f"⚠️  任务续约失败: {str(e)}")
+
+    @contextmanager
+    def _heartbeat(self):
+        """drain 期间在后台续约"""
+        if self._threads:
+            yield
+            return
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(self.lease_seconds / 3):
+                self._renew()
+
+        thread = threading.Thread(target=loop, name="queue-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+
+def main():
+    """主函数"""
+    import argparse
+    from config_loader import load_config
+
+    parser = argparse.ArgumentParser(description='任务队列（不带参数时显示各阶段任务数）')
+    parser.add_argument('--failed', action='store_true', help='列出失败的任务')
+    parser.add_argument('--retry', type=int, nargs='+', help='把失败的任务重新放回队列')
+    parser.add_argument('--workers', action='store_true', help='列出执行者及心跳')
+    args = parser.parse_args()
+
+    config = load_config()
+    queue = JobQueue(config.get('queue', {}).get('db_path', 'logs/queue.db'))
+
+    if args.failed:
+        for job in queue.list(status="failed"):
+            print(f"   • #{job['id']} {job['stage']} {job['key']}（尝试 {job['attempts']} 次）: {job['error']}")
+    elif args.retry:
+        for job_id in args.retry:
+            print(f"   {'✓' if queue.retry(job_id) else '✗'} #{job_id}")
+    elif args.workers:
+        stale = config.get('queue', {}).get('lease_seconds', 120)
+        for worker in queue.list_workers(stale_seconds=stale):
+            accounts = f"，账号 {', '.join(worker['accounts'])}" if worker['accounts'] else ""
+            print(f"   • {worker['owner']} [{worker['status']}] 角色 {', '.join(worker['roles'])}{accounts}，"
+                  f"执行中 {worker['running']}，完成 {worker['completed']}，失败 {worker['failed']}，"
+                  f"{worker['idle_seconds']:.0f} 秒前心跳")
+    else:
+        counts = queue.counts()
+        if not counts:
+            print("📭 队列为空")
+        for stage, by_status in counts.items():
+            print(f"   • {stage}: " + "，".join(f"{status} {by_status.get(status, 0)}" for status in STATUSES))
+
+
+if __name__ == "__main__":
+    main()
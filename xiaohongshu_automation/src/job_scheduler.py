@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+事件驱动的任务调度器
+按最近的截止时间休眠，任务到点后交给线程池执行，不阻塞调度线程
+"""
+
+import os
+import json
+import heapq
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+# 最长休眠时间（秒），防止系统休眠或修改时钟后错过任务
+MAX_SLEEP_SECONDS = 300
+
+
+class _Job:
+    def __init__(self, name, func, max_concurrency, misfire, grace_seconds, with_run_at=False):
+        self.name = name
+        self.func = func
+        self.with_run_at = with_run_at
+        self.max_concurrency = max_concurrency
+        self.misfire = misfire
+        self.grace = timedelta(seconds=grace_seconds)
+        self.daily_times = []
+        self.every_days = 1
+        self.interval = None
+        self.running = 0
+        self.pending = deque()
+        self.last_run = None
+        self.last_due = None
+        self.next_run = None
+
+
+def _parse_time(at_time):
+    hour, minute = at_time.split(':')
+    return int(hour), int(minute)
+
+
+def _next_daily(at_time, after):
+    """at_time（HH:MM）在 after 之后的下一次时间"""
+    hour, minute = _parse_time(at_time)
+    run_at = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= after:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+def _missed_daily(at_time, since, until, every_days=1):
+    """since 到 until 之间错过的 at_time 时间点（每 every_days 天一次）"""
+    missed = []
+    run_at = _next_daily(at_time, since + timedelta(days=every_days - 1))
+    while run_at <= until:
+        missed.append(run_at)
+        run_at += timedelta(days=every_days)
+    return missed
+
+
+class JobScheduler:
+    def __init__(self, workers=4, state_path=None):
+        """
+        初始化调度器
+
+        workers 为执行任务的线程数；state_path 保存每个任务上次执行时间，
+        用于重启后按 misfire 策略补跑停机期间错过的任务
+        """
+        self.workers = workers
+        self.state_path = state_path
+
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = True
+        self._executor = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # 任务注册
+    # ------------------------------------------------------------------
+
+    def add_daily(self, name, at_times, func, max_concurrency=1, misfire="run_once", grace_seconds=600,
+                  with_run_at=False, every_days=1):
+        """
+        每天在 at_times（["09:00", ...]）执行 func
+
+        misfire 为错过执行时间（停机或执行延迟超过 grace_seconds）时的策略：
+        skip - 跳过；run_once - 补跑一次；all - 每个错过的时间点都补跑；
+        with_run_at 为 True 时调用 func(run_at)，run_at 为本次对应的计划时间（补跑时为错过的时间点）；
+        every_days 大于1时每隔 every_days 天执行一次，从上次执行（保存在状态文件中）开始计算，重启后不会重新计时
+        """
+        job = _Job(name, func, max_concurrency, misfire, grace_seconds, with_run_at)
+        job.daily_times = list(at_times)
+        job.every_days = every_days
+        self._add_job(job)
+        return job
+
+    def add_interval(self, name, seconds, func, max_concurrency=1):
+        """每隔 seconds 秒执行 func（错过时不补跑）"""
+        job = _Job(name, func, max_concurrency, "skip", seconds)
+        job.interval = timedelta(seconds=seconds)
+        self._add_job(job)
+        return job
+
+    def _add_job(self, job):
+        with self._cond:
+            if job.name in self._jobs:
+                raise ValueError(f"任务已存在: {job.name}")
+            job.last_run = job.last_due = self._load_state().get(job.name)
+            self._jobs[job.name] = job
+            if not self._stopped:
+                self._schedule_job(job, datetime.now())
+                self._cond.notify()
+
+    def reschedule(self, name, at_times=None, seconds=None, **options):
+        """
+        修改已有任务的执行时间（at_times 或 seconds）和 max_concurrency/misfire/grace_seconds/every_days
+
+        执行中和排队中的任务不受影响，并发限制继续对新旧执行一起生效
+        """
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                raise ValueError(f"任务不存在: {name}")
+
+            if at_times is not None:
+                job.daily_times = list(at_times)
+            if seconds is not None:
+                job.interval = timedelta(seconds=seconds)
+            if 'max_concurrency' in options:
+                job.max_concurrency = options['max_concurrency']
+            if 'misfire' in options:
+                job.misfire = options['misfire']
+            if 'grace_seconds' in options:
+                job.grace = timedelta(seconds=options['grace_seconds'])
+            if 'every_days' in options:
+                job.every_days = options['every_days']
+
+            self._heap = [entry for entry in self._heap if entry[2] != name]
+            heapq.heapify(self._heap)
+            job.next_run = None
+            if not self._stopped:
+                self._schedule_job(job, datetime.now())
+                self._cond.notify()
+            return job
+
+    def remove(self, name):
+        """移除任务（正在执行的不受影响）"""
+        with self._cond:
+            self._jobs.pop(name, None)
+            self._heap = [entry for entry in self._heap if entry[2] != name]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def trigger(self, name):
+        """立即执行一次任务（受该任务的并发限制）"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                raise ValueError(f"任务不存在: {name}")
+            if self._stopped:
+                raise RuntimeError("调度器未启动")
+            self._submit(job, datetime.now())
+
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
+
+    @property
+    def is_running(self):
+        return not self._stopped
+
+    def next_run(self):
+        """最近一次待执行时间，没有任务时返回None"""
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def queue_depth(self):
+        """已到点但因并发限制仍在排队的任务数"""
+        with self._cond:
+            return sum(len(job.pending) for job in self._jobs.values())
+
+    def status(self):
+        """每个任务的下次执行时间、执行中数量、排队数量和上次执行时间"""
+        with self._cond:
+            return [
+                {
+                    "name": job.name,
+                    "next_run": job.next_run,
+                    "running": job.running,
+                    "pending": len(job.pending),
+                    "last_run": job.last_run
+                }
+                for job in self._jobs.values()
+            ]
+
+    # ------------------------------------------------------------------
+    # 运行
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """在后台线程启动调度器"""
+        with self._cond:
+            if not self._stopped:
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+
+            now = datetime.now()
+            for job in self._jobs.values():
+                self._catch_up(job, now)
+                self._schedule_job(job, now)
+
+        self._thread = threading.Thread(target=self._loop, name="job-scheduler", daemon=True)
+        self._thread.start()
+
+    def run_forever(self):
+        """在当前线程运行，直到 stop() 或 Ctrl+C"""
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(timeout=1)
+        finally:
+            self.stop()
+
+    def stop(self, wait=True):
+        """停止调度器，wait 为True时等待执行中的任务结束"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._heap = []
+            self._cond.notify()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopped:
+                now = datetime.now()
+
+                if self._heap and self._heap[0][0] <= now:
+                    run_at, _, name, slot = heapq.heappop(self._heap)
+                    job = self._jobs.get(name)
+                    if job is not None:
+                        self._push(job, self._following(job, slot, run_at, now), slot)
+                        self._fire(job, run_at, now)
+                    continue
+
+                timeout = MAX_SLEEP_SECONDS
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+                self._cond.wait(timeout)
+
+    # 以下方法均在持有 self._cond 时调用
+
+    def _push(self, job, run_at, slot):
+        heapq.heappush(self._heap, (run_at, next(self._seq), job.name, slot))
+        job.next_run = min(entry[0] for entry in self._heap if entry[2] == job.name)
+
+    def _schedule_job(self, job, now):
+        after = now
+        if job.last_due is not None:
+            # 距上次执行不足 every_days 天的时间点跳过（every_days 为1时不影响）
+            after = max(now, job.last_due + timedelta(days=job.every_days - 1))
+        for at_time in job.daily_times:
+            self._push(job, _next_daily(at_time, after), at_time)
+        if job.interval is not None:
+            self._push(job, now + job.interval, None)
+
+    @staticmethod
+    def _following(job, slot, run_at, now):
+        """当前这次执行之后的下一次时间"""
+        if slot is None:
+            return max(run_at + job.interval, now)
+        return _next_daily(slot, max(run_at + timedelta(days=job.every_days - 1), now))
+
+    def _catch_up(self, job, now):
+        """启动时按 misfire 策略补跑停机期间错过的任务"""
+        if job.last_run is None or not job.daily_times or job.misfire == "skip":
+            return
+
+        missed = sorted(
+            run_at
+            for at_time in job.daily_times
+            for run_at in _missed_daily(at_time, job.last_run, now, job.every_days)
+        )
+        if not missed:
+            return
+
+        print(f"⏪ 任务 {job.name} 停机期间错过 {len(missed)} 次（策略: {job.misfire}）")
+        if job.misfire == "run_once":
+            missed = missed[-1:]
+        for run_at in missed:
+            self._submit(job, run_at)
+
+    def _fire(self, job, run_at, now):
+        late = now - run_at
+        if late > job.grace and job.misfire == "skip":
+            print(f"⚠️  任务 {job.name} 延迟 {late.total_seconds():.0f} 秒，超过容忍时间，已跳过")
+            return
+        self._submit(job, run_at)
+
+    def _submit(self, job, run_at):
+        if job.last_due is None or run_at > job.last_due:
+            job.last_due = run_at
+        if job.running >= job.max_concurrency:
+            # 间隔任务只保留一次排队，避免执行慢于间隔时无限堆积
+            if job.interval is None or not job.pending:
+                job.pending.append(run_at)
+            return
+        job.running += 1
+        self._executor.submit(self._run, job, run_at)
+
+    def _run(self, job, run_at):
+        try:
+            if job.with_run_at:
+                job.func(run_at)
+            else:
+                job.func()
+        except Exception as e:
+            print(f"❌ 任务 {job.name} 执行失败: {str(e)}")
+        finally:
+            with self._cond:
+                job.running -= 1
+                if job.last_run is None or run_at > job.last_run:
+                    job.last_run = run_at
+                    self._save_state()
+                if job.pending and not self._stopped:
+                    self._submit(job, job.pending.popleft())
+
+    # ------------------------------------------------------------------
+    # 状态文件
+    # ------------------------------------------------------------------
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return {name: datetime.fromisoformat(value) for name, value in state.items()}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        state = self._load_state()
+        for job in self._jobs.values():
+            if job.last_run is not None:
+                state[job.name] = job.last_run
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({name: value.isoformat() for name, value in state.items()}, f, indent=2)
+        os.replace(tmp_path, self.state_path)
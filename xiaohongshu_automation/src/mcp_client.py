@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+xiaohongshu-mcp 客户端
+通过HTTP长连接池与 compose.yml 中的 xiaohongshu-mcp 服务（默认端口18060）通信
+"""
+
+import os
+import shutil
+import hashlib
+import asyncio
+import threading
+import httpx
+
+
+class McpError(RuntimeError):
+    """xiaohongshu-mcp 返回失败"""
+
+
+def outcome_unknown(error):
+    """
+    发布请求失败时，服务端是否可能已经发布
+
+    请求已发出但没有收到完整响应（读取超时、连接中途断开等）时无法确定结果；
+    服务端明确返回失败、连接没有建立或请求没有发出时可以确定没有发布
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.UnsupportedProtocol)):
+        return False
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, TimeoutError))
+
+
+class XhsMcpClient:
+    def __init__(self, base_url="http://localhost:18060", timeout=60, max_connections=10,
+                 host_images_dir=None, container_images_dir=None):
+        """
+        初始化客户端
+
+        host_images_dir 为挂载到容器的本地图片目录（compose.yml 中的 ./images），
+        container_images_dir 为容器内对应路径（/app/images）；不设置时直接传本地路径
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.host_images_dir = host_images_dir
+        self.container_images_dir = container_images_dir
+        self._http = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """建立连接池（keep-alive复用连接）"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _request(self, method, path, **kwargs):
+        await self.open()
+        response = await self._http.request(method, path, **kwargs)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict) and data.get('success') is False:
+            raise McpError(data.get('message') or data.get('error') or "xiaohongshu-mcp 返回失败")
+        return data
+
+    async def health(self):
+        """检查服务是否可用"""
+        return await self._request("GET", "/health")
+
+    async def login_status(self):
+        """查询登录状态"""
+        return await self._request("GET", "/api/v1/login/status")
+
+    @staticmethod
+    def _staged_name(path):
+        """放到共享目录中的文件名：加上内容哈希前缀，不同目录下的同名图片不会互相覆盖"""
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        return f"{digest}_{os.path.basename(path)}"
+
+    @staticmethod
+    def _copy_atomic(path, target):
+        """先复制到临时文件再改名，服务端不会读到复制了一半的图片"""
+        temp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(path, temp)
+        os.replace(temp, target)
+
+    async def _stage_image(self, path):
+        """把一张图片放到容器可访问的目录，返回服务端使用的路径"""
+        if path.startswith(("http://", "https://")):
+            return path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"图片不存在: {path}")
+        if not self.host_images_dir:
+            return os.path.abspath(path)
+
+        os.makedirs(self.host_images_dir, exist_ok=True)
+        if os.path.abspath(os.path.dirname(path)) == os.path.abspath(self.host_images_dir):
+            # 图片本来就在共享目录中
+            filename = os.path.basename(path)
+        else:
+            filename = await asyncio.to_thread(self._staged_name, path)
+            target = os.path.join(self.host_images_dir, filename)
+            if not os.path.exists(target):
+                await asyncio.to_thread(self._copy_atomic, path, target)
+
+        base = self.container_images_dir or os.path.abspath(self.host_images_dir)
+        return f"{base.rstrip('/')}/{filename}"
+
+    async def upload_images(self, paths):
+        """并发上传（放置）一篇笔记的所有图片，返回顺序与输入一致"""
+        return list(await asyncio.gather(*(self._stage_image(path) for path in paths)))
+
+    async def publish(self, title, content, images, tags=None):
+        """发布图文笔记"""
+        staged = await self.upload_images(images)
+        return await self._request("POST", "/api/v1/publish", json={
+            "title": title,
+            "content": content,
+            "images": staged,
+            "tags": [tag.strip('#') for tag in (tags or [])]
+        })
+
+    async def feed_detail(self, feed_id, xsec_token=None):
+        """查询笔记详情（包含点赞、收藏、评论数）"""
+        return await self._request("POST", "/api/v1/feeds/detail", json={
+            "feed_id": feed_id,
+            "xsec_token": xsec_token or ""
+        })
+
+    async def search_feeds(self, keyword):
+        """按关键词搜索笔记，结果在 data.feeds 中（每项有 id、xsecToken 和 noteCard.displayTitle）"""
+        return await self._request("POST", "/api/v1/feeds/search", json={"keyword": keyword})
+
+
+class McpService:
+    """
+    在后台事件循环中维护各账号的 XhsMcpClient
+
+    提供同步接口供发布器和调度器调用；同一进程内的多次发布复用同一连接池，
+    全部账号同时进行的发布数不超过 max_parallel_publishes
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._clients = {}
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        # 进行中的调用数；关闭时等待它们完成，关闭后不再接受新的调用
+        self._busy = 0
+        self._closed = False
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-loop", daemon=True)
+        self._thread.start()
+
+    def _client(self, base_url):
+        base_url = base_url or self.config.get('base_url', 'http://localhost:18060')
+        if base_url not in self._clients:
+            self._clients[base_url] = XhsMcpClient(
+                base_url,
+                timeout=self.config.get('timeout', 60),
+                max_connections=self.config.get('max_connections', 10),
+                host_images_dir=self.config.get('host_images_dir'),
+                container_images_dir=self.config.get('container_images_dir')
+            )
+        return self._clients[base_url]
+
+    def _run(self, coro):
+        with self._idle:
+            if self._closed:
+                coro.close()
+                raise McpError("MCP连接已关闭")
+            self._busy += 1
+        try:
+            return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+        finally:
+            with self._idle:
+                self._busy -= 1
+                self._idle.notify_all()
+
+    async def _publish(self, base_url, title, content, images, tags):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.get('max_parallel_publishes', 3))
+        async with self._semaphore:
+            return await self._client(base_url).publish(title, content, images, tags)
+
+    def publish(self, title, content, images, tags=None, base_url=None):
+        """同步发布一篇笔记"""
+        return self._run(self._publish(base_url, title, content, images, tags))
+
+    def publish_many(self, items):
+        """
+        并行发布多篇笔记（可分布在不同账号）
+
+        items 为 [{"title", "content", "images", "tags", "base_url"}]，
+        返回与输入顺序一致的结果，失败的项为异常对象
+        """
+        async def run_all():
+            return await asyncio.gather(
+                *(self._publish(item.get('base_url'), item['title'], item['content'],
+                                item['images'], item.get('tags')) for item in items),
+                return_exceptions=True
+            )
+        return self._run(run_all())
+
+    async def _feed_detail(self, base_url, feed_id, xsec_token, semaphore):
+        async with semaphore:
+            return await self._client(base_url).feed_detail(feed_id, xsec_token)
+
+    def feed_details(self, items, max_parallel=5):
+        """
+        并行查询多篇笔记的详情
+
+        items 为 [{"note_id", "base_url", "xsec_token"}]，返回与输入顺序一致的结果，失败的项为异常对象
+        """
+        async def run_all():
+            semaphore = asyncio.Semaphore(max_parallel)
+            return await asyncio.gather(
+                *(self._feed_detail(item.get('base_url'), item['note_id'], item.get('xsec_token'), semaphore)
+                  for item in items),
+                return_exceptions=True
+            )
+        return self._run(run_all())
+
+    async def _search_feeds(self, base_url, keyword, semaphore):
+        async with semaphore:
+            return await self._client(base_url).search_feeds(keyword)
+
+    def search_many(self, items, max_parallel=5):
+        """
+        并行搜索笔记
+
+        items 为 [{"keyword", "base_url"}]，返回与输入顺序一致的结果，失败的项为异常对象
+        """
+        async def run_all():
+            semaphore = asyncio.Semaphore(max_parallel)
+            return await asyncio.gather(
+                *(self._search_feeds(item.get('base_url'), item['keyword'], semaphore) for item in items),
+                return_exceptions=True
+            )
+        return self._run(run_all())
+
+    def health(self, base_url=None):
+        return self._run(self._client(base_url).health())
+
+    def close(self):
+        """等待进行中的调用完成后关闭所有连接并停止后台事件循环"""
+        async def close_all():
+            for client in self._clients.values():
+                await client.close()
+        with self._idle:
+            if self._closed:
+                return
+            self._closed = True
+            while self._busy:
+                self._idle.wait()
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
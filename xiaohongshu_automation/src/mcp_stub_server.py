@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+本地模拟 xiaohongshu-mcp 服务
+提供与真实服务相同的HTTP接口，不访问小红书，用于测试发布流程
+"""
+
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubMcpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive
+
+    def log_message(self, format, *args):
+        # 保持输出简洁
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        latency = self.server.latency
+        if latency:
+            time.sleep(max(0.0, random.gauss(latency, latency * self.server.jitter)))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"success": True, "data": {"status": "healthy"}})
+        elif self.path == "/api/v1/login/status":
+            self._send(200, {"success": True, "data": {"is_logged_in": True, "username": "stub"}})
+        else:
+            self._send(404, {"success": False, "message": f"未知接口: {self.path}"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"success": False, "message": "请求体不是合法的JSON"})
+            return
+
+        if self.path == "/api/v1/feeds/detail":
+            self._feed_detail(payload)
+            return
+        if self.path == "/api/v1/feeds/search":
+            self._search_feeds(payload)
+            return
+        if self.path != "/api/v1/publish":
+            self._send(404, {"success": False, "message": f"未知接口: {self.path}"})
+            return
+
+        self._simulate_latency()
+
+        missing = [field for field in ("title", "content", "images") if not payload.get(field)]
+        if missing:
+            self._send(400, {"success": False, "message": f"缺少字段: {', '.join(missing)}"})
+            return
+
+        if random.random() < self.server.error_rate:
+            self._send(500, {"success": False, "message": "模拟发布失败"})
+            return
+
+        note_id = uuid.uuid4().hex[:24]
+        with self.server.lock:
+            self.server.published.append({"note_id": note_id, "published_at": time.time(), **payload})
+
+        data = {"title": payload['title'], "images": len(payload['images']), "status": "发布完成"}
+        if self.server.return_note_id:
+            data["note_id"] = note_id
+        self._send(200, {"success": True, "message": "发布成功", "data": data})
+
+    def _search_feeds(self, payload):
+        """搜索笔记：返回标题包含关键词的已发布笔记"""
+        self._simulate_latency()
+        keyword = payload.get('keyword') or ""
+        with self.server.lock:
+            matched = [item for item in self.server.published if keyword in item['title']]
+        self._send(200, {
+            "success": True,
+            "message": "搜索成功",
+            "data": {
+                "feeds": [
+                    {
+                        "id": item['note_id'],
+                        "xsecToken": f"stub_{item['note_id'][:8]}",
+                        "modelType": "note",
+                        "noteCard": {"displayTitle": item['title'], "type": "normal"}
+                    }
+                    for item in matched
+                ],
+                "count": len(matched)
+            }
+        })
+
+    def _feed_detail(self, payload):
+        """笔记详情：互动数随发布后的时间增长（每篇笔记的增长速度由 note_id 决定）"""
+        self._simulate_latency()
+        note_id = payload.get('feed_id')
+        with self.server.lock:
+            note = next((item for item in self.server.published if item['note_id'] == note_id), None)
+        if note is None:
+            self._send(404, {"success": False, "message": f"笔记不存在: {note_id}"})
+            return
+
+        # 按 note_id 固定的热度，模拟时间每秒相当于1小时
+        rng = random.Random(note_id)
+        heat = rng.lognormvariate(0, 1)
+        hours = time.time() - note['published_at']
+        likes = int(heat * 20 * hours ** 0.5)
+        self._send(200, {
+            "success": True,
+            "message": "获取笔记详情成功",
+            "data": {
+                "feed_id": note_id,
+                "data": {
+                    "note": {
+                        "noteId": note_id,
+                        "title": note['title'],
+                        "interactInfo": {
+                            "likedCount": str(likes),
+                            "collectedCount": str(int(likes * rng.uniform(0.2, 0.6))),
+                            "commentCount": str(int(likes * rng.uniform(0.02, 0.1))),
+                            "sharedCount": str(int(likes * rng.uniform(0.01, 0.05)))
+                        }
+                    }
+                }
+            }
+        })
+
+
+class StubMcpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.2, error_rate=0.0, return_note_id=True):
+        """
+        port 为0时自动选择空闲端口；latency/jitter/error_rate 用于模拟服务端延迟和失败；
+        return_note_id 为 False 时和真实服务一样，发布结果中不返回笔记ID（需要按标题搜索）
+        """
+        super().__init__((host, port), StubMcpHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.return_note_id = return_note_id
+        self.published = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_background(self):
+        """在后台线程运行，返回服务地址"""
+        thread = threading.Thread(target=self.serve_forever, name="mcp-stub", daemon=True)
+        thread.start()
+        return self.url
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地模拟 xiaohongshu-mcp 服务')
+    parser.add_argument('--port', type=int, default=18060, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0.0, help='发布接口平均延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='发布失败概率')
+    parser.add_argument('--no-note-id', action='store_true', help='发布结果中不返回笔记ID（与真实服务一致）')
+    args = parser.parse_args()
+
+    server = StubMcpServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                           return_note_id=not args.no_note_id)
+    print(f"🧪 模拟 xiaohongshu-mcp 服务已启动: {server.url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+API用量统计
+按模型价格估算每次调用的费用，并按模板/内容类型/模型汇总token、费用和延迟分位数
+"""
+
+import math
+
+
+# 每百万token价格（美元），按模型名前缀匹配，可在 monitoring.pricing 中覆盖或补充
+DEFAULT_PRICING = {
+    "claude-3-5-sonnet": {"input": 3.0, "output": 15.0},
+    "claude-3-7-sonnet": {"input": 3.0, "output": 15.0},
+    "claude-sonnet-4": {"input": 3.0, "output": 15.0},
+    "claude-3-5-haiku": {"input": 0.8, "output": 4.0},
+    "claude-3-haiku": {"input": 0.25, "output": 1.25},
+    "claude-3-opus": {"input": 15.0, "output": 75.0},
+    "claude-opus-4": {"input": 15.0, "output": 75.0},
+}
+
+# 提示词缓存写入/命中相对于普通输入的价格倍数
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+# Message Batches API 的折扣
+BATCH_DISCOUNT = 0.5
+
+GROUP_FIELDS = ("template", "content_type", "model")
+
+
+def price_for(model, pricing=None):
+    """查找模型价格（最长前缀匹配），未知模型返回None"""
+    table = dict(DEFAULT_PRICING)
+    table.update(pricing or {})
+    matches = [prefix for prefix in table if model and model.startswith(prefix)]
+    if not matches:
+        return None
+    return table[max(matches, key=len)]
+
+
+def call_cost(call, pricing=None):
+    """估算一次调用的费用（美元），未知模型返回None"""
+    price = price_for(call.get('model'), pricing)
+    if price is None:
+        return None
+
+    input_price = price['input'] / 1_000_000
+    cost = (
+        (call.get('input_tokens') or 0) * input_price
+        + (call.get('cache_creation_input_tokens') or 0) * input_price * CACHE_WRITE_MULTIPLIER
+        + (call.get('cache_read_input_tokens') or 0) * input_price * CACHE_READ_MULTIPLIER
+        + (call.get('output_tokens') or 0) * price['output'] / 1_000_000
+    )
+    if call.get('mode') == "batch":
+        cost *= BATCH_DISCOUNT
+    return cost
+
+
+def percentile(values, q):
+    """线性插值分位数（q 为 0-100），没有数据时返回None"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(calls, group_by="template", pricing=None):
+    """
+    按 group_by 分组汇总调用记录
+
+    返回按费用降序的列表，每项包含调用数、失败数、token合计、费用、
+    总耗时 p50/p95 和首个token耗时 p50（只统计实际调用API的记录）
+    """
+    if group_by not in GROUP_FIELDS:
+        raise ValueError(f"group_by 应为 {' / '.join(GROUP_FIELDS)}")
+
+    groups = {}
+    for call in calls:
+        groups.setdefault(call.get(group_by) or "unknown", []).append(call)
+
+    rows = []
+    for key, items in groups.items():
+        costs = [call_cost(call, pricing) for call in items]
+        # 命中响应缓存的记录不计入延迟
+        api_calls = [call for call in items if call.get('mode') != "cache"]
+        rows.append({
+            "key": key,
+            "calls": len(items),
+            "errors": sum(1 for call in items if call.get('status') != "ok"),
+            "cached": len(items) - len(api_calls),
+            "input_tokens": sum(call.get('input_tokens') or 0 for call in items),
+            "output_tokens": sum(call.get('output_tokens') or 0 for call in items),
+            "cache_read_input_tokens": sum(call.get('cache_read_input_tokens') or 0 for call in items),
+            "cache_creation_input_tokens": sum(call.get('cache_creation_input_tokens') or 0 for call in items),
+            "cost": sum(cost for cost in costs if cost is not None),
+            "unpriced": sum(1 for cost in costs if cost is None),
+            "latency_p50": percentile([call.get('latency_ms') for call in api_calls], 50),
+            "latency_p95": percentile([call.get('latency_ms') for call in api_calls], 95),
+            "ttft_p50": percentile([call.get('ttft_ms') for call in api_calls], 50)
+        })
+
+    rows.sort(key=lambda row: row['cost'], reverse=True)
+    return rows
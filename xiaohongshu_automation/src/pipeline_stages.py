@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+发布流水线的各个阶段
+一次定时发布拆成 生成 → 渲染 → 发布 三个任务放入持久化任务队列；重新执行某个阶段时复用
+已生成的内容（按任务幂等键查找）和已渲染的图片（内容寻址缓存），已发布的内容按内容哈希跳过
+"""
+
+from content_store import content_hash
+from job_queue import JobFailed
+
+
+STAGES = ("generate", "render", "publish")
+
+
+def generate_key(account, run_at):
+    """定时发布的生成任务幂等键：同一账号同一发布时间只生成一篇"""
+    return f"generate:{account}:{run_at:%Y-%m-%dT%H:%M}"
+
+
+class PipelineStages:
+    def __init__(self, generator, publisher):
+        self.generator = generator
+        self.publisher = publisher
+
+    @property
+    def store(self):
+        return self.generator.store
+
+    @property
+    def config(self):
+        return self.generator.config
+
+    def handlers(self, stages=None):
+        """{阶段: 处理函数}，stages 为None时包含全部阶段"""
+        return {stage: getattr(self, stage) for stage in (STAGES if stages is None else stages)}
+
+    def _next(self, content, payload, stage, max_attempts=3):
+        """阶段完成后的下一个任务：需要渲染时先渲染，自动发布时再发布"""
+        if stage == "generate" and self.publisher.image_method == 'render':
+            return [{
+                "stage": "render",
+                "payload": payload,
+                "key": f"render:{content['id']}",
+                "max_attempts": max_attempts
+            }]
+        if payload.get('publish'):
+            return [{
+                "stage": "publish",
+                "payload": payload,
+                "key": f"publish:{content_hash(content)}",
+                "max_attempts": max_attempts
+            }]
+        return []
+
+    def generate(self, job):
+        """
+        生成阶段：优先复用本任务已保存的内容，其次从预生成缓冲区取用，最后才调用API生成
+
+        payload 为 {"account", "publish"}，publish 为 False 时内容留待人工审核
+        """
+        payload = dict(job['payload'])
+        status = "queued" if payload.get('publish') else "generated"
+
+        content = self.store.find_by_job_key(job['key'])
+        if content is not None:
+            print(f"♻️  复用已生成的内容: #{content['id']} {content['title']}")
+        elif self.config.get('pipeline', {}).get('enabled', False):
+            content = self.store.claim_oldest("ready", status, job_key=job['key'])
+            if content is not None:
+                print(f"📦 使用预生成的内容: #{content['id']} {content['title']}")
+
+        if content is None:
+            content = self.generator.generate_content()
+            if content is None:
+                raise RuntimeError("内容生成失败")
+            self.generator.save_content(content, status=status, job_key=job['key'])
+
+        payload['content_id'] = content['id']
+        return {"content_id": content['id']}, self._next(content, payload, "generate", job['max_attempts'])
+
+    def _load(self, payload):
+        content = self.store.get(payload['content_id'])
+        if content is None:
+            raise JobFailed(f"内容不存在: #{payload['content_id']}")
+        return content
+
+    def render(self, job):
+        """渲染阶段：渲染笔记图片（已渲染的直接命中缓存；找不到中文字体时使用占位图片）"""
+        content = self._load(job['payload'])
+        images = self.publisher.create_images(content)
+        return {"images": images}, self._next(content, job['payload'], "render", job['max_attempts'])
+
+    def publish(self, job):
+        """发布阶段：加入账号的发布队列并等待结果（账号已从配置中删除时改为自动分配）"""
+        payload = job['payload']
+        content = self._load(payload)
+
+        account = payload.get('account')
+        if account not in self.publisher.accounts.names:
+            account = None
+        name, future = self.publisher.enqueue(content, account)
+        result = future.result()
+
+        if result['status'] in ("error", "unknown"):
+            # 校验失败或上次发布结果未知：重试也不会成功，或者可能重复发布
+            raise JobFailed(result['message'])
+        return {"account": name, "status": result['status']}, []
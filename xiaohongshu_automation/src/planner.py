@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+内容计划
+一次性为一批笔记抽取（内容类型、模板、标题变量、话题标签），
+按权重目标和近期发布情况均衡覆盖，固定随机种子时计划可复现
+"""
+
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy as np
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+
+def apportion(shares, total):
+    """最大余数法：把 total 按 shares 比例分配为整数，总和恰好为 total"""
+    shares = np.asarray(shares, dtype=float)
+    if total <= 0 or shares.sum() <= 0:
+        return np.zeros(len(shares), dtype=int)
+    quotas = shares / shares.sum() * total
+    counts = np.floor(quotas).astype(int)
+    remainder = total - counts.sum()
+    if remainder:
+        # 余数相同时按顺序分配，保证结果确定
+        order = np.lexsort((np.arange(len(quotas)), -(quotas - counts)))
+        counts[order[:remainder]] += 1
+    return counts
+
+
+def balanced_counts(weights, recent, total):
+    """
+    按权重目标分配 total 个名额，并补偿近期使用的偏差
+
+    把近期已使用的数量和本次计划合在一起看：目标为 weights 比例 × (近期 + 本次)，
+    本次优先分配给离目标差得多的项
+    """
+    weights = np.asarray(weights, dtype=float)
+    recent = np.asarray(recent, dtype=float)
+    target = weights / weights.sum() * (recent.sum() + total)
+    deficit = np.clip(target - recent, 0, None)
+    if deficit.sum() == 0:
+        deficit = weights
+    return apportion(deficit, total)
+
+
+def spread(counts, rng):
+    """
+    把各项的出现次数均匀打散成一个序列（类似步长调度），避免同一类型扎堆
+
+    返回长度为 counts.sum() 的下标数组
+    """
+    labels = np.repeat(np.arange(len(counts)), counts)
+    if len(labels) == 0:
+        return labels
+    # 第 k 次出现的位置约为 (k + 随机偏移) / 该项次数
+    offsets = rng.random(len(counts))
+    ranks = np.concatenate([np.arange(c) for c in counts])
+    positions = (ranks + offsets[labels]) / np.asarray(counts)[labels]
+    return labels[np.argsort(positions, kind="stable")]
+
+
+def weighted_sample_rows(rng, weights, rows, k):
+    """
+    每行独立地从 len(weights) 个候选中按权重无放回抽取 k 个（Gumbel-top-k，整批一次完成）
+
+    返回形状为 (rows, k) 的下标矩阵
+    """
+    weights = np.asarray(weights, dtype=float)
+    k = min(k, len(weights))
+    if k == 0 or rows == 0:
+        return np.zeros((rows, 0), dtype=int)
+    keys = np.log(weights)[None, :] + rng.gumbel(size=(rows, len(weights)))
+    return np.argsort(-keys, axis=1)[:, :k]
+
+
+class ContentPlanner:
+    def __init__(self, config, templates, seed=None):
+        """初始化计划器（seed 固定时生成的计划可复现）"""
+        self.config = config
+        self.templates = templates
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, config, templates):
+        """使用新的配置和模板（保留随机数状态）"""
+        self.config = config
+        self.templates = templates
+
+    def recent_usage(self, entries, days=14):
+        """
+        统计近期发布日志中内容类型、模板和话题标签的使用次数
+
+        entries 为发布日志条目的迭代器（流式读取，不需要全部加载）
+        """
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+        usage = {"content_type": Counter(), "template": Counter(), "tags": Counter()}
+
+        for entry in entries:
+            if entry.get('timestamp', '') < since:
+                continue
+            usage['content_type'][entry.get('content_type')] += 1
+            usage['template'][entry.get('template')] += 1
+            for tag in entry.get('tags', []):
+                usage['tags'][tag.strip('#')] += 1
+
+        return usage
+
+    def _tag_weights(self, pool, recent_tags):
+        # 近期用得越多的标签权重越低
+        return [1.0 / (1 + recent_tags.get(tag, 0)) for tag in pool]
+
+    def plan(self, count, recent=None):
+        """
+        生成 count 篇笔记的计划
+
+        返回列表，每项包含 content_type（配置中的内容类型）、template_id、template、
+        variables（标题变量取值）和 tags（话题标签）
+        """
+        recent = recent or {"content_type": Counter(), "template": Counter(), "tags": Counter()}
+        # 整个计划使用同一份配置（配置可能在计划过程中被重新加载）
+        config, templates = self.config, self.templates
+        content_types = config['content_strategy']['content_types']
+
+        # 1. 内容类型：按权重和近期使用分配名额，再均匀打散
+        type_counts = balanced_counts(
+            [ct['weight'] for ct in content_types],
+            [recent['content_type'].get(ct['name'], 0) for ct in content_types],
+            count
+        )
+        type_sequence = spread(type_counts, self.rng)
+
+        # 2. 模板：每个内容类型内部的模板平均分配
+        template_ids = [None] * count
+        for type_index, content_type in enumerate(content_types):
+            slots = np.flatnonzero(type_sequence == type_index)
+            if len(slots) == 0:
+                continue
+            ids = content_type['templates']
+            template_counts = balanced_counts(
+                np.ones(len(ids)),
+                [recent['template'].get(templates['templates'][tid]['name'], 0) for tid in ids],
+                len(slots)
+            )
+            for slot, template_index in zip(slots, spread(template_counts, self.rng)):
+                template_ids[slot] = ids[template_index]
+
+        # 3. 标题变量：每个变量整批一次抽取
+        variables = templates['variables']
+        draws = {
+            name: self.rng.integers(len(values), size=count)
+            for name, values in variables.items()
+        }
+
+        # 4. 话题标签：1个主要 + 3个次要 + 2个可选，近期少用的标签优先
+        hashtags = config['hashtags']
+        tag_groups = [
+            (hashtags['primary'], 1),
+            (hashtags['secondary'], 3),
+            (hashtags['optional'], 2)
+        ]
+        tag_draws = [
+            (pool, weighted_sample_rows(self.rng, self._tag_weights(pool, recent['tags']), count, k))
+            for pool, k in tag_groups
+        ]
+        tag_limit = config['hashtags'].get('count', 6)
+
+        plan = []
+        for i in range(count):
+            template_id = template_ids[i]
+            template = templates['templates'][template_id]
+            placeholders = PLACEHOLDER_PATTERN.findall(template['title_pattern'])
+
+            tags = []
+            for pool, picks in tag_draws:
+                tags.extend(pool[j] for j in picks[i])
+            # 去重并保持顺序
+            tags = list(dict.fromkeys(tags))[:tag_limit]
+
+            plan.append({
+                "content_type": content_types[type_sequence[i]],
+                "template_id": template_id,
+                "template": template,
+                "variables": {
+                    name: variables[name][draws[name][i]]
+                    for name in placeholders if name in variables
+                },
+                "tags": [f"#{tag}" for tag in tags]
+            })
+
+        return plan
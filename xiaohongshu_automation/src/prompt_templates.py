@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+提示词模板引擎
+每份配置快照只编译一次：系统提示词预先渲染成字符串，每个模板的用户提示词
+（含 title_pattern）解析成“固定文本 + 变量槽位”的片段列表，生成时只需填充槽位
+"""
+
+import re
+import random
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+SYSTEM_PROMPT = """你是一个专业的小红书营销文案专家，擅长创作高互动量的内容。
+
+【产品信息】
+名称：{name}
+网址：{url}
+简介：{description}
+功能：{features}
+目标用户：{target_users}
+核心痛点：{pain_points}
+
+【要求】
+1. 标题：12-20字，吸引眼球，可以使用数字或疑问句
+2. 正文：200-350字，分段清晰，多用emoji（根据密度要求）
+3. 风格：口语化、接地气、有共鸣感、真诚
+4. 避免：绝对化用语（最好、第一）、夸大宣传、虚假承诺
+5. 重点：突出产品价值，解决用户痛点，提供实用信息
+
+【参考优秀案例风格】
+"做了半年Temu，终于找到宝藏工具了！🎉
+
+之前每天光是上架产品就要花3个小时😭
+- 手动复制粘贴商品信息
+- 一个个核对价格
+- 库存变动要手动更新
+
+直到我发现了这个神器！⚡️
+
+现在效率提升10倍，每天多出2小时去优化策略💪"
+
+每次请根据用户给出的内容类型和模板信息，生成一篇完整的小红书笔记内容，包括：
+1. 标题（不要加"标题："前缀）
+2. 正文内容
+3. 不需要包含话题标签（我会单独添加）
+
+注意：
+- 不要使用markdown格式
+- 直接输出纯文本
+- 标题和正文之间用空行分隔
+- 保持真实感，像真人在分享经验
+"""
+
+# 内容类型名称的槽位名（与标题变量区分）
+CONTENT_TYPE_SLOT = "__content_type__"
+
+
+def compile_segments(parts, slot_sets):
+    """
+    把若干段文本解析成一个片段列表：字符串为固定文本，(槽位名,) 元组为待填充的变量
+
+    每段文本只把对应 slot_sets 中的名称作为槽位，其余 {xxx} 按原样保留；相邻的固定文本合并
+    """
+    segments = []
+    for text, slots in zip(parts, slot_sets):
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.group(1) not in slots:
+                continue
+            segments.append(text[position:match.start()])
+            segments.append((match.group(1),))
+            position = match.end()
+        segments.append(text[position:])
+
+    merged = []
+    for segment in segments:
+        if isinstance(segment, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += segment
+        elif segment != "":
+            merged.append(segment)
+    return merged
+
+
+class CompiledTemplate:
+    def __init__(self, template, variables):
+        """编译一个模板的用户提示词（模板的结构、风格等固定信息直接写入片段）"""
+        self.template = template
+        # 只有 title_pattern 中的 {变量} 是槽位，其余模板信息按原文写入
+        head = "【内容类型】{" + CONTENT_TYPE_SLOT + "}\n\n【模板信息】\n标题参考："
+        tail = (
+            f"\n内容结构：{', '.join(template['content_structure'])}\n"
+            f"写作风格：{template['style']}\n"
+            f"表情符号密度：{template['emoji_density']}\n\n"
+            "请按以上要求生成这篇笔记。\n"
+        )
+        self.segments = compile_segments(
+            [head, template['title_pattern'], tail],
+            [{CONTENT_TYPE_SLOT}, set(variables), set()]
+        )
+        # 标题变量槽位（不含内容类型）
+        self.slots = list(dict.fromkeys(
+            segment[0] for segment in self.segments
+            if isinstance(segment, tuple) and segment[0] != CONTENT_TYPE_SLOT
+        ))
+        # 片段转成 str.format 格式串，渲染时一次 format_map 完成（在C代码中拼接）
+        self.format_string = "".join(
+            segment.replace("{", "{{").replace("}", "}}") if isinstance(segment, str)
+            else "{%s}" % segment[0]
+            for segment in self.segments
+        )
+
+    def render(self, values):
+        """填充槽位（values 须包含内容类型和全部标题变量）"""
+        return self.format_string.format_map(values)
+
+
+class PromptEngine:
+    def __init__(self, config, templates, version=None):
+        """按一份配置快照预渲染系统提示词并编译全部模板"""
+        self.version = version
+        self.variables = templates['variables']
+
+        product = config['product']
+        self.system_prompt = SYSTEM_PROMPT.format(
+            name=product['name'],
+            url=product['url'],
+            description=product['description'],
+            features=', '.join(product['features']),
+            target_users=', '.join(product['target_users']),
+            pain_points=', '.join(product['pain_points'])
+        )
+
+        # 按模板对象查找（同一快照中的模板字典），也可按模板ID查找
+        self.compiled = {}
+        self._by_object = {}
+        for template_id, template in templates['templates'].items():
+            compiled = CompiledTemplate(template, self.variables)
+            self.compiled[template_id] = compiled
+            self._by_object[id(template)] = compiled
+
+    def get(self, template):
+        """取得模板的编译结果（template 为模板ID或模板字典）"""
+        if isinstance(template, str):
+            return self.compiled[template]
+        compiled = self._by_object.get(id(template))
+        if compiled is None or compiled.template is not template:
+            # 不属于当前快照的模板（如配置刚重新加载），临时编译
+            compiled = CompiledTemplate(template, self.variables)
+        return compiled
+
+    def render(self, template, content_type, variables=None):
+        """
+        渲染用户提示词
+
+        variables 为计划好的标题变量取值，未提供的变量从 variables 列表中随机选择
+        """
+        compiled = self.get(template)
+        values = dict(variables) if variables else {}
+        values[CONTENT_TYPE_SLOT] = content_type['name']
+        for name in compiled.slots:
+            if not values.get(name):
+                values[name] = random.choice(self.variables[name])
+        return compiled.render(values)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+发布日志存储
+JSON Lines 格式的追加写日志，每次发布只追加一行
+"""
+
+import os
+import json
+
+
+class PublishLog:
+    def __init__(self, log_path):
+        """初始化发布日志"""
+        self.log_path = log_path
+
+    def append(self, entry):
+        """
+        追加一条日志（写入后 fsync，崩溃时最多丢失正在写的这一行）
+
+        上次崩溃留下不完整的行时先补一个换行，新日志不会接在残行后面一起变成无法解析的行
+        """
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+
+        with open(self.log_path, 'ab+') as f:
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_entries(self):
+        """逐行读取日志，不会把全部历史加载到内存"""
+        if not os.path.exists(self.log_path):
+            return
+
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的行，跳过
+                    continue
+
+    def migrate_from_json_array(self, legacy_path):
+        """
+        将旧版 JSON 数组日志迁移为 JSON Lines
+
+        迁移完成后旧文件重命名为 *.migrated，返回迁移的条数（旧文件不存在时返回None）
+        """
+        if not os.path.exists(legacy_path):
+            return None
+
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+
+        # 先写临时文件再原子替换，迁移中途失败不会破坏已有日志
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            for entry in self.iter_entries():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.log_path)
+        os.replace(legacy_path, legacy_path + ".migrated")
+
+        return len(entries)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+API用量报告
+按模板（或内容类型、模型）汇总指定时间范围内的调用次数、token用量、估算费用和延迟分位数
+"""
+
+import os
+from datetime import datetime, timedelta
+from content_store import ContentStore
+from config_loader import load_config
+from metrics import summarize
+
+
+GROUP_LABELS = {"template": "模板", "content_type": "内容类型", "model": "模型"}
+
+
+def _ms(value):
+    return f"{value:.0f}ms" if value is not None else "-"
+
+
+def build_report(store, since, until, group_by="template", pricing=None):
+    """生成报告文本"""
+    calls = store.list_calls(since=since, until=until)
+    rows = summarize(calls, group_by=group_by, pricing=pricing)
+
+    lines = [
+        f"📊 API用量报告（{since:%Y-%m-%d} ~ {until - timedelta(seconds=1):%Y-%m-%d}，按{GROUP_LABELS[group_by]}）",
+        ""
+    ]
+    if not rows:
+        lines.append("   该时间范围内没有调用记录")
+        return "\n".join(lines)
+
+    for row in rows:
+        lines.append(f"• {row['key']}")
+        lines.append(
+            f"   调用 {row['calls']} 次（失败 {row['errors']}，命中缓存 {row['cached']}）"
+            f"  费用 ${row['cost']:.4f}" + (f"（{row['unpriced']} 次模型价格未知）" if row['unpriced'] else "")
+        )
+        lines.append(
+            f"   token: 输入 {row['input_tokens']} / 输出 {row['output_tokens']} / "
+            f"缓存命中 {row['cache_read_input_tokens']} / 缓存写入 {row['cache_creation_input_tokens']}"
+        )
+        lines.append(
+            f"   延迟: p50 {_ms(row['latency_p50'])} / p95 {_ms(row['latency_p95'])}"
+            f" / 首个token p50 {_ms(row['ttft_p50'])}"
+        )
+
+    total_calls = sum(row['calls'] for row in rows)
+    total_cost = sum(row['cost'] for row in rows)
+    succeeded = len({call['content_id'] for call in calls if call.get('content_id') is not None})
+    lines.append("")
+    lines.append(f"合计: 调用 {total_calls} 次，费用 ${total_cost:.4f}，保存内容 {succeeded} 篇"
+                 + (f"，每篇 ${total_cost / succeeded:.4f}" if succeeded else ""))
+    return "\n".join(lines)
+
+
+def save_report(text, directory="logs/reports", prefix="report"):
+    """保存报告到 logs/reports/，返回文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text + "\n")
+    return path
+
+
+def report_range(config, since=None, until=None):
+    """解析时间范围：默认为最近 monitoring.report_interval 天（until 当天包含在内）"""
+    if until is None:
+        until = datetime.now()
+    else:
+        until = datetime.fromisoformat(until) + timedelta(days=1)
+    if since is None:
+        days = config.get('monitoring', {}).get('report_interval', 7)
+        since = until - timedelta(days=days)
+    else:
+        since = datetime.fromisoformat(since)
+    return since, until
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='API用量报告')
+    parser.add_argument('--since', type=str, help='开始日期（YYYY-MM-DD，默认为 monitoring.report_interval 天前）')
+    parser.add_argument('--until', type=str, help='结束日期（YYYY-MM-DD，包含当天，默认为今天）')
+    parser.add_argument('--by', choices=list(GROUP_LABELS), default='template', help='分组方式')
+    parser.add_argument('--save', action='store_true', help='同时保存到 logs/reports/')
+    args = parser.parse_args()
+
+    config = load_config()
+    store = ContentStore(config['storage']['content_db'])
+    since, until = report_range(config, args.since, args.until)
+
+    text = build_report(store, since, until, args.by, config.get('monitoring', {}).get('pricing'))
+    print(text)
+
+    if args.save:
+        print(f"\n💾 报告已保存: {save_report(text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+响应缓存
+以最终提示词和模型参数的哈希为键，缓存Claude的回复，支持过期时间和LRU淘汰
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    def __init__(self, db_path="logs/response_cache.db", ttl_seconds=7 * 24 * 3600,
+                 max_entries=1000, max_bytes=50 * 1024 * 1024):
+        """初始化响应缓存"""
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # 本进程内的命中统计
+        self.session_hits = 0
+        self.session_misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(params, variant=None):
+        """
+        根据请求参数计算缓存键
+
+        params 为 messages.create 的完整参数（包含最终提示词、model、temperature、max_tokens），
+        variant 用于在 temperature>0 时为同一提示词缓存多个不同版本
+        """
+        payload = json.dumps(
+            {"params": params, "variant": variant},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, conn, name):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回None"""
+        now = time.time()
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is not None and now - row['created_at'] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self._count(conn, "misses")
+            else:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._count(conn, "hits")
+
+        with self._lock:
+            if row is None:
+                self.session_misses += 1
+            else:
+                self.session_hits += 1
+
+        return json.loads(row['value']) if row is not None else None
+
+    def put(self, key, value):
+        """写入缓存，超出条数或容量上限时淘汰最久未访问的条目"""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode('utf-8')), now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """按LRU淘汰，直到条数和容量都在上限以内"""
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+        while True:
+            row = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS total FROM responses").fetchone()
+            excess = row['n'] - self.max_entries
+            if excess <= 0 and row['total'] <= self.max_bytes:
+                break
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (max(excess, 1),)
+            )
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """返回缓存统计（累计命中/未命中、条目数、占用字节数）"""
+        with self._connect() as conn:
+            counters = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM stats")}
+            row = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS total FROM responses").fetchone()
+
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        total = hits + misses
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": row['n'],
+            "size_bytes": row['total'],
+            "session_hits": self.session_hits,
+            "session_misses": self.session_misses
+        }
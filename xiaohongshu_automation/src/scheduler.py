@@ -1,53 +1,204 @@
 #!/usr/bin/env python3
 """
 定时任务调度器
-自动生成和发布小红书内容
+自动生成和发布小红书内容；启用任务队列时每次发布拆成生成、渲染、发布三个持久化任务，
+进程重启后从中断的阶段继续
 """
 
-import schedule
 import time
-import yaml
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
 from content_generator import ContentGenerator
 from xhs_publisher import XiaohongshuPublisher
+from job_scheduler import JobScheduler
+from config_loader import get_service
+from account_pool import account_configs, post_times_for
+from job_queue import JobQueue, QueueWorker
+from pipeline_stages import STAGES, PipelineStages, generate_key
 
 
 class ContentScheduler:
     def __init__(self, config_path="config/config.yaml"):
         """初始化调度器"""
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        # 共享的配置服务：运行中修改 post_times、流水线等配置后自动重新安排任务
+        self.settings = get_service(config_path)
+        self.settings.subscribe(self._on_config_change)
 
-        self.generator = ContentGenerator()
-        self.publisher = XiaohongshuPublisher()
+        self.generator = ContentGenerator(config_path)
+        self.publisher = XiaohongshuPublisher(config_path)
 
-        # 发布时间配置
-        self.post_times = self.config['content_strategy']['post_times']
-        self.auto_publish = self.config['publish']['auto_publish']
+        # 任务调度器（线程数和状态文件在启动时确定）
+        scheduler_config = self.scheduler_config
+        self.jobs = JobScheduler(
+            workers=scheduler_config.get('workers', 4),
+            state_path=scheduler_config.get('state_path', 'logs/scheduler_state.json')
+        )
+        self._scheduled = False
+        # 每个账号一个发布任务：任务名 -> 发布时间
+        self._publish_jobs = {}
+        self._queue = None
+        self._workers = None
+        self._engagement_collector = None
+        self._started = False
 
-    def job_generate_and_publish(self):
-        """生成并发布内容的任务"""
+    @property
+    def config(self):
+        return self.settings.config
+
+    @property
+    def post_times(self):
+        """发布时间配置"""
+        return self.config['content_strategy']['post_times']
+
+    @property
+    def account_post_times(self):
+        """各账号的发布时间：{账号名: [HH:MM, ...]}"""
+        return {
+            account['name']: post_times_for(self.config, account)
+            for account in account_configs(self.config)
+        }
+
+    @property
+    def auto_publish(self):
+        return self.config['publish']['auto_publish']
+
+    @property
+    def scheduler_config(self):
+        return self.config.get('scheduler', {})
+
+    @property
+    def pipeline_config(self):
+        """预生成流水线配置"""
+        return self.config.get('pipeline', {})
+
+    @property
+    def pipeline_enabled(self):
+        return self.pipeline_config.get('enabled', False)
+
+    @property
+    def queue_config(self):
+        """持久化任务队列配置"""
+        return self.config.get('queue', {})
+
+    @property
+    def queue_enabled(self):
+        return self.queue_config.get('enabled', False)
+
+    @property
+    def queue(self):
+        """持久化任务队列（首次使用时创建）"""
+        if self._queue is None:
+            self._queue = JobQueue(self.queue_config.get('db_path', 'logs/queue.db'))
+        return self._queue
+
+    @property
+    def workers(self):
+        """
+        在本进程中执行队列任务的执行者（只执行 queue.local_stages 中的阶段，其余阶段由 worker.py 执行；
+        线程数和租约时长在创建时确定）
+        """
+        if self._workers is None:
+            handlers = PipelineStages(self.generator, self.publisher).handlers(
+                self.queue_config.get('local_stages', list(STAGES))
+            )
+            generate = handlers.get('generate')
+
+            def generate_and_refill(job):
+                # 取用预生成内容后立即补充缓冲区
+                try:
+                    return generate(job)
+                finally:
+                    if self.pipeline_enabled and self.jobs.is_running:
+                        self.jobs.trigger("pregenerate")
+
+            if generate is not None:
+                handlers['generate'] = generate_and_refill
+            self._workers = QueueWorker(
+                self.queue,
+                handlers,
+                concurrency=self.queue_config.get('concurrency'),
+                lease_seconds=self.queue_config.get('lease_seconds', 120),
+                retry_delay=self.queue_config.get('retry_delay_seconds', 60)
+            )
+        return self._workers
+
+    def take_ready_draft(self):
+        """从预生成缓冲区取出最早的一篇内容"""
+        # 自动发布时直接进入发布流程，否则交给人工审核
+        new_status = "publishing" if self.auto_publish else "generated"
+        return self.generator.store.claim_oldest("ready", new_status)
+
+    def job_pregenerate(self):
+        """预生成任务：把缓冲区补满（每个账号 lookahead 篇）校验通过、可直接发布的内容"""
+        lookahead = self.pipeline_config.get('lookahead', 3) * len(account_configs(self.config))
+        ready = self.generator.store.count(status="ready")
+        missing = lookahead - ready
+
+        if missing <= 0:
+            return
+
+        print(f"\n🔄 预生成 {missing} 篇内容（缓冲区 {ready}/{lookahead}）")
+        results = self.generator.generate_batch(
+            missing,
+            concurrency=self.pipeline_config.get('concurrency', 2)
+        )
+
+        ready_contents = []
+        for item in results:
+            if item['status'] != 'success':
+                continue
+            content = item['content']
+            try:
+                self.publisher.validate_content(content, strict=True)
+            except ValueError as e:
+                print(f"   ✗ 未通过校验，丢弃: {content['title']}（{str(e)}）")
+                continue
+            self.generator.save_content(content, status="ready")
+            ready_contents.append(content)
+
+        # 提前渲染图片，发布时直接命中缓存；渲染失败（如找不到中文字体）不影响已生成的内容，发布时会再次渲染
+        if ready_contents and self.publisher.image_method == 'render':
+            try:
+                self.publisher.renderer.render_batch(ready_contents)
+            except Exception as e:
+                print(f"⚠️  预渲染图片失败: {str(e)}")
+
+    def job_generate_and_publish(self, account=None):
+        """
+        发布任务：优先使用预生成的内容，缓冲区为空时现场生成
+
+        自动发布时内容加入账号（未指定时为排队最少的账号）的发布队列，由该账号的发布线程
+        按频率限制发布，任务本身不等待发布完成；返回发布结果的 Future，未发布时返回None
+        """
         print("\n" + "="*60)
-        print(f"⏰ 定时任务触发: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"⏰ 定时任务触发: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+              + (f"（账号: {account}）" if account else ""))
         print("="*60)
 
+        future = None
         try:
-            # 生成内容
-            content = self.generator.generate_content()
+            content = None
+            if self.pipeline_enabled:
+                content = self.take_ready_draft()
+                if content:
+                    print(f"📦 使用预生成的内容: #{content['id']} {content['title']}")
+                else:
+                    print("⚠️  预生成缓冲区为空，现场生成")
 
-            if content:
-                # 保存内容
-                filepath = self.generator.save_content(content)
+            if content is None:
+                # 生成内容
+                content = self.generator.generate_content()
+
+                if content:
+                    # 保存内容
+                    self.generator.save_content(content)
 
+            if content:
                 if self.auto_publish:
-                    # 自动发布
-                    print("\n🚀 开始自动发布...")
-                    result = self.publisher.publish(content)
-
-                    if result['status'] == 'success':
-                        print("✅ 自动发布成功！")
-                    else:
-                        print(f"⚠️  发布状态: {result['status']}")
+                    # 自动发布：加入账号的发布队列
+                    name, future = self.publisher.enqueue(content, account)
+                    print(f"\n🚀 已加入账号 {name} 的发布队列")
+                    future.add_done_callback(partial(self._report_publish, name))
                 else:
                     # 仅保存草稿
                     print("\n💾 内容已生成并保存为草稿")
@@ -58,45 +209,340 @@ class ContentScheduler:
         except Exception as e:
             print(f"❌ 任务执行失败: {str(e)}")
 
+        finally:
+            # 发布后立即补充缓冲区
+            if self.pipeline_enabled and self.jobs.is_running:
+                self.jobs.trigger("pregenerate")
+
+        return future
+
+    def job_publish_slot(self, account, run_at):
+        """账号的定时发布：启用任务队列时添加生成任务（同一发布时间只添加一次），否则直接生成并发布"""
+        if not self.queue_enabled:
+            self.job_generate_and_publish(account)
+            return
+
+        key = generate_key(account, run_at)
+        existing = self.queue.get_by_key(key)
+        if existing is not None:
+            # 重启后补跑已经加入过队列的发布时间
+            print(f"\nℹ️  账号 {account} {run_at:%Y-%m-%d %H:%M} 的发布已在任务队列中（#{existing['id']}，{existing['status']}）")
+            return existing['id']
+
+        job_id = self.queue.enqueue(
+            "generate",
+            {"account": account, "publish": self.auto_publish},
+            key,
+            max_attempts=self.queue_config.get('max_attempts', 3)
+        )
+        print(f"\n📥 账号 {account} {run_at:%Y-%m-%d %H:%M} 的发布已加入任务队列（#{job_id}）")
+        return job_id
+
+    def run_once(self, account=None):
+        """立即执行一次完整的生成和发布，等待结束（测试用）"""
+        if not self.queue_enabled:
+            future = self.job_generate_and_publish(account)
+            if future is not None:
+                # 等待账号的发布线程完成
+                future.result()
+            return
+
+        account = account or account_configs(self.config)[0]['name']
+        now = datetime.now()
+        job_id = self.queue.enqueue(
+            "generate",
+            {"account": account, "publish": self.auto_publish},
+            f"generate:{account}:test-{now:%Y%m%dT%H%M%S%f}",
+            max_attempts=self.queue_config.get('max_attempts', 3)
+        )
+        print(f"📥 已加入任务队列（#{job_id}）")
+        # 后台执行者未运行时在当前线程执行本进程负责的阶段，其余阶段等待 worker.py 完成
+        while not self.queue.descendants_done(job_id):
+            if self.workers.is_running or self.workers.drain() == 0:
+                time.sleep(1)
+
+    @staticmethod
+    def _report_publish(account, future):
+        """发布线程完成一篇内容后输出结果"""
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"❌ 账号 {account} 发布失败: {str(e)}")
+            return
+        if result['status'] == 'success':
+            print(f"✅ 账号 {account} 自动发布成功！")
+        else:
+            print(f"⚠️  账号 {account} 发布状态: {result['status']}")
+
     def setup_schedule(self):
-        """设置定时任务"""
+        """设置定时任务（重复调用时不会重复添加）"""
+        if self._scheduled:
+            return
+        self._scheduled = True
+
         print("\n⏱️  设置定时任务...")
+        self._sync_publish_jobs()
+        for account, post_times in self.account_post_times.items():
+            print(f"   ✓ 账号 {account}: 每天 {', '.join(post_times)} 自动生成内容")
+
+        if self._add_pipeline_job():
+            print(f"   ✓ 每 {self.pipeline_config.get('refill_interval_minutes', 30)} 分钟补充预生成缓冲区"
+                  f"（每个账号保持 {self.pipeline_config.get('lookahead', 3)} 篇）")
 
-        for post_time in self.post_times:
-            schedule.every().day.at(post_time).do(self.job_generate_and_publish)
-            print(f"   ✓ 每天 {post_time} 自动生成内容")
+        if self._add_report_job():
+            monitoring = self.config['monitoring']
+            print(f"   ✓ 每 {monitoring.get('report_interval', 7)} 天 {monitoring.get('report_time', '09:00')} "
+                  f"生成一次API用量报告")
+
+        if self._add_engagement_job():
+            print(f"   ✓ 每天 {', '.join(self.engagement_times)} 采集笔记互动数据")
 
         print(f"\n📋 任务配置:")
-        print(f"   • 发布频率: 每天 {len(self.post_times)} 次")
-        print(f"   • 发布时间: {', '.join(self.post_times)}")
+        print(f"   • 账号数量: {len(self._publish_jobs)}")
+        print(f"   • 发布频率: 每天共 {sum(len(times) for times in self._publish_jobs.values())} 次")
         print(f"   • 自动发布: {'开启' if self.auto_publish else '关闭（仅生成草稿）'}")
+        print(f"   • 错过时间: {self.scheduler_config.get('misfire', 'run_once')}")
 
-    def run(self):
-        """运行调度器"""
+    def _publish_job_options(self):
+        return {
+            "max_concurrency": self.scheduler_config.get('max_concurrency', 1),
+            "misfire": self.scheduler_config.get('misfire', 'run_once'),
+            "grace_seconds": self.scheduler_config.get('misfire_grace_seconds', 600)
+        }
+
+    def _sync_publish_jobs(self, force=False):
+        """
+        按账号配置增删和更新每个账号的发布任务（任务名为 publish:<账号名>），返回是否有变化
+
+        force 为 True 时即使发布时间未变也重新应用 scheduler 中的选项
+        """
+        wanted = {f"publish:{name}": (name, times) for name, times in self.account_post_times.items()}
+        options = self._publish_job_options()
+        changed = False
+
+        for job_name in [job_name for job_name in self._publish_jobs if job_name not in wanted]:
+            # 正在执行和排队的发布任务不受影响
+            self.jobs.remove(job_name)
+            del self._publish_jobs[job_name]
+            changed = True
+
+        for job_name, (account, post_times) in wanted.items():
+            if job_name not in self._publish_jobs:
+                self.jobs.add_daily(job_name, post_times, partial(self.job_publish_slot, account),
+                                    with_run_at=True, **options)
+            elif force or self._publish_jobs[job_name] != post_times:
+                self.jobs.reschedule(job_name, at_times=post_times, **options)
+            else:
+                continue
+            self._publish_jobs[job_name] = list(post_times)
+            changed = True
+
+        return changed
+
+    def _add_pipeline_job(self):
+        if not self.pipeline_enabled:
+            return False
+        refill_minutes = self.pipeline_config.get('refill_interval_minutes', 30)
+        self.jobs.add_interval("pregenerate", refill_minutes * 60, self.job_pregenerate)
+        return True
+
+    def _add_report_job(self):
+        monitoring = self.config.get('monitoring', {})
+        if not monitoring.get('track_metrics', False):
+            return False
+        # 与发布任务一样按上次执行时间补跑，重启调度器不会推迟报告
+        self.jobs.add_daily("report", [monitoring.get('report_time', '09:00')], self.job_report,
+                            with_run_at=True, every_days=monitoring.get('report_interval', 7))
+        return True
+
+    def job_report(self, run_at=None):
+        """定期报告：汇总截至 run_at 的最近 monitoring.report_interval 天的API用量和费用，保存到 logs/reports/"""
+        from report import build_report, save_report
+
+        until = run_at or datetime.now()
+        since = until - timedelta(days=self.config.get('monitoring', {}).get('report_interval', 7))
+        text = build_report(self.generator.store, since, until,
+                            pricing=self.config.get('monitoring', {}).get('pricing'))
+        print("\n" + text)
+        print(f"💾 报告已保存: {save_report(text)}")
+
+        if self.engagement_enabled:
+            from engagement import build_report as build_engagement_report
+
+            text = build_engagement_report(self.engagement_collector.engagement, since, until)
+            print("\n" + text)
+            print(f"💾 报告已保存: {save_report(text, prefix='engagement')}")
+
+    @property
+    def engagement_enabled(self):
+        """已开启互动数据采集（需要通过 xiaohongshu-mcp 发布）"""
+        return (self.config.get('engagement', {}).get('enabled', False)
+                and self.config['publish'].get('backend') == 'mcp')
+
+    @property
+    def engagement_collector(self):
+        """互动数据采集器（首次使用时创建）"""
+        if self._engagement_collector is None:
+            from engagement import EngagementCollector
+            self._engagement_collector = EngagementCollector(self.settings.config_path)
+        return self._engagement_collector
+
+    @property
+    def engagement_times(self):
+        return self.config['engagement'].get('collect_times', ["23:00"])
+
+    def _add_engagement_job(self):
+        if not self.engagement_enabled:
+            return False
+        self.jobs.add_daily("engagement", self.engagement_times, self.job_collect_engagement)
+        return True
+
+    def job_collect_engagement(self):
+        """采集已发布笔记的互动数据，追加一次快照"""
+        self.engagement_collector.collect()
+
+    def _on_config_change(self, old, new):
+        """配置重新加载后，账号、发布时间、流水线或报告配置有变化时重新安排对应任务"""
+        if not self._scheduled:
+            return
+
+        def section(snapshot, *keys):
+            value = snapshot.config
+            for key in keys:
+                value = value.get(key, {})
+            return value
+
+        if self._sync_publish_jobs(force=section(old, 'scheduler') != section(new, 'scheduler')):
+            for account, post_times in self.account_post_times.items():
+                print(f"   ✓ 账号 {account} 发布时间: {', '.join(post_times)}")
+
+        if section(old, 'pipeline') != section(new, 'pipeline'):
+            self.jobs.remove("pregenerate")
+            if self._add_pipeline_job() and self.jobs.is_running:
+                self.jobs.trigger("pregenerate")
+            print(f"   ✓ 预生成流水线已更新（{'开启' if self.pipeline_enabled else '关闭'}）")
+        elif old.config.get('accounts') != new.config.get('accounts') and self.pipeline_enabled and self.jobs.is_running:
+            # 缓冲区大小随账号数变化
+            self.jobs.trigger("pregenerate")
+
+        if section(old, 'engagement') != section(new, 'engagement') or section(old, 'publish') != section(new, 'publish'):
+            self.jobs.remove("engagement")
+            if self._engagement_collector is not None:
+                # 存储目录可能已修改
+                self._engagement_collector.close()
+                self._engagement_collector = None
+            if self._add_engagement_job():
+                print(f"   ✓ 互动数据采集时间: {', '.join(self.engagement_times)}")
+
+        if section(old, 'monitoring') != section(new, 'monitoring'):
+            # 上次执行时间保存在状态文件中，重新添加后仍从上次报告开始计算
+            self.jobs.remove("report")
+            if self._add_report_job():
+                monitoring = self.config['monitoring']
+                print(f"   ✓ 用量报告: 每 {monitoring.get('report_interval', 7)} 天 "
+                      f"{monitoring.get('report_time', '09:00')}")
+
+    def show_status(self):
+        """显示各任务的下次执行时间和排队情况"""
+        for job in self.jobs.status():
+            next_run = job['next_run'].strftime('%Y-%m-%d %H:%M:%S') if job['next_run'] else '-'
+            last_run = job['last_run'].strftime('%Y-%m-%d %H:%M:%S') if job['last_run'] else '-'
+            print(f"   • {job['name']}: 下次 {next_run}，上次 {last_run}，"
+                  f"执行中 {job['running']}，排队 {job['pending']}")
+        if self.queue_enabled:
+            for stage, counts in self.queue.counts().items():
+                print(f"   • 队列 {stage}: " + "，".join(f"{status} {n}" for status, n in counts.items()))
+        for account in self.publisher.accounts.status():
+            print(f"   • 账号 {account['name']}: 发布队列 {account['queued']}，发布中 {account['in_flight']}，"
+                  f"已处理 {account['published']}（失败 {account['errors']}）")
+
+    @property
+    def is_running(self):
+        return self.jobs.is_running
+
+    def start(self):
+        """在后台线程启动调度器（不阻塞，可以和交互菜单在同一进程中运行）"""
+        if self.jobs.is_running:
+            return
+
+        self._started = True
         self.setup_schedule()
+        self.publisher.accounts.start()
+        if self.queue_enabled:
+            # 上次退出时未完成的任务（租约过期后）会被重新领取
+            unfinished = sum(
+                counts.get('pending', 0) + counts.get('leased', 0) for counts in self.queue.counts().values()
+            )
+            if unfinished:
+                print(f"⏯️  任务队列中有 {unfinished} 个未完成的任务，将从中断处继续")
+            self.workers.start()
+        self.jobs.start()
+
+        # 定期检查配置文件，修改后无需重启
+        reload_seconds = self.scheduler_config.get('config_reload_seconds', 5)
+        if reload_seconds:
+            self.settings.watch(reload_seconds)
+
+        # 启动时先填满预生成缓冲区
+        if self.pipeline_enabled:
+            self.jobs.trigger("pregenerate")
+
+        # 显示下次执行时间
+        next_run = self.jobs.next_run()
+        if next_run:
+            print(f"⏰ 下次执行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+            print()
+
+    def stop(self):
+        """
+        停止调度器（等待执行中的任务结束）
 
+        调度线程可能已经自行退出（run_forever 收到 Ctrl+C），所以不看 jobs.is_running，
+        只要启动过就关闭配置监听、队列worker、账号发布线程和互动数据采集
+        """
+        if not self._started:
+            return
+        self._started = False
+
+        self.settings.stop_watching()
+        self.jobs.stop()
+        if self._workers is not None:
+            self._workers.stop()
+        if self._engagement_collector is not None:
+            self._engagement_collector.close()
+            self._engagement_collector = None
+        self.publisher.accounts.stop()
+        print("👋 调度器已停止")
+
+    def close(self):
+        """停止调度器，取消配置订阅并释放生成器和发布器（之后不能再启动）"""
+        self.stop()
+        self.settings.unsubscribe(self._on_config_change)
+        self.generator.close()
+        self.publisher.close()
+
+    def run(self):
+        """在当前线程运行调度器，直到 Ctrl+C"""
         print("\n" + "="*60)
         print("🎯 调度器已启动，等待任务执行...")
         print("="*60)
         print("\n💡 提示:")
         print("   • 按 Ctrl+C 停止调度器")
-        print("   • 查看 logs/ 目录获取生成的内容")
-        print("   • 查看 logs/publish_log.json 获取发布记录")
+        print("   • 查看 logs/content.db 获取生成的内容")
+        print("   • 查看 logs/publish_log.jsonl 获取发布记录")
         print("\n")
 
-        # 显示下次执行时间
-        next_run = schedule.next_run()
-        if next_run:
-            print(f"⏰ 下次执行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
-            print()
+        self.start()
 
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # 每分钟检查一次
+            # 调度线程按最近的截止时间休眠，任务在线程池中执行
+            self.jobs.run_forever()
 
         except KeyboardInterrupt:
-            print("\n\n👋 调度器已停止")
+            print()
+
+        finally:
+            self.close()
 
 
 def main():
@@ -112,7 +558,8 @@ def main():
 
     if args.test:
         print("🧪 测试模式: 立即执行一次任务\n")
-        scheduler.job_generate_and_publish()
+        scheduler.run_once()
+        scheduler.close()
 
     elif args.start:
         scheduler.run()
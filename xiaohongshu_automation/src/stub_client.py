@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+本地模拟Claude客户端
+接口与 anthropic.Anthropic 的 messages / messages.batches 一致，不访问网络，用于测试；
+可以模拟响应延迟、抖动和失败（用于性能测试）
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+from types import SimpleNamespace
+
+
+STUB_BODY = """之前每天光是上架产品就要花3个小时😭
+手动复制粘贴、一个个核对价格，还总出错
+
+后来用上了批量工具⚡️
+✅ 批量采集上架
+✅ 自动同步库存
+✅ 智能核价
+
+现在每天多出2小时做选品💪"""
+
+
+def _stub_text(params):
+    """根据请求中的标题参考生成一段固定格式的回复"""
+    prompt = next(message['content'] for message in reversed(params['messages']) if message['role'] == "user")
+    title = "Temu卖家效率提升小技巧"
+    for line in prompt.splitlines():
+        if line.startswith("标题参考："):
+            title = line[len("标题参考："):].strip()
+            break
+    return f"{title}\n\n{STUB_BODY}"
+
+
+def _stub_message(params):
+    """构造与真实响应结构一致的消息对象"""
+    text = _stub_text(params)
+    # 最后一条为助手消息时（续写），与真实接口一样只返回后续部分
+    last = params['messages'][-1]
+    if last['role'] == "assistant" and text.startswith(last['content']):
+        text = text[len(last['content']):]
+    return SimpleNamespace(
+        id=f"msg_stub_{uuid.uuid4().hex[:12]}",
+        content=[SimpleNamespace(type="text", text=text)],
+        stop_reason="end_turn",
+        model=params.get('model'),
+        usage=SimpleNamespace(
+            input_tokens=sum(len(message['content']) for message in params['messages']),
+            output_tokens=len(text),
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=0
+        )
+    )
+
+
+class StubBatches:
+    """模拟 messages.batches，批任务保存在本地目录，可跨进程提交和收取"""
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+
+    def _path(self, batch_id):
+        return os.path.join(self.state_dir, f"{batch_id}.json")
+
+    def create(self, requests):
+        os.makedirs(self.state_dir, exist_ok=True)
+        batch_id = f"msgbatch_stub_{uuid.uuid4().hex[:12]}"
+        with open(self._path(batch_id), 'w', encoding='utf-8') as f:
+            json.dump(list(requests), f, ensure_ascii=False)
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id):
+        if not os.path.exists(self._path(batch_id)):
+            raise ValueError(f"批任务不存在: {batch_id}")
+        # 模拟客户端中批任务在下一次查询时即完成
+        return SimpleNamespace(id=batch_id, processing_status="ended")
+
+    def results(self, batch_id):
+        with open(self._path(batch_id), 'r', encoding='utf-8') as f:
+            requests = json.load(f)
+        for request in requests:
+            yield SimpleNamespace(
+                custom_id=request['custom_id'],
+                result=SimpleNamespace(type="succeeded", message=_stub_message(request['params']))
+            )
+
+
+class StubStream:
+    """模拟 messages.stream 返回的流，按小块逐段返回文本"""
+
+    def __init__(self, params, chunk_size=8):
+        self.message = _stub_message(params)
+        self.chunk_size = chunk_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    @property
+    def text_stream(self):
+        text = self.message.content[0].text
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+    def get_final_message(self):
+        return self.message
+
+
+class StubAPIError(RuntimeError):
+    """模拟的服务端错误（529 过载，可重试）"""
+    status_code = 529
+
+    def __init__(self, message="模拟服务过载"):
+        super().__init__(message)
+        self.response = None
+
+
+class StubMessages:
+    def __init__(self, state_dir, latency=0.0, jitter=0.2, error_rate=0.0):
+        self.batches = StubBatches(state_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def _simulate(self):
+        """按设置等待并按概率失败"""
+        if self.latency:
+            time.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            raise StubAPIError()
+
+    def create(self, **params):
+        self._simulate()
+        return _stub_message(params)
+
+    def stream(self, **params):
+        # 延迟计入首个token之前
+        self._simulate()
+        return StubStream(params)
+
+
+class StubAnthropic:
+    def __init__(self, state_dir="logs/stub_batches", latency=0.0, jitter=0.2, error_rate=0.0):
+        """初始化模拟客户端（latency 为平均响应时间（秒），jitter 为相对标准差，error_rate 为失败概率）"""
+        self.messages = StubMessages(state_dir, latency, jitter, error_rate)
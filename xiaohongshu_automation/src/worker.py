@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+任务队列执行者
+从共享的任务队列（queue.db_path）领取并执行生成、渲染、发布任务，可以在多个进程或主机上同时运行，
+按角色只执行部分阶段，让耗时的阶段单独扩容；调度器只负责按发布时间添加任务
+"""
+
+import signal
+import threading
+import uuid
+from config_loader import get_service
+from job_queue import JobQueue, QueueWorker, default_owner
+from pipeline_stages import STAGES, PipelineStages
+
+
+# 阶段的上游阶段：等待上游任务全部结束后，--drain 才会退出
+UPSTREAM = {stage: STAGES[:i] for i, stage in enumerate(STAGES)}
+
+
+class Worker:
+    def __init__(self, config_path="config/config.yaml", roles=STAGES, concurrency=None,
+                 accounts=None, owner=None, client=None):
+        """
+        初始化执行者
+
+        roles 为要执行的阶段；concurrency 为每个阶段的线程数（默认使用 queue.concurrency）；
+        accounts 不为空时只发布这些账号的任务（多个发布执行者按账号分工，频率限制不会被分散）
+        """
+        from content_generator import ContentGenerator
+        from xhs_publisher import XiaohongshuPublisher
+
+        self.settings = get_service(config_path)
+        queue_config = self.config.get('queue', {})
+
+        self.roles = list(roles)
+        self.generator = ContentGenerator(config_path, client=client)
+        self.publisher = XiaohongshuPublisher(config_path)
+        self.queue = JobQueue(queue_config.get('db_path', 'logs/queue.db'))
+
+        if concurrency is None:
+            per_stage = queue_config.get('concurrency', {})
+        else:
+            per_stage = {stage: concurrency for stage in self.roles}
+
+        # 同一进程多次启动时用随机后缀区分
+        self.worker = QueueWorker(
+            self.queue,
+            PipelineStages(self.generator, self.publisher).handlers(self.roles),
+            owner=owner or f"{default_owner()}:{uuid.uuid4().hex[:6]}",
+            concurrency=per_stage,
+            lease_seconds=queue_config.get('lease_seconds', 120),
+            retry_delay=queue_config.get('retry_delay_seconds', 60),
+            accounts=accounts
+        )
+
+    @property
+    def config(self):
+        return self.settings.config
+
+    def _idle(self):
+        """本执行者的阶段及其上游阶段都没有待执行或执行中的任务（指定了账号时只看这些账号的发布任务）"""
+        stages = set(self.roles)
+        for role in self.roles:
+            stages.update(UPSTREAM[role])
+        return self.queue.outstanding(sorted(stages), self.worker.accounts) == 0
+
+    def run(self, drain=False, poll_seconds=1.0):
+        """
+        运行直到 Ctrl+C / SIGTERM；drain 为 True 时队列中没有本执行者的任务后退出
+        """
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+
+        print(f"🛠️  执行者 {self.worker.owner} 已启动（角色: {', '.join(self.roles)}"
+              + (f"，账号: {', '.join(self.worker.accounts)}" if self.worker.accounts else "") + "）")
+        self.worker.start()
+
+        reload_seconds = self.config.get('scheduler', {}).get('config_reload_seconds', 5)
+        if reload_seconds:
+            self.settings.watch(reload_seconds)
+
+        try:
+            while not stop.wait(poll_seconds):
+                if drain and self._idle():
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.settings.stop_watching()
+            # 执行中的任务完成后再退出；来不及完成的任务在租约过期后由其他执行者接手
+            self.worker.stop()
+            self.generator.close()
+            self.publisher.close()
+
+        print(f"👋 执行者 {self.worker.owner} 已停止（完成 {self.worker.completed}，失败 {self.worker.failed}）")
+
+
+def enqueue_test_jobs(config_path, count, account=None):
+    """添加 count 个立即执行的生成任务（测试多个执行者用），返回任务ID"""
+    from account_pool import account_configs
+
+    settings = get_service(config_path)
+    config = settings.config
+    queue_config = config.get('queue', {})
+    queue = JobQueue(queue_config.get('db_path', 'logs/queue.db'))
+
+    names = [account] if account else [item['name'] for item in account_configs(config)]
+    job_ids = []
+    for i in range(count):
+        name = names[i % len(names)]
+        job_ids.append(queue.enqueue(
+            "generate",
+            {"account": name, "publish": config['publish']['auto_publish']},
+            f"generate:{name}:manual-{uuid.uuid4().hex}",
+            max_attempts=queue_config.get('max_attempts', 3)
+        ))
+    return job_ids
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='任务队列执行者')
+    parser.add_argument('--roles', nargs='+', choices=STAGES, default=list(STAGES), help='执行的阶段（默认全部）')
+    parser.add_argument('--concurrency', type=int, help='每个阶段的线程数（默认使用 queue.concurrency）')
+    parser.add_argument('--accounts', nargs='+', help='只发布这些账号的任务')
+    parser.add_argument('--owner', type=str, help='执行者名称（默认为 主机名:进程号:随机后缀）')
+    parser.add_argument('--drain', action='store_true', help='队列中没有本执行者的任务后退出')
+    parser.add_argument('--enqueue', type=int, metavar='N', help='添加N个立即执行的生成任务后退出（测试用）')
+    parser.add_argument('--account', type=str, help='与 --enqueue 一起使用：任务的发布账号（默认轮流分配）')
+    parser.add_argument('--stub', action='store_true', help='使用本地模拟客户端，不调用API（测试用）')
+    args = parser.parse_args()
+
+    if args.enqueue:
+        job_ids = enqueue_test_jobs("config/config.yaml", args.enqueue, args.account)
+        print(f"📥 已添加 {len(job_ids)} 个生成任务: #{job_ids[0]} - #{job_ids[-1]}")
+        return
+
+    client = None
+    if args.stub:
+        from stub_client import StubAnthropic
+        client = StubAnthropic()
+
+    worker = Worker(roles=args.roles, concurrency=args.concurrency, accounts=args.accounts,
+                    owner=args.owner, client=client)
+    worker.run(drain=args.drain)
+
+
+if __name__ == "__main__":
+    main()
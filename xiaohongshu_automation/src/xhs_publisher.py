@@ -6,18 +6,62 @@
 
 import os
 import json
-import yaml
 from datetime import datetime
 from pathlib import Path
+from publish_log import PublishLog
+from content_store import ContentStore, content_hash
+from config_loader import get_service
+from account_pool import AccountPool, DEFAULT_ACCOUNT
 
 
 class XiaohongshuPublisher:
     def __init__(self, config_path="config/config.yaml"):
         """初始化发布器"""
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.config = yaml.safe_load(f)
+        # 共享的配置服务（配置文件修改后自动使用新配置）
+        self.settings = get_service(config_path)
+        self.settings.subscribe(self._on_config_change)
 
         self.log_path = self.config['publish']['log_path']
+        self.publish_log = PublishLog(self.log_path)
+        self.store = ContentStore(self.config['storage']['content_db'])
+        self._mcp = None
+        self._renderer = None
+        self._render_unavailable = False
+        self._encoder = None
+        self._accounts = None
+
+    @property
+    def config(self):
+        return self.settings.config
+
+    def _on_config_change(self, old, new):
+        """
+        图片配置变化时，下次使用时按新配置重新创建渲染器和编码器；账号配置变化时更新账号池；
+        mcp 配置变化时关闭原有连接（等待进行中的发布完成），下次发布按新配置连接
+        """
+        if old.config.get('image') != new.config.get('image'):
+            self._renderer = None
+            self._render_unavailable = False
+            self._encoder = None
+        if old.config.get('mcp') != new.config.get('mcp') and self._mcp is not None:
+            mcp, self._mcp = self._mcp, None
+            mcp.close()
+        if self._accounts is not None:
+            self._accounts.update(new.config)
+
+    @property
+    def accounts(self):
+        """账号池：每个账号独立的发布队列、频率限制和发布线程（首次使用时创建）"""
+        if self._accounts is None:
+            self._accounts = AccountPool(self._publish_content, self.config)
+        return self._accounts
+
+    def _account(self, name=None):
+        """按名称查找账号，未指定时使用第一个账号"""
+        account = self.accounts.get(name or self.accounts.names[0])
+        if account is None:
+            raise ValueError(f"账号不存在: {name}")
+        return account
 
     def create_placeholder_images(self, count=3):
         """创建占位图片（实际使用时需要替换为真实图片）"""
@@ -38,8 +82,58 @@ class XiaohongshuPublisher:
 
         return images
 
-    def validate_content(self, content):
-        """验证内容格式"""
+    @property
+    def renderer(self):
+        """图片渲染器（首次使用时创建）；找不到中文字体时为None"""
+        if self._renderer is None and not self._render_unavailable:
+            from image_renderer import FontNotFoundError, ImageRenderer
+            try:
+                self._renderer = ImageRenderer(self.config['image'])
+            except FontNotFoundError as e:
+                # 只提示一次，修改图片配置（如设置 image.font_path）后重新查找
+                self._render_unavailable = True
+                print(f"⚠️  {str(e)}，改用占位图片")
+        return self._renderer
+
+    @property
+    def image_method(self):
+        """实际使用的图片生成方式：image.method 为 render 但找不到中文字体时为 placeholder"""
+        method = self.config['image'].get('method', 'placeholder')
+        if method == 'render' and self.renderer is None:
+            return 'placeholder'
+        return method
+
+    def create_images(self, content):
+        """生成笔记图片：image.method 为 render 时用Pillow渲染，否则（或找不到中文字体时）使用占位图片"""
+        if self.image_method == 'render':
+            return self.renderer.render_note(content)
+        return self.create_placeholder_images(self.config['image']['count'])
+
+    @property
+    def encoder(self):
+        """图片编码器（首次使用时创建）"""
+        if self._encoder is None:
+            from image_encoder import ImageEncoder
+            self._encoder = ImageEncoder(self.config['image'])
+        return self._encoder
+
+    def encode_images(self, images):
+        """上传前压缩图片（不存在的占位图片保持原样），返回压缩后的路径"""
+        existing = [path for path in images if os.path.exists(path)]
+        if not existing:
+            return images
+
+        results = self.encoder.encode_all(existing)
+        encoded = {r['source']: r['path'] for r in results}
+
+        summary = self.encoder.summarize(results)
+        print(f"🗜️  图片压缩: {len(results)}张 {summary['original_bytes'] / 1024:.0f}KB → "
+              f"{summary['encoded_bytes'] / 1024:.0f}KB，节省 {summary['saved_ratio']:.0%}")
+
+        return [encoded.get(path, path) for path in images]
+
+    def validate_content(self, content, strict=False):
+        """验证内容格式（strict 为True时标题过长、标签过多直接视为不合格）"""
         required_fields = ['title', 'content', 'tags']
 
         for field in required_fields:
@@ -47,12 +141,19 @@ class XiaohongshuPublisher:
                 raise ValueError(f"缺少必需字段: {field}")
 
         # 验证标题长度（小红书限制20个字）
-        if len(content['title']) > 20:
-            print(f"⚠️  警告: 标题过长 ({len(content['title'])}字)，小红书限制为20字")
+        max_title_length = self.config['publish'].get('title_max_length', 20)
+        if len(content['title']) > max_title_length:
+            message = f"标题过长 ({len(content['title'])}字)，小红书限制为{max_title_length}字"
+            if strict:
+                raise ValueError(message)
+            print(f"⚠️  警告: {message}")
 
         # 验证标签数量
         if len(content['tags']) > 10:
-            print(f"⚠️  警告: 标签过多 ({len(content['tags'])}个)，建议6-8个")
+            message = f"标签过多 ({len(content['tags'])}个)，建议6-8个"
+            if strict:
+                raise ValueError(message)
+            print(f"⚠️  警告: {message}")
 
         return True
 
@@ -66,58 +167,103 @@ class XiaohongshuPublisher:
             tags_line = ' '.join([f"#{tag.strip('#')}" for tag in content['tags']])
             full_content = f"{full_content}\n\n{tags_line}"
 
+        images = self.create_images(content)
+        if self.config['image'].get('encode', {}).get('enabled', False):
+            images = self.encode_images(images)
+
         return {
             "title": content['title'],
             "content": full_content,
-            "images": self.create_placeholder_images(self.config['image']['count'])
+            "tags": content['tags'],
+            "images": images
         }
 
-    def publish_to_xiaohongshu(self, content, images):
+    @property
+    def mcp(self):
+        """xiaohongshu-mcp 服务客户端（首次使用时创建，之后复用连接池）"""
+        if self._mcp is None:
+            from mcp_client import McpService
+            self._mcp = McpService(self.config.get('mcp', {}))
+        return self._mcp
+
+    def close(self):
+        """取消订阅配置变化，停止各账号的发布线程并释放MCP连接"""
+        self.settings.unsubscribe(self._on_config_change)
+        if self._accounts is not None:
+            self._accounts.stop()
+        if self._mcp is not None:
+            self._mcp.close()
+            self._mcp = None
+
+    def publish_to_xiaohongshu(self, content, images, account=None):
         """
-        发布到小红书（使用MCP）
+        发布到小红书
 
-        注意：这需要在Claude Code环境中运行，
-        因为需要使用xiaohongshu-mcp工具
+        publish.backend 为 mcp 时通过账号对应的 xiaohongshu-mcp 服务发布，
+        失败或未启用时保存为草稿
         """
         print("\n" + "="*50)
-        print("📤 准备发布到小红书...")
+        print(f"📤 准备发布到小红书{f'（账号: {account.name}）' if account else ''}...")
         print("="*50)
 
         print(f"\n标题: {content['title']}")
         print(f"\n正文:\n{content['content']}")
         print(f"\n图片数量: {len(images)}")
 
-        # 在Claude Code环境中，可以使用MCP工具发布
-        # 示例调用方式（需要在Claude Code中执行）：
-        """
-        from mcp_client import xiaohongshu_mcp
-
-        result = xiaohongshu_mcp.publish_content(
-            title=content['title'],
-            content=content['content'],
-            images=images,
-            tags=content['tags']
-        )
-        """
-
-        # 当前环境：保存为草稿
+        error = None
+        if self.config['publish'].get('backend', 'draft') == 'mcp':
+            try:
+                response = self.mcp.publish(
+                    content['title'],
+                    content['content'],
+                    images,
+                    tags=content.get('tags'),
+                    base_url=account.base_url if account else None
+                )
+                return {
+                    "status": "success",
+                    "message": "已通过 xiaohongshu-mcp 发布到小红书",
+                    "response": response.get('data') if isinstance(response, dict) else response
+                }
+            except Exception as e:
+                from mcp_client import outcome_unknown
+
+                error = str(e) or type(e).__name__
+                if outcome_unknown(e):
+                    # 服务端可能已经发布：不保存草稿，也不允许自动重新发布
+                    print(f"⚠️  MCP发布结果未知: {error}")
+                    return {
+                        "status": "unknown",
+                        "message": f"发布请求已发出但结果未知（{error}），请在小红书确认后使用 --force 重新发布",
+                        "error": error
+                    }
+                print(f"⚠️  MCP发布失败: {error}")
+
+        # 未启用MCP或发布失败：保存为草稿
         if self.config['publish']['save_draft']:
-            self.save_draft(content, images)
+            self.save_draft(content, images, account)
 
-        return {
+        result = {
             "status": "draft_saved" if self.config['publish']['save_draft'] else "pending",
-            "message": "内容已保存为草稿，请使用Claude Code发布到小红书"
+            "message": "内容已保存为草稿，请手动发布到小红书"
         }
+        if error:
+            result['error'] = error
+        return result
 
-    def save_draft(self, content, images):
-        """保存为草稿"""
+    def save_draft(self, content, images, account=None):
+        """保存为草稿（多个账号同时保存时文件名带账号名，避免互相覆盖）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        draft_file = f"logs/draft_{timestamp}.json"
+        if account is not None and account.name != DEFAULT_ACCOUNT:
+            draft_file = f"logs/draft_{timestamp}_{account.name}.json"
+        else:
+            draft_file = f"logs/draft_{timestamp}.json"
 
         draft = {
             "title": content['title'],
             "content": content['content'],
             "images": images,
+            "account": account.name if account else None,
             "saved_at": datetime.now().isoformat(),
             "status": "draft"
         }
@@ -127,35 +273,85 @@ class XiaohongshuPublisher:
 
         print(f"\n💾 草稿已保存: {draft_file}")
 
-    def log_publish(self, content, result):
+    def log_publish(self, content, result, account=None):
         """记录发布日志"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
+            "account": account.name if account else None,
+            "content_id": content.get('id'),
             "title": content['title'],
             "content_type": content.get('content_type', 'unknown'),
+            "template": content.get('template'),
+            "tags": content.get('tags', []),
             "result": result
         }
 
-        # 加载现有日志
-        if os.path.exists(self.log_path):
-            with open(self.log_path, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
+        self.publish_log.append(log_entry)
+
+    def migrate_log(self):
+        """将旧版 JSON 数组格式的发布日志迁移为 JSON Lines"""
+        legacy_path = self.config['publish'].get('legacy_log_path', 'logs/publish_log.json')
+        count = self.publish_log.migrate_from_json_array(legacy_path)
+
+        if count is None:
+            print(f"ℹ️  未找到旧版日志: {legacy_path}")
+        elif count:
+            print(f"✅ 已迁移 {count} 条发布日志到: {self.log_path}")
         else:
-            logs = []
+            print(f"ℹ️  旧版日志为空，已重命名为: {legacy_path}.migrated")
+
+        return count
+
+    def publish(self, content_file_or_dict, account=None, force=False):
+        """
+        发布内容（参数可以是内容ID、内容文件路径或内容字典；account 为账号名，默认为第一个账号）
 
-        # 添加新日志
-        logs.append(log_entry)
+        同一内容已发布过或上次发布中断、结果未知时跳过，force 为 True 时仍然发布
+        """
+        try:
+            target = self._account(account)
+        except Exception as e:
+            print(f"\n❌ 发布失败: {str(e)}")
+            return {"status": "error", "message": str(e)}
+        return self._publish_content(content_file_or_dict, target, force)
 
-        # 保存日志
-        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
-        with open(self.log_path, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
+    def enqueue(self, content, account=None, force=False):
+        """
+        把内容加入账号的发布队列，由该账号的发布线程按频率限制发布
 
-    def publish(self, content_file_or_dict):
-        """发布内容"""
+        account 为空时分配给排队最少的账号；force 与 publish 相同；返回 (账号名, Future)，Future 的结果与 publish 相同
+        """
+        self.accounts.start()
+        return self.accounts.submit(content, account, force)
+
+    def publish_many(self, contents, account=None, force=False):
+        """把多篇内容分配到各账号的队列并行发布，返回与输入顺序一致的 (账号名, 结果) 列表"""
+        queued = [self.enqueue(content, account, force) for content in contents]
+        return [(name, future.result()) for name, future in queued]
+
+    @staticmethod
+    def _skip_published(record):
+        """内容已有发布记录时返回的结果"""
+        if record['status'] == "success":
+            return {
+                "status": "duplicate",
+                "message": f"该内容已于 {record['finished_at']} 通过账号 {record['account']} 发布，跳过"
+            }
+        return {
+            "status": "unknown",
+            "message": f"该内容正在发布、上次发布中断或结果未知（{record['started_at']}，账号 {record['account']}）；"
+                       "请在小红书确认后使用 --force 重新发布"
+        }
+
+    def _publish_content(self, content_file_or_dict, account, force=False):
+        """以指定账号发布一篇内容（直接发布和账号队列共用）"""
         try:
             # 加载内容
-            if isinstance(content_file_or_dict, str):
+            if isinstance(content_file_or_dict, int):
+                content = self.store.get(content_file_or_dict)
+                if content is None:
+                    raise ValueError(f"内容不存在: #{content_file_or_dict}")
+            elif isinstance(content_file_or_dict, str):
                 with open(content_file_or_dict, 'r', encoding='utf-8') as f:
                     content = json.load(f)
             else:
@@ -164,17 +360,35 @@ class XiaohongshuPublisher:
             # 验证内容
             self.validate_content(content)
 
-            # 格式化内容
-            formatted = self.format_content_for_publish(content)
-
-            # 发布（或保存草稿）
-            result = self.publish_to_xiaohongshu(
-                formatted,
-                formatted['images']
-            )
+            # 按内容哈希登记，同一内容不会发布两次
+            key = content_hash(content)
+            record = self.store.begin_publish(key, account.name, content.get('id'), force=force)
+            if record is not None:
+                result = self._skip_published(record)
+                print(f"\n⚠️  {result['message']}")
+                return result
+
+            try:
+                # 格式化内容
+                formatted = self.format_content_for_publish(content)
+
+                # 发布（或保存草稿）
+                result = self.publish_to_xiaohongshu(
+                    formatted,
+                    formatted['images'],
+                    account
+                )
+            except Exception:
+                self.store.finish_publish(key, "error")
+                raise
+            self.store.finish_publish(key, result['status'], result.get('response'))
 
             # 记录日志
-            self.log_publish(content, result)
+            self.log_publish(content, result, account)
+
+            # 更新内容状态
+            if content.get('id') is not None:
+                self.store.update_status(content['id'], result['status'])
 
             print(f"\n✅ 处理完成: {result['message']}")
 
@@ -191,27 +405,42 @@ def main():
 
     parser = argparse.ArgumentParser(description='小红书发布器')
     parser.add_argument('--file', type=str, help='内容文件路径')
+    parser.add_argument('--id', type=int, nargs='+', help='内容ID（内容存储中的编号），多个ID时分配到各账号并行发布')
+    parser.add_argument('--account', type=str, help='发布账号（accounts 中的 name），默认为第一个账号')
     parser.add_argument('--manual', action='store_true', help='手动模式（使用最新生成的内容）')
+    parser.add_argument('--force', action='store_true', help='内容已发布过或上次发布结果未知时仍然发布')
+    parser.add_argument('--migrate-log', action='store_true', help='迁移旧版 JSON 数组发布日志')
     args = parser.parse_args()
 
     publisher = XiaohongshuPublisher()
 
-    if args.file:
-        # 发布指定文件
-        result = publisher.publish(args.file)
-    elif args.manual:
-        # 使用最新生成的内容
-        logs_dir = Path("logs")
-        content_files = sorted(logs_dir.glob("content_*.json"), reverse=True)
-
-        if content_files:
-            latest_file = content_files[0]
-            print(f"📄 使用最新内容: {latest_file}")
-            result = publisher.publish(str(latest_file))
+    try:
+        if args.migrate_log:
+            publisher.migrate_log()
+        elif args.id and len(args.id) > 1:
+            # 多篇内容：未指定账号时分配给排队最少的账号
+            results = publisher.publish_many(args.id, args.account, args.force)
+            for content_id, (account, result) in zip(args.id, results):
+                print(f"   • #{content_id} → {account}: {result['status']}")
+        elif args.id:
+            # 发布指定ID的内容
+            result = publisher.publish(args.id[0], args.account, args.force)
+        elif args.file:
+            # 发布指定文件
+            result = publisher.publish(args.file, args.account, args.force)
+        elif args.manual:
+            # 使用最新生成的内容
+            latest = publisher.store.latest()
+
+            if latest:
+                print(f"📄 使用最新内容: #{latest['id']} {latest['title']}")
+                result = publisher.publish(latest, args.account, args.force)
+            else:
+                print("❌ 未找到生成的内容，请先运行 content_generator.py")
         else:
-            print("❌ 未找到生成的内容文件，请先运行 content_generator.py")
-    else:
-        print("请指定 --file 或 --manual 参数")
+            print("请指定 --id、--file、--manual 或 --migrate-log 参数")
+    finally:
+        publisher.close()
 
 
 if __name__ == "__main__":
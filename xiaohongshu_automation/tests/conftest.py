@@ -0,0 +1,57 @@
+"""
+测试公用的夹具
+各模块按扁平方式导入（与在 src/ 下运行脚本时一致）；每个测试在临时目录中使用一份配置副本，
+日志、数据库等相对路径都写到临时目录
+"""
+
+import sys
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT / "src"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录，config/ 为仓库配置的副本"""
+    shutil.copytree(ROOT / "config", tmp_path / "config")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def configure(workdir):
+    """修改临时目录中的配置：configure(dedup={"enabled": False})，按小节合并"""
+    path = workdir / "config" / "config.yaml"
+
+    def update(**sections):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        for name, values in sections.items():
+            if isinstance(values, dict) and isinstance(config.get(name), dict):
+                config[name].update(values)
+            else:
+                config[name] = values
+        with open(path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config, f, allow_unicode=True)
+        return "config/config.yaml"
+
+    return update
+
+
+@pytest.fixture
+def mcp_stub():
+    """后台运行的模拟 xiaohongshu-mcp 服务"""
+    from mcp_stub_server import StubMcpServer
+
+    server = StubMcpServer()
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
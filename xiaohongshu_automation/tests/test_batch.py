@@ -0,0 +1,82 @@
+"""Message Batches 提交和收取（模拟客户端）"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from stub_client import StubAnthropic
+
+
+@pytest.fixture
+def generator(configure):
+    from content_generator import ContentGenerator
+
+    # 模拟客户端的正文固定，关闭查重以免被判为近似重复
+    config_path = configure(dedup={"enabled": False}, cache={"enabled": False})
+    return ContentGenerator(config_path, client=StubAnthropic())
+
+
+def test_submit_records_batch(generator):
+    batch_id = generator.submit_batch(3)
+
+    batches = generator.store.list_batches(status="submitted")
+    assert [batch['batch_id'] for batch in batches] == [batch_id]
+    assert sorted(batches[0]['requests']) == ["note-0001", "note-0002", "note-0003"]
+    assert generator.store.count() == 0
+
+
+def test_collect_saves_contents(generator):
+    batch_id = generator.submit_batch(3)
+
+    saved = generator.collect_batches()
+
+    assert len(saved) == 3
+    for content_id in saved:
+        content = generator.store.get(content_id)
+        assert content['batch_id'] == batch_id
+        assert content['custom_id'].startswith("note-")
+        assert content['title']
+    calls = generator.store.list_calls()
+    assert len(calls) == 3
+    assert {call['mode'] for call in calls} == {"batch"}
+    assert generator.store.list_batches(status="submitted") == []
+
+
+def test_collect_is_idempotent(generator):
+    generator.submit_batch(2)
+    assert len(generator.collect_batches()) == 2
+
+    assert generator.collect_batches() == []
+    assert generator.store.count() == 2
+
+
+def test_collect_leaves_unfinished_batches(generator, monkeypatch):
+    batch_id = generator.submit_batch(2)
+    batches = generator.client.messages.batches
+    retrieve = batches.retrieve
+    monkeypatch.setattr(batches, "retrieve",
+                        lambda batch_id: SimpleNamespace(id=batch_id, processing_status="in_progress"))
+
+    assert generator.collect_batches() == []
+    assert [batch['batch_id'] for batch in generator.store.list_batches(status="submitted")] == [batch_id]
+
+    monkeypatch.setattr(batches, "retrieve", retrieve)
+    assert len(generator.collect_batches()) == 2
+
+
+def test_collect_counts_failed_requests(generator, monkeypatch):
+    generator.submit_batch(3)
+    batches = generator.client.messages.batches
+    results = batches.results
+
+    def partly_errored(batch_id):
+        for i, entry in enumerate(results(batch_id)):
+            if i == 1:
+                entry = SimpleNamespace(custom_id=entry.custom_id, result=SimpleNamespace(type="errored"))
+            yield entry
+
+    monkeypatch.setattr(batches, "results", partly_errored)
+
+    assert len(generator.collect_batches()) == 2
+    statuses = sorted(call['status'] for call in generator.store.list_calls())
+    assert statuses.count("errored") == 1
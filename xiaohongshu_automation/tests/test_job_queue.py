@@ -0,0 +1,236 @@
+"""多个 QueueWorker 共用一个 JobQueue：租约过期重新领取、按账号分工、--drain"""
+
+import multiprocessing
+import signal
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, LeaseLost, QueueWorker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "queue.db"))
+
+
+def recording_handler(handled, delay=0.0):
+    """记录由哪个执行者处理了哪个任务的处理函数"""
+    lock = threading.Lock()
+
+    def handler(job):
+        time.sleep(delay)
+        with lock:
+            handled.append((job['lease_owner'], job['id']))
+        return {"ok": True}, []
+
+    return handler
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_two_workers_share_queue_without_duplicates(queue):
+    job_ids = [queue.enqueue("generate", {"n": i}, f"generate:{i}") for i in range(20)]
+    handled = []
+    workers = [QueueWorker(queue, {"generate": recording_handler(handled, 0.005)}, owner=owner)
+               for owner in ("a", "b")]
+
+    threads = [threading.Thread(target=worker.drain) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(job_id for _, job_id in handled) == job_ids
+    assert sum(worker.completed for worker in workers) == 20
+    assert queue.counts() == {"generate": {"done": 20}}
+
+
+def drain_in_process(path, owner, barrier):
+    """在子进程中打开同一个队列文件并执行到没有任务"""
+    def handler(job):
+        time.sleep(0.01)
+        return {"owner": owner}, []
+
+    barrier.wait()
+    QueueWorker(JobQueue(path), {"generate": handler}, owner=owner).drain()
+
+
+def test_two_processes_share_queue_file(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = JobQueue(path)
+    job_ids = [queue.enqueue("generate", {"n": i}, f"generate:{i}") for i in range(40)]
+
+    context = multiprocessing.get_context("spawn")
+    # 两个进程都启动后再开始领取
+    barrier = context.Barrier(2)
+    processes = [context.Process(target=drain_in_process, args=(path, owner, barrier)) for owner in ("p1", "p2")]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0, 0]
+    jobs = [queue.get(job_id) for job_id in job_ids]
+    assert all(job['status'] == "done" and job['attempts'] == 1 for job in jobs)
+    assert {job['result']['owner'] for job in jobs} == {"p1", "p2"}
+
+
+def test_expired_lease_is_taken_over(queue):
+    job_id = queue.enqueue("generate", {}, "generate:1")
+    # 执行者 a 领取后失联（不续约也不完成）
+    assert queue.claim(["generate"], "a", lease_seconds=0.2)['id'] == job_id
+
+    handled = []
+    b = QueueWorker(queue, {"generate": recording_handler(handled)}, owner="b", lease_seconds=5)
+    assert b.run_one() is None
+
+    time.sleep(0.3)
+    job = b.run_one()
+    assert job['id'] == job_id and job['status'] == "done"
+    assert handled == [("b", job_id)]
+    assert queue.get(job_id)['attempts'] == 2
+
+    # a 恢复后提交的结果被丢弃
+    with pytest.raises(LeaseLost):
+        queue.complete(job_id, "a", {"stale": True})
+    assert queue.get(job_id)['result'] == {"ok": True}
+
+
+def test_requeue_expired(queue):
+    retried = queue.enqueue("generate", {}, "generate:1", max_attempts=3)
+    exhausted = queue.enqueue("generate", {}, "generate:2", max_attempts=1)
+    queue.claim(["generate"], "a", lease_seconds=0.1)
+    queue.claim(["generate"], "a", lease_seconds=0.1)
+
+    assert queue.requeue_expired() == (0, 0)
+    time.sleep(0.2)
+    assert queue.requeue_expired() == (1, 1)
+
+    job = queue.get(retried)
+    assert job['status'] == "pending" and job['lease_owner'] is None
+    assert queue.get(exhausted)['status'] == "failed"
+
+
+def test_running_worker_requeues_jobs_of_dead_worker(queue):
+    job_id = queue.enqueue("generate", {}, "generate:1")
+    queue.claim(["generate"], "dead", lease_seconds=0.2)
+
+    handled = []
+    worker = QueueWorker(queue, {"generate": recording_handler(handled)}, owner="b",
+                         lease_seconds=0.3, poll_seconds=0.05)
+    worker.start()
+    try:
+        assert wait_for(lambda: queue.get(job_id)['status'] == "done")
+    finally:
+        worker.stop()
+
+    assert handled == [("b", job_id)]
+
+
+def test_heartbeat_keeps_lease_of_slow_job(queue):
+    job_id = queue.enqueue("generate", {}, "generate:1")
+    handled = []
+    handler = recording_handler(handled, delay=0.8)
+    workers = [QueueWorker(queue, {"generate": handler}, owner=owner, lease_seconds=0.3, poll_seconds=0.05)
+               for owner in ("a", "b")]
+
+    for worker in workers:
+        worker.start()
+    try:
+        assert wait_for(lambda: queue.get(job_id)['status'] == "done")
+        time.sleep(0.3)
+    finally:
+        for worker in workers:
+            worker.stop()
+
+    # 执行超过租约时长，但续约后不会被另一个执行者重复领取
+    assert len(handled) == 1
+    assert queue.get(job_id)['attempts'] == 1
+
+
+def test_account_filter(queue):
+    for account in ("a", "b"):
+        for i in range(2):
+            queue.enqueue("publish", {"account": account}, f"publish:{account}:{i}")
+    generate_id = queue.enqueue("generate", {"account": "b"}, "generate:b")
+
+    handled = []
+    handlers = {"generate": recording_handler(handled), "publish": recording_handler(handled)}
+    worker_a = QueueWorker(queue, handlers, owner="a", accounts=["a"])
+
+    assert worker_a.drain() == 3
+    published = {queue.get(job_id)['payload']['account'] for _, job_id in handled if job_id != generate_id}
+    assert published == {"a"}
+    # 其他阶段不按账号过滤
+    assert queue.get(generate_id)['status'] == "done"
+    assert queue.counts()['publish'] == {"done": 2, "pending": 2}
+
+    worker_b = QueueWorker(queue, handlers, owner="b", accounts=["b"])
+    assert worker_b.drain() == 2
+    assert queue.counts()['publish'] == {"done": 4}
+
+
+def test_worker_drain_exits_when_queue_is_empty(configure):
+    from stub_client import StubAnthropic
+    from worker import Worker, enqueue_test_jobs
+
+    config_path = configure(dedup={"enabled": False}, image={"method": "placeholder"},
+                            scheduler={"config_reload_seconds": 0})
+    job_ids = enqueue_test_jobs(config_path, 4)
+
+    other = Worker(config_path, roles=["generate"], owner="other", client=StubAnthropic())
+    draining = Worker(config_path, roles=["generate"], owner="draining", client=StubAnthropic())
+
+    previous = signal.getsignal(signal.SIGTERM)
+    other.worker.start()
+    try:
+        draining.run(drain=True, poll_seconds=0.05)
+    finally:
+        other.worker.stop()
+        other.publisher.close()
+        signal.signal(signal.SIGTERM, previous)
+
+    assert [draining.queue.get(job_id)['status'] for job_id in job_ids] == ["done"] * 4
+    assert draining.worker.completed + other.worker.completed == 4
+    assert draining.generator.store.count() == 4
+
+
+def test_drain_waits_for_upstream_stages(configure):
+    from worker import Worker
+
+    config_path = configure(image={"method": "placeholder"})
+    worker = Worker(config_path, roles=["publish"], owner="publisher")
+    job_id = worker.queue.enqueue("generate", {"account": "a"}, "generate:a")
+
+    # 生成任务还没有执行，之后可能产生发布任务
+    assert not worker._idle()
+
+    job = worker.queue.claim(["generate"], "other")
+    worker.queue.complete(job['id'], "other", {"content_id": 1})
+    assert worker.queue.get(job_id)['status'] == "done"
+    assert worker._idle()
+    worker.publisher.close()
+
+
+def test_drain_ignores_publish_jobs_of_other_accounts(configure):
+    from worker import Worker
+
+    config_path = configure(image={"method": "placeholder"})
+    worker = Worker(config_path, roles=["publish"], owner="publisher-a", accounts=["a"])
+    worker.queue.enqueue("publish", {"account": "b", "content_id": 1}, "publish:b:1")
+
+    # 其他账号的发布任务由别的执行者处理
+    assert worker._idle()
+
+    worker.queue.enqueue("publish", {"account": "a", "content_id": 2}, "publish:a:2")
+    assert not worker._idle()
+    worker.publisher.close()
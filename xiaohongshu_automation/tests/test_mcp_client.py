@@ -0,0 +1,190 @@
+"""XhsMcpClient / McpService 与模拟 xiaohongshu-mcp 服务"""
+
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from mcp_client import McpError, McpService, XhsMcpClient, outcome_unknown
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"image_{i}.png"
+        path.write_bytes(b"\x89PNG stub")
+        paths.append(str(path))
+    return paths
+
+
+def publish(client, *args, **kwargs):
+    async def run():
+        async with client:
+            return await client.publish(*args, **kwargs)
+    return asyncio.run(run())
+
+
+def test_health_and_login(mcp_stub):
+    async def run():
+        async with XhsMcpClient(mcp_stub.url) as client:
+            return await client.health(), await client.login_status()
+
+    health, login = asyncio.run(run())
+    assert health['data']['status'] == "healthy"
+    assert login['data']['is_logged_in'] is True
+
+
+def test_publish(mcp_stub, images):
+    response = publish(XhsMcpClient(mcp_stub.url), "标题", "正文", images, tags=["#跨境电商", "Temu"])
+
+    assert response['success'] is True
+    assert response['data']['note_id']
+    [published] = mcp_stub.published
+    assert published['title'] == "标题"
+    assert published['tags'] == ["跨境电商", "Temu"]
+    assert published['images'] == images
+
+
+def test_publish_stages_images_for_container(mcp_stub, images, tmp_path):
+    host_dir = tmp_path / "mounted"
+    client = XhsMcpClient(mcp_stub.url, host_images_dir=str(host_dir), container_images_dir="/app/images")
+
+    publish(client, "标题", "正文", images)
+
+    staged = sorted(path.name for path in host_dir.iterdir())
+    assert [name.split("_", 1)[1] for name in staged] == ["image_0.png", "image_1.png"]
+    assert mcp_stub.published[0]['images'] == [f"/app/images/{name}" for name in staged]
+
+
+def test_staged_images_with_same_name_do_not_collide(mcp_stub, tmp_path):
+    # 不同目录下的同名图片（如不同内容的 image_0.png）
+    images = []
+    for folder in ("first", "second"):
+        (tmp_path / folder).mkdir()
+        path = tmp_path / folder / "image_0.png"
+        path.write_bytes(f"\x89PNG {folder}".encode())
+        images.append(str(path))
+    host_dir = tmp_path / "mounted"
+    client = XhsMcpClient(mcp_stub.url, host_images_dir=str(host_dir), container_images_dir="/app/images")
+
+    publish(client, "标题", "正文", images)
+
+    staged = mcp_stub.published[0]['images']
+    assert len(set(staged)) == 2
+    for image, container_path in zip(images, staged):
+        assert (host_dir / container_path.rsplit("/", 1)[1]).read_bytes() == open(image, 'rb').read()
+
+
+def test_publish_missing_image(mcp_stub, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        publish(XhsMcpClient(mcp_stub.url), "标题", "正文", [str(tmp_path / "missing.png")])
+    assert mcp_stub.published == []
+
+
+def test_publish_rejected_by_server(mcp_stub, images):
+    # 缺少正文时服务返回400
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        publish(XhsMcpClient(mcp_stub.url), "标题", "", images)
+    assert excinfo.value.response.status_code == 400
+    assert not outcome_unknown(excinfo.value)
+
+
+def test_publish_server_error(mcp_stub, images):
+    mcp_stub.error_rate = 1.0
+    with pytest.raises(httpx.HTTPStatusError):
+        publish(XhsMcpClient(mcp_stub.url), "标题", "正文", images)
+    assert mcp_stub.published == []
+
+
+def test_unreachable_service_is_not_ambiguous(images):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with pytest.raises(httpx.ConnectError) as excinfo:
+        publish(XhsMcpClient(f"http://127.0.0.1:{port}", timeout=2), "标题", "正文", images)
+    assert not outcome_unknown(excinfo.value)
+
+
+def test_read_timeout_is_ambiguous(mcp_stub, images):
+    mcp_stub.latency = 0.5
+    mcp_stub.jitter = 0.0
+    with pytest.raises(httpx.ReadTimeout) as excinfo:
+        publish(XhsMcpClient(mcp_stub.url, timeout=0.1), "标题", "正文", images)
+    assert outcome_unknown(excinfo.value)
+
+
+def test_feed_detail_unknown_note(mcp_stub):
+    async def run():
+        async with XhsMcpClient(mcp_stub.url) as client:
+            return await client.feed_detail("missing")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_service_publish_many_keeps_order(mcp_stub, images):
+    service = McpService({"base_url": mcp_stub.url, "max_parallel_publishes": 2})
+    try:
+        items = [{"title": f"标题{i}", "content": "正文", "images": images} for i in range(5)]
+        items.insert(2, {"title": "缺图", "content": "正文", "images": ["/nonexistent.png"]})
+
+        results = service.publish_many(items)
+    finally:
+        service.close()
+
+    assert isinstance(results[2], FileNotFoundError)
+    titles = [result['data']['title'] for i, result in enumerate(results) if i != 2]
+    assert titles == [f"标题{i}" for i in range(5)]
+    assert len(mcp_stub.published) == 5
+
+
+def test_service_publish(mcp_stub, images):
+    service = McpService({"base_url": mcp_stub.url})
+    try:
+        first = service.publish("标题1", "正文", images)
+        second = service.publish("标题2", "正文", images)
+    finally:
+        service.close()
+
+    assert first['data']['note_id'] != second['data']['note_id']
+    assert [item['title'] for item in mcp_stub.published] == ["标题1", "标题2"]
+
+
+def test_error_payload_raises_mcp_error():
+    # 服务返回200但 success 为 false（如未登录）
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"success": False, "message": "未登录"}))
+    client = XhsMcpClient("http://mcp.test")
+
+    async def run():
+        client._http = httpx.AsyncClient(base_url=client.base_url, transport=transport)
+        async with client:
+            return await client.login_status()
+
+    with pytest.raises(McpError, match="未登录"):
+        asyncio.run(run())
+
+
+def test_publisher_reconnects_after_mcp_config_change(configure, mcp_stub):
+    from xhs_publisher import XiaohongshuPublisher
+
+    config_path = configure(mcp={"base_url": mcp_stub.url})
+    publisher = XiaohongshuPublisher(config_path)
+    try:
+        first = publisher.mcp
+        assert first.health()['data']['status'] == "healthy"
+
+        configure(mcp={"base_url": mcp_stub.url, "timeout": 30})
+        assert publisher.settings.reload(strict=True)
+
+        # 原有连接已关闭，下次使用时按新配置连接
+        with pytest.raises(McpError):
+            first.health()
+        assert publisher.mcp is not first
+        assert publisher.mcp.config['timeout'] == 30
+    finally:
+        publisher.close()
+
+    assert publisher._on_config_change not in publisher.settings._listeners